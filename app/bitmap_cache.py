@@ -0,0 +1,78 @@
+# A small LRU cache of rendered text, so a label that keeps showing the same few messages
+# (the status line's "Connecting WiFi", "WiFi Connected", "Connecting MQTT", ...) doesn't
+# rasterize them again every time.
+#
+# The cache doesn't know what it holds: a label puts in whatever it needs to show the text
+# again (its bitmap and TileGrid), or a CachedFont a glyph, along with how many bytes that
+# takes, and the least recently used entries are dropped to stay within max_bytes. Recency is a plain list of keys, as
+# MicroPython dicts don't keep insertion order and the cache only ever holds a handful.
+
+try:
+    from typing import Any, Hashable, Optional
+except ImportError:
+    pass
+
+ENTRY_OVERHEAD = 128  # Bytes an entry costs besides its pixels: the Bitmap and the objects around it, and the key
+
+
+def bitmap_bytes(width: int, height: int, value_count: int) -> int:
+    """Bytes of pixel data in a ``displayio.Bitmap``, whose rows are padded to 32 bits."""
+    bits = 1
+    while (1 << bits) < value_count:
+        bits *= 2
+    return (width * bits + 31) // 32 * 4 * height
+
+
+class BitmapCache:
+    """Rendered text by key, least recently used first out.
+
+    :param int max_bytes: The most bytes the entries may take together."""
+
+    def __init__(self, max_bytes: int = 4096) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = {}  # key -> (value, size)
+        self._order = []  # Keys, least recently used first
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """The value put in for ``key``, or None (counted as a miss) if there isn't one."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self._order[-1] != key:
+            self._order.remove(key)
+            self._order.append(key)
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int) -> None:
+        """Adds ``value``, which takes ``size`` bytes, evicting others to make room. Values
+        bigger than the whole cache aren't kept."""
+        self.remove(key)
+        size += ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        while self.bytes + size > self.max_bytes:
+            self.remove(self._order[0])
+            self.evictions += 1
+        self._entries[key] = (value, size)
+        self._order.append(key)
+        self.bytes += size
+
+    def remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._order.remove(key)
+            self.bytes -= entry[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._order.clear()
+        self.bytes = 0
@@ -0,0 +1,56 @@
+# Times the phases of starting up, from code.py starting to the first correct clock display.
+#
+# code.py calls mark() as each phase ends. Each mark records how long the phase took since
+# the previous mark and how much heap was free at the end of it. Marks are only recorded
+# once per boot, so phases that repeat (e.g. reconnecting WiFi) only count the first time.
+
+import gc
+import json
+import time
+
+try:
+    from typing import Optional
+except ImportError:
+    pass
+
+
+def _now() -> int:
+    return time.monotonic_ns() // 1000000
+
+
+class BootProfiler:
+    """Records boot phases, starting from when it is created."""
+
+    def __init__(self) -> None:
+        self.start = _now()  # Milliseconds since the board powered on (or the last hard reset)
+        self.phases = []  # (name, milliseconds since the previous mark, gc.mem_free() afterwards)
+        self.total = None  # Milliseconds from start to the finish() mark
+        self._last = self.start
+
+    def mark(self, name: str) -> None:
+        """Records the end of the phase ``name``, unless it was already recorded."""
+        for phase in self.phases:
+            if phase[0] == name:
+                return
+        now = _now()
+        self.phases.append((name, now - self._last, gc.mem_free()))
+        self._last = now
+
+    def finish(self, name: str) -> Optional[str]:
+        """Records the final phase. Returns a printable breakdown the first time, otherwise None."""
+        if self.total is not None:
+            return None
+        self.mark(name)
+        self.total = self._last - self.start
+        lines = ["Boot took {} ms (started {} ms after power on):".format(self.total, self.start)]
+        for phase, ms, free in self.phases:
+            lines.append("  {:<16} {:>6} ms  {:>7} bytes free".format(phase, ms, free))
+        return "\n".join(lines)
+
+    def to_json(self) -> str:
+        """The breakdown as JSON, for publishing."""
+        return json.dumps({
+            "start": self.start,
+            "total": self.total,
+            "phases": [list(phase) for phase in self.phases],
+        })
@@ -0,0 +1,80 @@
+# Loads glyphs from a PCF font as they are drawn, and forgets the least recently used ones.
+#
+# adafruit_bitmap_font's PCF loader keeps every glyph it has loaded for as long as the font
+# exists, and glyphs it loads one at a time while a scrolling label redraws didn't always come
+# out right. So code.py used to draw every character of each font into a throwaway Label at
+# boot, which took a while and kept all of them in RAM for good.
+#
+# CachedFont moves each glyph out of the PCF font's own table as soon as it is loaded and into
+# a BitmapCache, which drops the least recently used glyphs to stay under its byte limit. A
+# label therefore always gets a glyph that was fully loaded, or None if the font doesn't have
+# the character. Glyphs that were dropped are read from the file again the next time they are
+# drawn. The cache can be shared by several fonts, so they share one limit.
+
+from bitmap_cache import BitmapCache, bitmap_bytes
+
+try:
+    from typing import Iterable, Optional, Tuple, Union
+    from fontio import Glyph
+except ImportError:
+    pass
+
+
+class CachedFont:
+    """A font that loads glyphs from ``font`` on demand and keeps them in ``cache``. Implements
+    the same interface as the fonts returned by ``adafruit_bitmap_font.bitmap_font.load_font()``.
+
+    :param font: A font from ``adafruit_bitmap_font.bitmap_font.load_font()``.
+    :param BitmapCache cache: Where to keep the loaded glyphs, keyed by font and code point."""
+
+    def __init__(self, font, cache: BitmapCache) -> None:
+        self.font = font
+        self.cache = cache
+        self.loads = 0  # Glyphs read from the file, counting ones that were dropped and read again
+
+    @property
+    def ascent(self) -> int:
+        return self.font.ascent
+
+    @property
+    def descent(self) -> int:
+        return self.font.descent
+
+    def get_bounding_box(self) -> Tuple[int, int, int, int]:
+        """Return the maximum glyph size as a 4-tuple of: width, height, x_offset, y_offset"""
+        return self.font.get_bounding_box()
+
+    def get_glyph(self, code_point: int) -> Optional[Glyph]:
+        """Returns the glyph for the code point, loading it if it isn't cached, or None if the
+        font doesn't have it."""
+        glyph = self.cache.get((self.font, code_point))
+        if glyph is None:
+            glyph = self._load((code_point,))
+        return glyph or None  # False marks a code point the font doesn't have
+
+    def load_glyphs(self, code_points: Union[int, str, Iterable[int]]) -> None:
+        """Loads the glyphs that aren't cached yet, in one pass over the file. Loading more
+        than the cache holds keeps only the last ones."""
+        if isinstance(code_points, int):
+            code_points = (code_points,)
+        elif isinstance(code_points, str):
+            code_points = [ord(c) for c in code_points]
+        self._load([c for c in code_points if (self.font, c) not in self.cache])
+
+    def _load(self, code_points: Iterable[int]) -> Union[Glyph, bool]:
+        """Loads the glyphs into the cache. Returns the last one, or False if the font doesn't
+        have it."""
+        glyph = False
+        if not code_points:
+            return glyph
+        self.font.load_glyphs(code_points)
+        glyphs = self.font._glyphs  # pylint: disable=protected-access
+        for code_point in code_points:
+            glyph = glyphs.pop(code_point, None) or False
+            if glyph:
+                self.loads += 1
+                self.cache.put((self.font, code_point), glyph,
+                               bitmap_bytes(glyph.bitmap.width, glyph.bitmap.height, 2))
+            else:
+                self.cache.put((self.font, code_point), False, 0)
+        return glyph
@@ -0,0 +1,101 @@
+# The pages one line of the display rotates through, from a retained MQTT message.
+#
+# The payload is one page per line of text: "SECONDS|TEXT", or "SECONDS,PRIORITY|TEXT", e.g.
+#   10,1|#FF0000#Storm warning
+#   5|Open 9-17
+# Each page is shown for SECONDS (1 to 3600), then the next one. Pages go round in order of
+# PRIORITY (0 to 9, default 0), highest first, and in the order they were sent within one
+# priority. TEXT can use the same "#RRGGBB#" color tags as a plain line message. An empty
+# payload means no pages.
+#
+# The pages are kept as one UTF-8 bytes object, plus an array of where each one ends and its
+# dwell time, instead of a list of strings and tuples. If they take more than max_bytes, the
+# lowest priority pages (the last sent first) are dropped until the rest fit.
+
+from array import array
+from config import integer
+
+try:
+    from typing import List, Tuple
+except ImportError:
+    pass
+
+PAGE_OVERHEAD = 4  # Bytes each page costs besides its text: its end offset and dwell time in the array
+
+_seconds = integer(1, 3600)
+_priority = integer(0, 9)
+
+
+class Carousel:
+    """The pages of one line, and which one is showing.
+
+    :param int max_bytes: The most bytes the pages may take, counting PAGE_OVERHEAD for each."""
+
+    def __init__(self, max_bytes: int = 1024) -> None:
+        self.max_bytes = max_bytes
+        self.payload = ""  # The last payload set
+        self.dropped = 0  # Pages of it that didn't fit
+        self.current = -1  # Index of the page showing, -1 before the first
+        self._text = b""
+        self._pages = array("H")  # End offset in _text and dwell seconds, for each page
+
+    def __len__(self) -> int:
+        return len(self._pages) // 2
+
+    @staticmethod
+    def parse(payload: str) -> List[Tuple[int, int, bytes]]:
+        """``(priority, seconds, text)`` for each page in ``payload``. Raises ValueError if a
+        page isn't valid."""
+        pages = []
+        for line in payload.split("\n"):
+            if not line.strip():
+                continue
+            head, bar, text = line.partition("|")
+            if not bar:
+                raise ValueError("page needs SECONDS|TEXT")
+            seconds, _, priority = head.partition(",")
+            pages.append((_priority(priority.strip() or "0"), _seconds(seconds.strip()), text.encode("utf-8")))
+        return pages
+
+    def set_pages(self, payload: str) -> int:
+        """Replaces the pages with those in ``payload`` and starts again from the first, or
+        raises ValueError and changes nothing. Returns how many pages were dropped to fit."""
+        pages = self.parse(payload)
+        # Highest priority first, then in the order they were sent. MicroPython's sort isn't
+        # stable, so the index is part of the key.
+        order = sorted(range(len(pages)), key=lambda i: (-pages[i][0], i))
+        size = 0
+        kept = 0
+        for i in order:
+            if size + len(pages[i][2]) + PAGE_OVERHEAD > self.max_bytes:
+                break
+            size += len(pages[i][2]) + PAGE_OVERHEAD
+            kept += 1
+        text = []
+        index = array("H")
+        end = 0
+        for i in order[:kept]:
+            end += len(pages[i][2])
+            text.append(pages[i][2])
+            index.append(end)
+            index.append(pages[i][1])
+        self._text = b"".join(text)
+        self._pages = index
+        self.payload = payload
+        self.dropped = len(pages) - kept
+        self.current = -1
+        return self.dropped
+
+    def page(self, index: int) -> Tuple[str, int]:
+        """The text of page ``index`` and how many milliseconds to show it for."""
+        start = self._pages[2 * index - 2] if index else 0
+        return str(self._text[start:self._pages[2 * index]], "utf-8"), self._pages[2 * index + 1] * 1000
+
+    def next_index(self) -> int:
+        """Index of the page to show after the current one."""
+        return (self.current + 1) % len(self)
+
+    def advance(self) -> Tuple[str, int]:
+        """Moves on to the next page and returns it, as page() does."""
+        self.current = self.next_index()
+        return self.page(self.current)
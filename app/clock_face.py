@@ -0,0 +1,107 @@
+# The big "H:MM" clock, drawn from a sprite sheet instead of a Label.
+#
+# The digits and the colon are rasterized from the clock font once, into one bitmap of
+# equal-width cells. The face is three TileGrids over that sheet (hours, colon, minutes), so
+# changing the time only changes tile indices: no glyph lookups, no layout, no bounding box.
+# The x position that centers the face is worked out up front for 1 and 2 digit hours.
+#
+# It assumes a monospaced font, as the digits all share one cell width. The colon may be
+# narrower; its cell overlaps the minutes, which is fine as the background is transparent.
+
+import bitmaptools
+import displayio
+
+try:
+    from typing import Optional
+    from fontio import FontProtocol
+except ImportError:
+    pass
+
+COLON = 10  # Tile index of the colon. 0-9 are the digits.
+BLANK = 11  # Tile index of an empty cell
+
+
+class ClockFace(displayio.Group):
+    """A centered "H:MM" clock face.
+
+    :param font: The font to draw the digits from. Needs the glyphs "0123456789:".
+    :type: ~FontProtocol
+    :param int width: The width to center the face in (the display width).
+    :param int color: The color of the digits. Default is white.
+
+    ``y`` is where a Label with the same font would be put, so the face can replace one. With
+    ``scale``, the face is drawn that many times bigger, still centered in ``width``."""
+
+    def __init__(self, font: FontProtocol, width: int, color: int = 0xFFFFFF, **kwargs) -> None:
+        super().__init__(**kwargs)
+        digits = [font.get_glyph(ord(c)) for c in "0123456789"]
+        colon = font.get_glyph(ord(":"))
+        glyphs = digits + [colon]
+        self._digit_width = max(glyph.shift_x for glyph in digits)
+        self._colon_width = colon.shift_x
+        cell = max(self._digit_width, max(glyph.width + max(0, glyph.dx) for glyph in glyphs))
+        baseline = max(glyph.height + glyph.dy for glyph in glyphs)
+        height = baseline - min(0, min(glyph.dy for glyph in glyphs))
+
+        self._sheet = displayio.Bitmap(cell * (BLANK + 1), height, 2)
+        for index, glyph in enumerate(glyphs):
+            x = index * cell + max(0, glyph.dx)
+            x_1 = glyph.tile_index * glyph.width
+            bitmaptools.blit(self._sheet, glyph.bitmap, x, baseline - glyph.height - glyph.dy,
+                             x1=x_1, y1=0, x2=x_1 + glyph.width, y2=glyph.height, skip_source_index=0)
+
+        self._palette = displayio.Palette(2)
+        self._palette.make_transparent(0)
+        self.color = color
+        # Like a Label, y is ascent // 2 below the top of the tallest glyph.
+        top = font.ascent // 2 - baseline if hasattr(font, "ascent") else -baseline
+        colon_x = 2 * self._digit_width
+        self._hours = self._grid(2, cell, height, 0, top)
+        self._colon = self._grid(1, cell, height, colon_x, top)
+        self._minutes = self._grid(2, cell, height, colon_x + self._colon_width, top)
+
+        # The face's x for 1 and 2 digit hours, so the text is centered the way a Label's
+        # bounding box would be. With 1 digit, the first hours cell is blank and off the left.
+        text_right = max(self._digit_width, max(glyph.width + glyph.dx for glyph in digits))
+        self._x_for_digits = [0, 0, 0]
+        for count in (1, 2):
+            text_width = count * self._digit_width + self._colon_width + self._digit_width + text_right
+            self._x_for_digits[count] = (round(width / 2 - text_width * self.scale / 2)
+                                         - (2 - count) * self._digit_width * self.scale)
+
+        self._tiles = None
+        self.set_time(None, None)
+
+    def _grid(self, cells: int, cell: int, height: int, x: int, y: int) -> displayio.TileGrid:
+        grid = displayio.TileGrid(self._sheet, pixel_shader=self._palette, width=cells, height=1,
+                                  tile_width=cell, tile_height=height, default_tile=BLANK, x=x, y=y)
+        self.append(grid)
+        return grid
+
+    def set_time(self, hours: Optional[int], minutes: Optional[int], colon: bool = True) -> bool:
+        """Shows ``hours``:``minutes``, with a leading zero in the hours left out. ``colon``
+        False leaves the colon out (e.g. to blink it). ``hours`` None blanks the face.
+        Returns True if anything changed."""
+        if hours is None:
+            tiles = (BLANK, BLANK, BLANK, BLANK, BLANK)
+        else:
+            tiles = (hours // 10 or BLANK, hours % 10, COLON if colon else BLANK, minutes // 10, minutes % 10)
+        if tiles == self._tiles:
+            return False
+        self._tiles = tiles
+        self._hours[0] = tiles[0]
+        self._hours[1] = tiles[1]
+        self._colon[0] = tiles[2]
+        self._minutes[0] = tiles[3]
+        self._minutes[1] = tiles[4]
+        self.x = self._x_for_digits[1 if tiles[0] == BLANK else 2]
+        return True
+
+    @property
+    def color(self) -> int:
+        """The color of the digits."""
+        return self._palette[1]
+
+    @color.setter
+    def color(self, new_color: int) -> None:
+        self._palette[1] = new_color
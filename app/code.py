@@ -1,4 +1,6 @@
 import time
+from boot_profile import BootProfiler
+bootProfile = BootProfiler()  # Times each phase of starting up, until the clock first shows the correct time
 import board
 import busio
 import displayio
@@ -8,25 +10,35 @@ from adafruit_esp32spi import adafruit_esp32spi
 import adafruit_connection_manager
 import adafruit_minimqtt.adafruit_minimqtt as MQTT
 import rtc
-import re
 import supervisor
 import microcontroller
-import storage
 import traceback
+from watchdog import WatchDogMode
 
 # Clock-related imports
 from adafruit_matrixportal.matrix import Matrix
 from adafruit_display_text.label import Label
 from scrolling_label import ScrollingLabel
-#from vertical_scrolling_label import VerticalScrollingLabel
+from vertical_scrolling_label import VerticalScrollingLabel
+from clock_face import ClockFace
 from adafruit_bitmap_font import bitmap_font
-
-### Display setup ###
-matrix = Matrix(width=64, height=32, bit_depth=4)
-display = matrix.display
-
-group = displayio.Group()
-display.root_group = group
+import glyph_pack
+from scheduler import Scheduler
+from ticks import ticks_add, ticks_diff, ticks_ms
+from render_coordinator import RenderCoordinator
+from timesync import TimeSync
+from recovery import Recovery
+from telemetry import Telemetry
+from event_log import EventLog
+import config
+from host_cache import HostCache
+from display_profile import DisplayProfiles, visible_color, measure_headroom
+from bitmap_cache import BitmapCache
+from cached_font import CachedFont
+from carousel import Carousel
+from layout import Layout
+
+bootProfile.mark("imports")
 
 ### Load Secrets ###
 try:
@@ -35,59 +47,155 @@ except ImportError:
     print("secrets.py not found")
     raise
 
+### Display setup ###
+# Color depth by profile, and the hour each profile starts at. Deeper color takes more of the CPU, for the matrix refresh interrupt.
+display_profiles = DisplayProfiles({"day": 4, "night": 2}, [(6, "day"), (22, "night")])
+displayProfile = None  # The profile the matrix runs at
+displayProfileOverride = None  # A profile set over MQTT (mqtt_topic_prefix + "profile"), used instead of the schedule
+displayHeadroom = {}  # Main loop speed under each profile, from measure_headroom(), published with the stats
+# The size of the canvas. Chained panels make a wider or taller one, and the layout grows with it (see layout.py).
+matrix_width = secrets.get("matrix_width", 64)
+matrix_height = secrets.get("matrix_height", 32)
+matrix_tile_rows = secrets.get("matrix_tile_rows", 1)  # Rows of panels, for a chain folded into a taller canvas
+group = displayio.Group()
+max_fps = 20  # The display is refreshed manually, only when something changed, and at most this often.
+renderer = None
+
+
+def setDisplayProfile(name):
+    """Recreates the matrix at the color depth of display profile name. The depth can't change on a running matrix."""
+    global matrix, display, displayProfile
+    if displayProfile is not None:
+        displayio.release_displays()
+    matrix = Matrix(width=matrix_width, height=matrix_height, tile_rows=matrix_tile_rows,
+                    bit_depth=display_profiles.profiles[name])
+    display = matrix.display
+    display.root_group = group
+    displayProfile = name
+    if renderer:
+        renderer.set_display(display)
+    displayHeadroom[name] = measure_headroom()
+
+
+def displayColor(color):
+    """color, raised where needed so it still lights at the current color depth."""
+    return visible_color(color, display_profiles.profiles[displayProfile])
+
+
+bootTime = time.localtime()  # The RTC keeps the time across a reload, but not a power cycle
+setDisplayProfile(display_profiles.for_hour(bootTime[3] if bootTime[0] >= 2020 else 12))
+renderer = RenderCoordinator(display, max_fps)
+layout = Layout(display.width, display.height)
+print("Layout " + layout.describe())
+bootProfile.mark("matrix")
+
+### Settings ###
+# These can be changed without a reboot, by a retained message on mqtt_topic_prefix + "config" (see config.py).
+# The last one is kept in nvm, after the event log, so the next boot starts with it.
+settings = config.Config({
+    "nowifi": (config.color, secrets["color_nowifi"]),  # Status light colors
+    "wifi": (config.color, secrets["color_wifi"]),
+    "frame": (config.integer(10, 1000), 50),  # Milliseconds between scrolling animation frames. Marquee labels scroll 1 pixel per frame.
+    "sync": (config.integer(10, 960), 60),  # Seconds between time syncs while the clock isn't stable. They back off from there.
+    "keep_alive": (config.integer(5, 600), 12),  # Seconds. MQTT keep alive.
+    "socket_timeout": (config.integer(10, 1000), 50),  # Milliseconds. Each MQTT poll blocks for this long.
+    "bands": (config.bands, [(6, 0xCC4000), (8, 0x00FF00), (18, 0xCC4000), (22, 0xFF0000)]),  # Clock color from each hour
+}, nvm=microcontroller.nvm, nvm_start=1024, nvm_size=256)
+if settings.load():
+    print("Settings from nvm: " + settings.payload)
+
 ### Configure Status LED ###
-color_nowifi = secrets["color_nowifi"]
-color_wifi = secrets["color_wifi"]
 status_light = neopixel.NeoPixel(board.NEOPIXEL, 1, brightness=1)
-status_light.fill(color_nowifi)
-status_light.fill(color_nowifi)  # First call sometimes sets the wrong color
+status_light.fill(settings.nowifi)
+status_light.fill(settings.nowifi)  # First call sometimes sets the wrong color
 
 
 ### Text setup ###
-def MakeLabel(font, color, x, y, scrollAfter=0):
+frame_time = settings.frame / 1000  # Seconds between scrolling animation frames
+statusCache = BitmapCache(4096)  # The status line's recent messages, rendered. setInfo() and friends cycle through the same few.
+# The carousel pages of line 1 and of the lines under it on a bigger canvas, rendered: the one showing and the next
+# on each (line 2's go in statusCache). The labels' palettes are part of the keys, so they can share it.
+pageCache = BitmapCache(4096 * (layout.lines - 1))
+glyphCache = BitmapCache(8192)  # Glyphs loaded from the PCF fonts, if their glyph packs are missing. Holds about 50 of the small font's.
+
+
+def MakeLabel(font, color, x, y, scrollAfter=0, bitmapCache=None):
     if scrollAfter:
         lbl = ScrollingLabel(font,
                              max_characters=scrollAfter,
-                             animate_time=0.2,
+                             animate_time=frame_time,
+                             marquee=True,
+                             max_colors=3,  # The label color and up to 2 inline colors
+                             bitmap_cache=bitmapCache,
                              tab_replacement=(1, " "))
     else:
         lbl = Label(font, tab_replacement=(2, " "))
-    lbl.color = color
+    lbl.color = displayColor(color)
     lbl.x = x
     lbl.y = y
     group.append(lbl)
     return lbl
 
 
-clockFont = bitmap_font.load_font("/IBMPlexMono-Medium-24_jep-modified2.pcf")
+def LoadFont(path, warmUp=""):
+    """Loads the subsetted glyph pack (path + ".gpk", built by extra_source/build_fonts.py), falling back to the PCF font,
+    whose glyphs are loaded as they are drawn (those in warmUp right away) and kept in glyphCache."""
+    try:
+        return glyph_pack.load_font(path + ".gpk")
+    except OSError:
+        print("Glyph pack " + path + ".gpk not found. Loading PCF font.")
+    font = CachedFont(bitmap_font.load_font(path + ".pcf"), glyphCache)
+    font.load_glyphs(warmUp)
+    return font
+
+
+clockFont = LoadFont("/IBMPlexMono-Medium-24_jep-modified2", "0123456789:")  # All that clock_face draws, in one pass over the file
+bootProfile.mark("clock font")
 # clockFont character size is 14x25. Most actually use 12x17.
-smallFont = bitmap_font.load_font("tom-thumb-modified.pcf")
+smallFont = LoadFont("tom-thumb-modified")
+bootProfile.mark("small font")
 # smallFont character size is 6x4 including spincluding spacing between chars. Some characters extend a little into the spacing area on bottom and right edges.
 
-clock_label = MakeLabel(clockFont, 0xFFFF00, 0, 9)
-small_label1 = MakeLabel(smallFont, 0x1F0000, 0, display.height - 9, 16)
-small_label2 = MakeLabel(smallFont, 0x200000, 0, display.height - 3, 16)
-#crashDumpLabel = VerticalScrollingLabel(smallFont, max_characters=16, max_lines=5)
-#crashDumpLabel.color = 0xFF0000
-#crashDumpLabel.x = 0
-#crashDumpLabel.y = 3
-#crashDumpLabel.background_color = 0x000000
-#group.append(crashDumpLabel)
-
-clock_label.text = ""
-small_label2.full_text = "LOADING FONTS"
-
-# As of this writing, glyphs do not load reliably from pcf fonts if used in a scrolling label, unless all characters are preloaded. So we'll do that now
-Label(
-    smallFont
-).text = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz01234567890-=!@#$%^&*()_+[]{}\\|;:'\",.<>/?`~"
-Label(clockFont).text = "01234567890:"
+# Digits drawn once into a sprite sheet. Changing the time only swaps tiles.
+clock_face = ClockFace(clockFont, display.width, displayColor(0xFFFF00), y=layout.clock_y, scale=layout.clock_scale)
+group.append(clock_face)
+lineLabels = [None]  # By line number. Line 2 is the status line, and lines 3 and up only fit on chained panels.
+for lineNumber in layout.line_numbers:
+    lineLabels.append(MakeLabel(smallFont, 0x200000 if lineNumber == 2 else 0x1F0000, 0, layout.line_y(lineNumber),
+                                layout.line_chars, statusCache if lineNumber == 2 else pageCache))
+small_label1 = lineLabels[1]
+small_label2 = lineLabels[2]
+crashDumpLabel = VerticalScrollingLabel(smallFont, max_characters=layout.line_chars, max_lines=layout.crash_lines,
+                                        color=0xFF0000, background_color=0x000000)
+crashDumpLabel.x = 0
+crashDumpLabel.y = 1
+crashDumpLabel.hidden = True  # Covers the whole panel while a crash dump is shown
+group.append(crashDumpLabel)
 
 small_label2.full_text = "LOADING"
-
-### Setup Color-matching regex ###
-rxFindColorTag = re.compile(
-    "^#([0-9A-Fa-f][0-9A-Fa-f][0-9A-Fa-f][0-9A-Fa-f][0-9A-Fa-f][0-9A-Fa-f])#")
+renderer.refresh()
+bootProfile.mark("labels")
+
+### Scheduler setup ###
+# Every piece of periodic work is a task that says when it next needs to run, and the device sleeps until the earliest deadline.
+# The display tasks are registered here. The network tasks are registered once the MQTT client exists.
+# A pass that runs tasks for longer than frame_budget stutters the scrolling, so once it has, the tasks still due wait for the next pass.
+frame_budget = 100  # Milliseconds. Two animation frames.
+scheduler = Scheduler(frame_budget)
+clockTask = scheduler.add("clock", lambda: clockTick())
+lineTasks = [None]  # By line number, as lineLabels
+for lineNumber in layout.line_numbers:
+    lineTasks.append(scheduler.add("line{}".format(lineNumber),
+                                   lambda n=lineNumber: ScrollLabel(lineLabels[n], layout.line_areas[n])))
+crashDumpTask = scheduler.add("crashDump", lambda: ScrollLabel(crashDumpLabel), None)
+linesTask = scheduler.add("lines", lambda: linesTick(), None)  # Applies line text from MQTT, woken by queueLine()
+carouselTask = scheduler.add("carousel", lambda: carouselTick(), None)  # Turns the carousel pages, woken by setPages()
+renderTask = scheduler.add("render", lambda: renderTick(), None)  # Runs after the tasks that change the display
+logTask = scheduler.add("log", lambda: logTick(), None)  # Saves the event log to nvm, woken by logEvent()
+renderer.on_dirty = renderTask.wake
+displayTasks = [clockTask] + lineTasks[1:] + [crashDumpTask, linesTask, carouselTask, renderTask]
+telemetry = Telemetry()  # Counters published every stats_interval
+scheduler.on_pass = telemetry.record_loop
 
 ### Configure ESP chip (for WiFi) ###
 esp32_cs = DigitalInOut(board.ESP_CS)
@@ -96,15 +204,22 @@ esp32_reset = DigitalInOut(board.ESP_RESET)
 
 spi = busio.SPI(board.SCK, board.MOSI, board.MISO)
 esp = adafruit_esp32spi.ESP_SPIcontrol(spi, esp32_cs, esp32_ready, esp32_reset)
+bootProfile.mark("esp32")
 
 ### Methods ###
-time_offset = 0  # When this offset is added to (time.monotonic_ns() / 1000000), the result is the current unix epoch time in milliseconds.
-lastTimesync = -9999999
+timesync = TimeSync(secrets["matrix_portal_id"], min_interval=settings.sync * 1000)  # Turns time.monotonic_ns() into the current unix epoch time in milliseconds, from time sync samples.
+lastTimesync = None  # Ticks of the last time sync request or reply
+eventLog = EventLog(nvm=microcontroller.nvm, nvm_start=0, nvm_size=1024)  # Errors and events. Saved to nvm at most every 15 minutes, and before reloading.
+print("Event log: {} records from earlier boots".format(eventLog.load()))
 
 
-def ScrollLabel(lbl):
-    if len(lbl.full_text) > 16:
-        lbl.update(True)
+def ScrollLabel(lbl, area=None):
+    """Animates a scrolling label, which covers area of the display (all of it by default). Returns the
+    milliseconds until its next frame, or None while its text fits."""
+    delay = lbl.update()
+    if lbl.moved:
+        renderer.invalidate(area)  # It scrolled
+    return delay
 
 
 def exprint(e, includeStack=False, singleLine=False):
@@ -123,12 +238,17 @@ def exprint(e, includeStack=False, singleLine=False):
         return type(e).__name__ + ": " + str(e)
 
 
+def showCrashDump(message):
+    """Shows message (e.g. a traceback) over the whole panel, scrolling if it doesn't fit. None hides it again."""
+    crashDumpLabel.full_text = message or ""
+    crashDumpLabel.hidden = not message
+    renderer.invalidate()
+    crashDumpTask.wake()
+
+
 def loop_n_sec(n):
-    for _ in range(round(n * 5)):
-        time.sleep(0.2)
-        clockUpdate()
-        ScrollLabel(small_label1)
-        ScrollLabel(small_label2)
+    """Keeps the display tasks running for n seconds, without doing any network work."""
+    scheduler.run(round(n * 1000), displayTasks)
 
 
 #def is_usb_connected():
@@ -148,46 +268,41 @@ else:
     print("USB is NOT connected")
 
 
-def writeErrorFile(message):
-    if not supervisor.runtime.usb_connected:
-        try:
-            storage.remount('/', readonly=False)
-        except RuntimeError as e:
-            return
-        with open('LastError.txt', 'w') as f:
-            now = 0
-            try:
-                now = time.localtime(bptime())  # Get the time values we need
-            except OverflowError as e:
-                now = time.localtime()
-            f.write(timeToDateString(now))
-            f.write("\n")
-            f.write(message)
-    else:
-        print("USB is connected. Will not write error file.")
-
-
-def timeToDateString(t: time.struct_time):
-    hours = t[3]
-    tt = "AM"
-    if hours > 12:  # Handle times later than 12:59
-        hours -= 12
-        tt = "PM"
-    elif not hours:  # Handle times between 0:00 and 0:59
-        hours = 12
-    return "{yy:02d}-{MM:02d}-{dd:02d} {hh}:{mm:02d}:{ss:02d} {tt}".format(
-        yy=t[0], MM=t[1], dd=t[2], hh=hours, mm=t[4], ss=t[5], tt=tt)
+def bptime():
+    """Returns the local time in integer seconds since the unix epoch, as estimated by timesync."""
+    return bptime_ms() // 1000
 
 
-def bptime():
-    """Returns the local time in integer seconds since the unix epoch. Uses the global variable time_offset to store the offset."""
-    return ((time.monotonic_ns() // 1000000) + time_offset) // 1000
+def bptime_ms():
+    """Returns the local time in integer milliseconds since the unix epoch, as estimated by timesync."""
+    return timesync.epochms(performance_now())
 
 
 def bptime_learn_epochms(epochms):
     """Given the integer milliseconds since the unix epoch in local time, this function sets the time offset necessary for bptime() to return the correct time."""
-    global time_offset  # Tell python to refer to the global variable when setting time_offset
-    time_offset = epochms - (time.monotonic_ns() // 1000000)
+    timesync.set_epochms(epochms, performance_now())
+
+
+def logEvent(kind, text):
+    """Adds a record to the event log. kind is one letter: B(oot), E(rror), W(arning) or I(nfo)."""
+    eventLog.add(bptime() if timesync.synced else 0, kind, text)
+    delay = eventLog.due()
+    if delay is not None:
+        logTask.wake(delay)
+
+
+def logTick():
+    eventLog.flush()
+    return eventLog.due()
+
+
+def publishEventLog():
+    """Publishes the event log to mqtt_topic_log, in answer to a message on mqtt_topic_prefix + "log/get"."""
+    try:
+        mqtt_client.publish(mqtt_topic_log, eventLog.to_json(), retain=False, qos=0)
+    except (ValueError, RuntimeError, ConnectionError, TimeoutError,
+            MQTT.MMQTTException) as e:
+        print("Event log publish failed: " + exprint(e))
 
 
 def performance_now():
@@ -211,31 +326,150 @@ def setError(message):
     setLabel(2, message, 0xFF0000)
 
 
-def setLabel(lineNumber, message, color):
+def setLabel(lineNumber, message, color, colorSpans=None):
     if message == "" or message == None:
         message = " "
+    lineArgs[lineNumber] = (message, color, colorSpans)  # To redo the colors if the color depth changes
+    if colorSpans:
+        colorSpans = [(i, c if c is None else displayColor(c)) for i, c in colorSpans]
 
-    if lineNumber == 1:
-        lbl = small_label1
-    elif lineNumber == 2:
-        lbl = small_label2
-
-    lbl.full_text = message
+    lbl = lineLabels[lineNumber]
+    area = layout.line_areas[lineNumber]
+    if lbl.set_full_text(message, colorSpans):
+        renderer.invalidate(area)
+        lineTasks[lineNumber].wake()  # It may need to start scrolling
 
     if color:
-        lbl.color = color
+        renderer.set_attr(lbl, "color", displayColor(color), area)
+
+
+def parseColorTag(message, i):
+    """Returns the color of a "#RRGGBB#" tag starting at message[i], or None if there isn't one there."""
+    if message[i] != "#" or i + 8 > len(message) or message[i + 7] != "#":
+        return None
+    for c in message[i + 1:i + 7]:
+        if c not in "0123456789ABCDEFabcdef":
+            return None
+    return int(message[i + 1:i + 7], 16)
+
+
+def parseColorMarkup(message, defaultColor):
+    """Splits a message with "#RRGGBB#" color tags anywhere in it into the text to show,
+    the color it starts in and a list of (index, color) for where the color changes later on."""
+    color = defaultColor
+    spans = []
+    text = []
+    length = 0
+    start = 0
+    i = 0
+    while i < len(message):
+        if message[i] == "#":
+            tagColor = parseColorTag(message, i)
+            if tagColor is not None:
+                if i > start:
+                    text.append(message[start:i])
+                    length += i - start
+                if length == 0:
+                    color = tagColor  # A leading tag colors the whole label
+                elif spans and spans[-1][0] == length:
+                    spans[-1] = (length, tagColor)
+                else:
+                    spans.append((length, tagColor))
+                i += 8
+                start = i
+                continue
+        i += 1
+    text.append(message[start:])
+    return "".join(text), color, spans
 
 
 def setLabelFromMqtt(lineNumber, message):
     if message == "" or message == None:
         message = " "
-    match = rxFindColorTag.match(message)
-    if match != None:
-        color = int(match.group(1), 16)
-        message = message[8:]
+    message, color, spans = parseColorMarkup(message, 0x666666)
+    setLabel(lineNumber, message, color, spans)
+
+
+def queueLine(lineNumber, message):
+    """Holds a line's text from MQTT until linesTick() applies it. Only the latest message for each line is kept."""
+    global linesCoalesced
+    if pendingLines[lineNumber] is not None:
+        linesCoalesced += 1
+    pendingLines[lineNumber] = message
+    linesTask.wake()
+
+
+def linesTick():
+    """Applies the pending text for each line, no more than once per line_update_interval so a
+    chatty publisher can't keep restarting the scroll. Returns the milliseconds until a held back one is due."""
+    now = performance_now()
+    delay = None
+    for lineNumber in layout.line_numbers:
+        message = pendingLines[lineNumber]
+        if message is None:
+            continue
+        wait = lineApplied[lineNumber] + line_update_interval - now
+        if wait > 0:
+            delay = wait if delay is None else min(delay, wait)
+            continue
+        pendingLines[lineNumber] = None
+        lineApplied[lineNumber] = now
+        lineMessages[lineNumber] = message
+        if not len(carousels[lineNumber]):  # Otherwise it shows once the pages are cleared
+            setLabelFromMqtt(lineNumber, message)
+    return delay
+
+
+def setPages(lineNumber, payload):
+    """Applies the carousel pages in a message on mqtt_topic_prefix + "lineN/pages" (see carousel.py)."""
+    pages = carousels[lineNumber]
+    if payload == pages.payload:
+        return  # The retained message again, after reconnecting. Keep turning the pages from where they were.
+    try:
+        dropped = pages.set_pages(payload)
+    except ValueError as e:
+        print("Pages rejected: " + exprint(e))
+        setError("PAGES: " + str(e))
+        logEvent("W", "line{} pages rejected: {}".format(lineNumber, e))
+        return
+    if dropped:
+        logEvent("W", "line{} pages: {} dropped".format(lineNumber, dropped))
+    pageDue[lineNumber] = ticks_ms()
+    if len(pages):
+        carouselTask.wake()
     else:
-        color = 0x666666
-    setLabel(lineNumber, message, color)
+        setLabelFromMqtt(lineNumber, lineMessages[lineNumber])  # Blank if the line never had a plain message
+
+
+def prerenderPage(lineNumber, text):
+    """Renders a carousel page into its line's bitmap cache, so showing it later costs no rasterizing."""
+    text, color, spans = parseColorMarkup(text, 0x666666)
+    lineLabels[lineNumber].prerender(text, [(i, c if c is None else displayColor(c)) for i, c in spans])
+
+
+def carouselTick():
+    """Shows the next page of each line's carousel once the current one has had its time, and renders the page
+    after it on a later run, while this one shows. Returns the milliseconds until one of those is due."""
+    now = ticks_ms()
+    delay = None
+    for lineNumber in layout.line_numbers:
+        pages = carousels[lineNumber]
+        if not len(pages):
+            continue
+        wait = ticks_diff(pageDue[lineNumber], now)
+        if wait <= 0:
+            text, dwell = pages.advance()
+            setLabelFromMqtt(lineNumber, text)
+            # From when it was due, so the pages keep time, unless that was long ago (e.g. the pages just arrived).
+            pageDue[lineNumber] = ticks_add(now if -wait >= dwell else pageDue[lineNumber], dwell)
+            pagePrerendered[lineNumber] = len(pages) == 1  # A single page is already showing
+            wait = settings.frame  # Render the next page once this one has been drawn
+        elif not pagePrerendered[lineNumber]:
+            pagePrerendered[lineNumber] = True
+            prerenderPage(lineNumber, pages.page(pages.next_index())[0])
+        if delay is None or wait < delay:
+            delay = wait
+    return delay
 
 
 def setstatus(msg1, msg2, msg3):
@@ -245,8 +479,8 @@ def setstatus(msg1, msg2, msg3):
             print(msg3)
     else:
         print(msg1)
-    small_label1.text = msg1
-    small_label2.text = msg2
+    renderer.set_attr(small_label1, "text", msg1, layout.line_areas[1])
+    renderer.set_attr(small_label2, "text", msg2, layout.line_areas[2])
 
 
 def maintainWifi():
@@ -257,29 +491,26 @@ def maintainWifi():
             setInfo("Connecting WiFi")
 
             esp.connect_AP(secrets["ssid"], secrets["password"])
-            status_light.fill(color_wifi)
+            status_light.fill(settings.wifi)
+            disconnectMqtt()  # The old connection went with the WiFi
 
             print("Connected WiFi to", str(esp.ssid, "utf-8"), "with RSSI:",
                   esp.rssi)
             setSuccess("WiFi Connected")
-
-            try:
-                mqtt_client.disconnect()
-            except (ValueError, RuntimeError, ConnectionError, TimeoutError,
-                    MQTT.MMQTTException) as e:
-                pass
+            bootProfile.mark("wifi")
         except (RuntimeError, ConnectionError, TimeoutError) as e:
             print("WiFi Connect Failed: " + exprint(e))
             setError("WiFi Connect Failed: " + exprint(e))
-            status_light.fill(color_nowifi)
-            status_light.fill(color_nowifi)
+            status_light.fill(settings.nowifi)
+            status_light.fill(settings.nowifi)
             return False
-    status_light.fill(color_wifi)
+    status_light.fill(settings.wifi)
     return True
 
 
 def maintainMqtt():
     """Reconnects to MQTT if necessary and checks for messages from MQTT. Returns True if succesful, False if not connected"""
+    global mqttSubscribed
     try:
         # Connect if needed
         if not mqtt_client.is_connected():
@@ -287,43 +518,49 @@ def maintainMqtt():
             setInfo("Connecting MQTT")
 
             try:
+                # By address, so MiniMQTT doesn't look the broker up (see host_cache.py)
+                mqtt_client.broker = brokerHost.address(bptime() if timesync.synced else 0)
                 mqtt_client.reconnect(resub_topics=False)
             except (ValueError, RuntimeError, ConnectionError, TimeoutError,
                     MQTT.MMQTTException) as e:
+                brokerHost.expire()  # In case the broker moved
                 print("Failed to connect to MQTT: " + exprint(e))
                 setError("MQTT CONN FAIL: " + exprint(e))
-                loop_n_sec(15)
-                setError("WiFi Reconnect")
-                dropWifi()
                 #if type(e).__name__ == "RuntimeError" and str(e) == "Failed to request hostname":
                 return False
 
-            print("Connected to MQTT broker! Subscribing to topics...")
+            print("Connected to MQTT broker!")
+            mqttSubscribed = False
+            return True  # Subscribe on the next run. Waiting for both the CONNACK and the SUBACK in one pass could outlast the watchdog.
+
+        if not mqttSubscribed:
+            print("Subscribing to topics...")
             setSuccess("")
-            mqtt_client.subscribe(mqtt_topic_prefix + "#")
-            mqtt_client.subscribe(mqtt_topic_time)
+            topics = [(mqtt_topic_prefix + "#", 0)]  # Includes our time sync replies
+            if timesync.legacy:
+                topics.append((mqtt_topic_time, 0))
+            if secrets.get("timesync_broadcast"):
+                topics.append((mqtt_topic_time_tick, 0))
+            mqtt_client.subscribe(topics)  # All in one round trip
+            mqttSubscribed = True
             print("MQTT Subscriptions ready")
+            bootProfile.mark("mqtt")
             requestTimesync()
+            return True  # Poll on the next run, after the display has caught up
+
+        if scheduler.budget_left() <= 0:
+            return True  # Connecting used up the frame. Poll on the next run, after the display has caught up.
 
-        # Do non-blocking MQTT client work
-        mqtt_client.loop(timeout=0.2)
+        # Do non-blocking MQTT client work. This blocks for one socket timeout, which is about one animation frame.
+        loopStart = ticks_ms()
+        mqtt_client.loop(timeout=mqtt_socket_timeout)
+        telemetry.record_mqtt_loop(ticks_diff(ticks_ms(), loopStart))
         return True
     except (ValueError, RuntimeError, ConnectionError, TimeoutError,
             MQTT.MMQTTException) as e:
+        disconnectMqtt()  # So the next attempt reconnects. First, as it shows "MQTT Disconnected".
         print("MQTT ERROR: " + exprint(e, True))
-        if type(e).__name__ == "MMQTTException":
-            if str(e) == "PINGRESP not returned from broker.":
-                pass
-            elif str(e) == "MiniMQTT is not connected":
-               pass
-        elif type(e).__name__ == "ConnectionError" and str(e).startswith("Failed to send "):
-            loop_n_sec(10)
-            dropWifi()
-        elif type(e).__name__ == "TimeoutError":
-            loop_n_sec(10)
-            dropWifi()
-        else:
-            setError("MQTT ERROR: " + exprint(e))
+        setError("MQTT ERROR: " + exprint(e))
         return False
 
 
@@ -336,43 +573,79 @@ def requestTimesync():
         return
 
     try:
-        mqtt_client.publish(mqtt_topic_time, "", retain=False, qos=0)
-        lastTimesync = performance_now()
+        now = performance_now()
+        wasLegacy = timesync.legacy
+        payload = timesync.request(now)
+        if timesync.legacy and not wasLegacy:
+            mqtt_client.subscribe(mqtt_topic_time)  # The old protocol replies on the shared topic
+        mqtt_client.publish(mqtt_topic_time, payload, retain=False, qos=0)
+        lastTimesync = ticks_ms()
+        networkTask.wake(mqtt_reply_poll_interval)  # Pick up the reply promptly, so it doesn't inflate the round trip
     except (ValueError, RuntimeError, ConnectionError, TimeoutError,
             MQTT.MMQTTException) as e:
+        disconnectMqtt()
         print("Time Sync Request Failed: " + exprint(e))
         setError("Time Sync Request Failed: " + exprint(e))
-        loop_n_sec(10)
-        dropWifi()
+        networkTask.wake()  # Start recovering now
         return False
 
 
-def dropWifi(hardResetEsp=False):
+def disconnectMqtt():
+    """Disconnects MQTT, if it is connected. Call it before showing why: disconnected() shows "MQTT Disconnected"."""
+    try:
+        mqtt_client.disconnect()
+    except (ValueError, RuntimeError, ConnectionError, TimeoutError,
+            MQTT.MMQTTException) as e:
+        pass
+
+
+# Network recovery steps. Everything but the last keeps the display, the fonts and the time.
+def dropWifi():
+    logEvent("W", "WiFi reconnect")
     try:
+        disconnectMqtt()
         print("WiFi D/Cing")
         setWarning("WiFi D/Cing")
-        loop_n_sec(1)
-        if hardResetEsp:
-            print("Hard resetting ESP32 chip")
-            esp.reset()  # THIS DOES NOT FIX DNS LOOKUP FAILURE
-        else:
-            esp.disconnect()
+        esp.disconnect()
         print("WiFi D/Ced")
         setWarning("WiFi D/Ced")
-        loop_n_sec(1)
-        print("Soft Rebooting")
-        setWarning("Soft Rebooting")
-        loop_n_sec(1)
-        supervisor.reload()
-        #print("Hard Rebooting")
-        #setWarning("Hard Rebooting")
-        #loop_n_sec(1)
-        #microcontroller.reset()
     except OSError as e:
         print("WiFi D/C FAIL: " + exprint(e))
         setError("WiFi D/C FAIL: " + exprint(e))
 
 
+def resetEsp():
+    logEvent("W", "ESP32 reset")
+    try:
+        disconnectMqtt()  # Closes the MQTT socket through the connection manager, which keeps the pool
+        print("Hard resetting ESP32 chip")
+        setWarning("Resetting ESP32")
+        esp.reset()  # THIS DOES NOT FIX DNS LOOKUP FAILURE
+    except OSError as e:
+        print("ESP32 reset FAIL: " + exprint(e))
+        setError("ESP32 reset FAIL: " + exprint(e))
+
+
+def softReboot():
+    print("Soft Rebooting")
+    setWarning("Soft Rebooting")
+    logEvent("W", "reload")
+    eventLog.flush(True)
+    renderer.refresh()
+    supervisor.reload()
+    #print("Hard Rebooting")
+    #setWarning("Hard Rebooting")
+    #microcontroller.reset()
+
+
+recovery = Recovery([
+    ("MQTT reconnect", 3, None),
+    ("WiFi reconnect", 3, dropWifi),
+    ("ESP32 reset", 3, resetEsp),
+    ("reload", 1, softReboot),
+])
+
+
 def clockUpdate(*, hours=None, minutes=None):
     try:
         now = time.localtime(bptime())  # Get the time values we need
@@ -381,12 +654,11 @@ def clockUpdate(*, hours=None, minutes=None):
 
     if hours is None:
         hours = now[3]
-    if (hours >= 18 and hours < 22) or (hours >= 6 and hours < 8):
-        clock_label.color = 0xCC4000
-    elif hours >= 18 or hours < 6:  # after 6PM or before 6AM
-        clock_label.color = 0xFF0000
-    else:
-        clock_label.color = 0x00FF00  # daylight hours
+    color = settings.bands[-1][1]  # The last band carries on past midnight
+    for start, bandColor in settings.bands:
+        if hours >= start:
+            color = bandColor
+    renderer.set_attr(clock_face, "color", displayColor(color), layout.clock_area)
     if hours > 12:  # Handle times later than 12:59
         hours -= 12
     elif not hours:  # Handle times between 0:00 and 0:59
@@ -395,17 +667,154 @@ def clockUpdate(*, hours=None, minutes=None):
     if minutes is None:
         minutes = now[4]
 
-    newText = "{hours}:{minutes:02d}".format(hours=hours, minutes=minutes)
+    if clock_face.set_time(hours, minutes):
+        renderer.invalidate(layout.clock_area)
+
+
+def applyDisplayProfile():
+    """Switches to the display profile set over MQTT, or else the scheduled one, if it isn't the current one."""
+    name = displayProfileOverride
+    if name is None:
+        if not timesync.synced:
+            return
+        name = display_profiles.for_hour(time.localtime(bptime())[3])
+    if name == displayProfile:
+        return
+    print("Display profile: " + name)
+    logEvent("I", "profile " + name)
+    setDisplayProfile(name)
+    for lineNumber in layout.line_numbers:
+        if lineArgs[lineNumber]:
+            setLabel(lineNumber, *lineArgs[lineNumber])
+    clockUpdate()
+    print("Main loop headroom: {} iterations/ms".format(displayHeadroom[name]))
+
+
+def clockTick():
+    global clockShowsTime
+    applyDisplayProfile()
+    clockUpdate()
+    renderer.roll_minute()  # Every minute, even if nothing refreshes
+    clockShowsTime = timesync.synced
+    # The clock can't change again until the next minute boundary. Wake up just after it.
+    return 60000 - bptime_ms() % 60000 + 5
+
+
+def renderTick():
+    delay = renderer.refresh()
+    if clockShowsTime and not renderer.dirty and bootProfile.total is None:
+        print(bootProfile.finish("clock shown"))
+    return delay
+
+
+def publishBootProfile():
+    """Publishes the boot breakdown once, after the clock first shows the correct time."""
+    global bootProfilePublished
+    if bootProfile.total is None or bootProfilePublished:
+        return
+    try:
+        mqtt_client.publish(mqtt_topic_boot, bootProfile.to_json(), retain=False, qos=0)
+        bootProfilePublished = True
+    except (ValueError, RuntimeError, ConnectionError, TimeoutError,
+            MQTT.MMQTTException) as e:
+        print("Boot profile publish failed: " + exprint(e))
+
 
-    if clock_label.text != newText:
-        clock_label.text = newText
-        bbx, bby, bbwidth, bbh = clock_label.bounding_box
-        clock_label.x = round(display.width / 2 - bbwidth / 2)
+def statsTick():
+    """Publishes the telemetry counters and starts a new period. Returns the milliseconds until the next publish."""
+    if not networkOk:
+        return 10000
+    telemetry.sample_heap()
+    renderer.roll_minute()
+    try:
+        mqtt_client.publish(mqtt_topic_stats, telemetry.to_json(
+            uptime=performance_now() // 1000,
+            recoveries=recovery.recoveries,
+            escalations=recovery.escalations[1:],
+            synced=timesync.synced,
+            sync_interval=timesync.interval // 1000,
+            drift_ppm=round(timesync.drift * 1000000, 1),
+            refreshes_per_min=renderer.refreshes_per_minute,
+            refresh_coverage=renderer.coverage_per_minute,
+            lines_coalesced=linesCoalesced,
+            overruns=scheduler.overruns,
+            status_cache={"hits": statusCache.hits, "misses": statusCache.misses, "bytes": statusCache.bytes},
+            glyph_cache={"hits": glyphCache.hits, "misses": glyphCache.misses, "bytes": glyphCache.bytes},
+            dns_lookups=brokerHost.lookups,
+            dns_fallbacks=brokerHost.fallbacks,
+            profile=displayProfile,
+            headroom=displayHeadroom), retain=False, qos=0)
+    except (ValueError, RuntimeError, ConnectionError, TimeoutError,
+            MQTT.MMQTTException) as e:
+        print("Stats publish failed: " + exprint(e))
+        return 10000
+    telemetry.reset()
+    return stats_interval
+
+
+def networkTick():
+    """Keeps WiFi and MQTT connected and polls for MQTT messages. Returns the milliseconds until the next poll."""
+    global networkOk, mqttReconnect
+    if mqttReconnect:  # A setting that is only sent when connecting changed
+        mqttReconnect = False
+        disconnectMqtt()
+    wifiOk = maintainWifi()
+    if wifiOk and not networkOk and scheduler.budget_left() <= 0:
+        return 0  # Connecting WiFi used up the frame. Connect MQTT on the next run, after the display has caught up.
+    networkOk = wifiOk and maintainMqtt()
+    if not networkOk:
+        return recovery.failed(performance_now(), wifiOk)
+    if recovery.failing_since is not None:
+        report = recovery.succeeded(performance_now())
+        print(report)
+        logEvent("I", report)
+    publishBootProfile()
+    telemetry.sample_heap()
+    if timesync.pending is not None and timesync.waiting(performance_now()):
+        return mqtt_reply_poll_interval
+    return mqtt_poll_interval
+
+
+def timesyncTick():
+    """Requests a time sync when one is due. Returns the milliseconds until the next one is due."""
+    if not networkOk or not mqttSubscribed:
+        return 1000  # Subscribing requests a time sync by itself. Before that, the reply would be missed.
+    if lastTimesync is None or ticks_diff(ticks_ms(), lastTimesync) >= timesync.interval:
+        requestTimesync()
+    if lastTimesync is None:
+        return 1000
+    return max(1000, timesync.interval - ticks_diff(ticks_ms(), lastTimesync))
 
 
 mqtt_topic_base = "adafruit_matrix_clock/"
 mqtt_topic_prefix = mqtt_topic_base + secrets["matrix_portal_id"] + "/"
-mqtt_topic_time = mqtt_topic_base + "time"
+mqtt_topic_time = mqtt_topic_base + "time"  # Time sync requests go here. Replies come back on mqtt_topic_prefix + "time".
+mqtt_topic_time_tick = mqtt_topic_time + "/tick"  # Time broadcasts, if secrets["timesync_broadcast"] is set
+mqtt_topic_stats = mqtt_topic_prefix + "stats"
+mqtt_topic_boot = mqtt_topic_prefix + "boot"
+# Outside mqtt_topic_prefix: the log can be several KB, and coming back through the "#" subscription it would land in MiniMQTT's buffer
+mqtt_topic_log = mqtt_topic_base + "log/" + secrets["matrix_portal_id"]
+mqtt_own_topics = (mqtt_topic_stats, mqtt_topic_boot)  # What the clock publishes under mqtt_topic_prefix, which comes back to it through the "#" subscription
+mqtt_socket_timeout = settings.socket_timeout / 1000  # Seconds
+mqtt_poll_interval = 250  # Milliseconds between MQTT polls. The broker's messages wait in the ESP32's socket buffer until then.
+mqtt_reply_poll_interval = 50  # Milliseconds between MQTT polls while waiting for a time sync reply
+networkOk = False
+mqttReconnect = False  # Whether networkTick() should reconnect MQTT, to apply a changed setting
+mqttSubscribed = False  # Whether the subscriptions have been made since MQTT last connected
+mqtt_recv_timeout = 5  # Seconds MiniMQTT waits for the broker's CONNACK or SUBACK. Well under watchdog_timeout.
+clockShowsTime = False  # Whether the clock label shows synced time
+lineArgs = [None] * (layout.lines + 1)  # The last setLabel() arguments for each line
+pendingLines = [None] * (layout.lines + 1)  # Text from MQTT for each line, waiting for linesTick()
+lineApplied = [-9999999] * (layout.lines + 1)  # When linesTick() last set each line
+line_update_interval = 1000  # Milliseconds. Text from MQTT changes each line at most this often; the latest message wins.
+linesCoalesced = 0  # Line messages replaced by a later one before they were shown
+lineMessages = [None] * (layout.lines + 1)  # The last text from MQTT for each line, to go back to when its carousel is cleared
+carousels = [None] + [Carousel(1024) for _ in layout.line_numbers]  # Each line's pages from MQTT, at most 1 KB
+pageDue = [0] * (layout.lines + 1)  # Ticks at which each line's carousel shows its next page
+pagePrerendered = [True] * (layout.lines + 1)  # Whether each line's next page is in its bitmap cache
+bootProfilePublished = False
+stats_interval = 5 * 60000  # Milliseconds between publishes to mqtt_topic_stats
+watchdog_timeout = 15  # Seconds. The SAMD51's watchdog can't wait much longer than 16.
 
 # def connected(client, userdata, flags, rc):
 #    setSuccess("MQTT Connected")
@@ -416,84 +825,178 @@ def disconnected(client, userdata, rc):
     setError("MQTT Disconnected")
 
 
-def message(client, topic, message):
+def learnTime(message, result):
+    """Applies a time sync reply or broadcast that timesync has taken in. result describes what timesync did with it."""
     global lastTimesync
+    clockTask.wake()
+    try:
+        rtc.RTC().datetime = time.localtime(bptime())
+        lastTimesync = ticks_ms()
+        print("MQTT Timesync Completed: " + message + " (" + result + ")")
+        bootProfile.mark("timesync")
+    except OverflowError as e:
+        print("MQTT time out of range ({0})".format(message))
+        timesync.synced = False
+        bptime_learn_epochms(time.monotonic_ns() // 1000000)
+
+
+def configure(payload):
+    """Applies the settings in a message on mqtt_topic_prefix + "config", and keeps them in nvm for the next boot."""
     try:
-        if topic == mqtt_topic_time:
-            if message != "":
+        changed = settings.apply(payload)
+    except ValueError as e:
+        print("Config rejected: " + exprint(e))
+        setError("CONFIG: " + str(e))
+        logEvent("W", "config rejected: " + str(e))
+        return
+    settings.save()
+    if changed:
+        print("Config changed: " + ", ".join(changed))
+        logEvent("I", "config " + ",".join(changed))
+        applySettings(changed)
+
+
+def applySettings(changed):
+    """Puts the settings named in changed into effect."""
+    global frame_time, mqtt_socket_timeout, mqttReconnect
+    if "wifi" in changed:
+        status_light.fill(settings.wifi)  # The setting came over MQTT, so WiFi is up
+    if "frame" in changed:
+        frame_time = settings.frame / 1000
+        for lineNumber in layout.line_numbers:
+            lineLabels[lineNumber].animate_time = frame_time
+            lineTasks[lineNumber].wake()
+    if "sync" in changed:
+        timesync.min_interval = settings.sync * 1000
+        if timesync.synced:
+            timesync.interval = max(timesync.interval, timesync.min_interval)
+        timesyncTask.wake()
+    if "keep_alive" in changed:
+        mqtt_client.keep_alive = settings.keep_alive
+        mqttReconnect = True  # Not from in here: this runs inside mqtt_client.loop()
+    if "socket_timeout" in changed:
+        mqtt_socket_timeout = settings.socket_timeout / 1000
+        mqtt_client._socket_timeout = mqtt_socket_timeout  # MiniMQTT has no setter for it
+    if "bands" in changed:
+        clockTask.wake()
+
+
+def lineTopic(topic):
+    """The line number in a "lineN" or "lineN/pages" topic, if the display has that line, or else None."""
+    name = topic[len(mqtt_topic_prefix):]
+    if not name.startswith("line"):
+        return None
+    number = name[4:-6] if name.endswith("/pages") else name[4:]
+    if not number.isdigit() or int(number) not in layout.line_numbers:
+        return None
+    return int(number)
+
+
+def message(client, topic, message):
+    global displayProfileOverride
+    if topic in mqtt_own_topics:
+        return  # Our own publish
+    telemetry.record_message(topic[len(mqtt_topic_prefix):] if topic.startswith(mqtt_topic_prefix) else "time")
+    try:
+        if topic == mqtt_topic_prefix + "time" or topic == mqtt_topic_time or topic == mqtt_topic_time_tick:
+            # Empty and "?" messages are requests, seen on the shared topic by clocks using the old protocol
+            if message != "" and message[0] != "?":
                 try:
-                    bptime_learn_epochms(int(message))
-                    try:
-                        rtc.RTC().datetime = time.localtime(bptime())
-                        lastTimesync = performance_now()
-                        print("MQTT Timesync Completed: " + message)
-                    except OverflowError as e:
-                        print("MQTT time out of range ({0})".format(message))
-                        bptime_learn_epochms(time.monotonic_ns() // 1000000)
+                    if topic == mqtt_topic_time_tick:
+                        learnTime(message, timesync.tick(message, performance_now()))
+                    else:
+                        result = timesync.reply(message, performance_now())
+                        if result is not None:  # Otherwise it was someone else's reply
+                            telemetry.record_rtt(timesync.last_rtt)
+                            learnTime(message, result)
                 except ValueError as e:
                     print("timestamp from MQTT was invalid (" + message + ")")
         else:
             print("MQTT > {0}: {1}".format(topic, message))
-            if topic == mqtt_topic_prefix + "line1":
-                setLabelFromMqtt(1, message)
-            if topic == mqtt_topic_prefix + "line2":
-                setLabelFromMqtt(2, message)
+            lineNumber = lineTopic(topic)
+            if lineNumber:
+                if topic.endswith("/pages"):
+                    setPages(lineNumber, message)
+                else:
+                    queueLine(lineNumber, message)
+            if topic == mqtt_topic_prefix + "config":
+                configure(message)
+            if topic == mqtt_topic_prefix + "log/get":
+                publishEventLog()
+            if topic == mqtt_topic_prefix + "profile":
+                # A profile name stays on that profile. Anything else goes back to the schedule.
+                displayProfileOverride = message if message in display_profiles.profiles else None
+                clockTask.wake()
     except RuntimeError as e:
         print("MQTT message processing failed. {0}. Message was {2}: {3}".
               format(exprint(e, True), topic, message))
 
 
 # Set up a MiniMQTT Client
+# The broker's last good address, kept in nvm after the settings. Lookups only happen once a day, or when connecting fails.
+brokerHost = HostCache(secrets["mqttbroker"], lambda host: esp.pretty_ip(esp.get_host_by_name(host)),
+                       nvm=microcontroller.nvm, nvm_start=1280, nvm_size=64)
+if brokerHost.load():
+    print("Broker address from nvm: " + brokerHost.cached)
+# One socket pool for the whole run. Resetting the ESP32 closes its sockets but keeps the pool.
 pool = adafruit_connection_manager.get_radio_socketpool(esp)
 ssl_context = adafruit_connection_manager.get_radio_ssl_context(esp)
 mqtt_client = MQTT.MQTT(broker=secrets["mqttbroker"],
                         port=secrets["mqttport"],
                         username=secrets["mqttuser"],
                         password=secrets["mqttpass"],
-                        keep_alive=12,
+                        keep_alive=settings.keep_alive,
                         socket_pool=pool,
                         ssl_context=ssl_context,
-                        socket_timeout=0.1)
+                        socket_timeout=mqtt_socket_timeout,
+                        recv_timeout=mqtt_recv_timeout,
+                        connect_retries=1)  # recovery does the retrying, without blocking the display
 # mqtt_client.on_connect = connected
 mqtt_client.on_disconnect = disconnected
 mqtt_client.on_message = message
 
+networkTask = scheduler.add("network", networkTick)
+timesyncTask = scheduler.add("timesync", timesyncTick)
+statsTask = scheduler.add("stats", statsTick, stats_interval)
+bootProfile.mark("mqtt client")
+logEvent("B", "boot after watchdog reset" if microcontroller.cpu.reset_reason == microcontroller.ResetReason.WATCHDOG else "boot")
+
+
+def schedulerPass(ms):
+    telemetry.record_loop(ms)
+    watchdog.feed()
+
+
+# Resets the board if the scheduler stops making passes. Each network step blocks for at most about 10 seconds (a WiFi
+# connect timing out, or an MQTT connect waiting mqtt_recv_timeout for the broker to answer) and the scheduler never sleeps for longer than half the timeout, so only a call stuck for good trips it.
+watchdog = microcontroller.watchdog
+watchdog.timeout = watchdog_timeout
+watchdog.mode = WatchDogMode.RESET
+scheduler.max_wait = watchdog_timeout * 1000 // 2
+scheduler.on_pass = schedulerPass
+
 while True:
     try:
-        startTs = performance_now()
-        clockUpdate()
-        ScrollLabel(small_label1)
-        ScrollLabel(small_label2)
-        #crashDumpLabel.update()
-
-        allOk = False
-        if maintainWifi():
-            if maintainMqtt():
-                allOk = True
-                if lastTimesync + 60000 < performance_now():
-                    requestTimesync()
-        if allOk:
-            remainingMs = 200 - (performance_now() - startTs)
-            if remainingMs > 10:
-                time.sleep(remainingMs / 1000.0)
-        else:
-            loop_n_sec(1)
+        scheduler.run()
     except Exception as e:
         if type(e).__name__ == "KeyboardInterrupt":
             print("KeyboardInterrupt. Exiting program.")
             break
         try:
-            writeErrorFile(exprint(e, True))
+            logEvent("E", exprint(e, True, True))
             #supervisor.reload()
             print("Error in outer loop: " + exprint(e, True))
-            #crashDumpLabel.full_text = exprint(e, True)
+            showCrashDump(exprint(e, True))
             setError("LOOP ERROR: " + exprint(e, True, True))
             loop_n_sec(60)
+            showCrashDump(None)
         except Exception as e2:
             if type(e2).__name__ == "KeyboardInterrupt":
                 print("KeyboardInterrupt. Exiting program.")
                 break
             print("Error in outer loop error handler: " + exprint(e2, True))
-            #crashDumpLabel.full_text = exprint(e2, True)
+            logEvent("E", exprint(e2, True, True))
+            eventLog.flush(True)  # Only the display tasks run from here on
+            showCrashDump(exprint(e2, True))
             setError("LOOP INTERNAL ERROR: " + exprint(e2, True, True))
             loop_n_sec(172800)
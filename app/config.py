@@ -0,0 +1,129 @@
+# Settings that can be changed while the clock runs, from a retained MQTT message.
+#
+# The payload is "name=value" pairs separated by ";", e.g. "frame=40;keep_alive=30;wifi=0000FF".
+# It is the whole configuration: a setting left out goes back to its default, so an empty
+# payload (e.g. the retained message being cleared) restores all of them. Every value is
+# checked before any is applied, so a bad payload changes nothing.
+#
+# The last payload applied is cached in microcontroller.nvm, and load() applies it again at
+# boot, so the clock starts with the tuned settings instead of waiting for the broker.
+#
+# NVM layout: b"CF", version, a 2 byte big-endian length, then the payload in UTF-8.
+
+try:
+    from typing import Any, Callable, Dict, List, Tuple
+except ImportError:
+    pass
+
+_MAGIC = b"CF\x01"
+
+
+def integer(low: int, high: int) -> Callable[[str], int]:
+    """A parser for whole numbers from ``low`` to ``high``."""
+    def parse(text: str) -> int:
+        value = int(text)
+        if not low <= value <= high:
+            raise ValueError("must be {} to {}".format(low, high))
+        return value
+    return parse
+
+
+def color(text: str) -> int:
+    """Parses a "RRGGBB" hex color."""
+    if len(text) != 6 or not all(c in "0123456789ABCDEFabcdef" for c in text):
+        raise ValueError("must be RRGGBB")
+    return int(text, 16)
+
+
+def bands(text: str) -> List[Tuple[int, int]]:
+    """Parses "HOUR:RRGGBB,..." into ``(hour, color)`` for each hour of the day a color starts
+    at. The hours must go up. The last color carries on past midnight until the first one."""
+    result = []
+    for band in text.split(","):
+        hour, _, band_color = band.partition(":")
+        hour = integer(0, 23)(hour)
+        if result and hour <= result[-1][0]:
+            raise ValueError("hours must go up")
+        result.append((hour, color(band_color)))
+    return result
+
+
+class Config:
+    """Named settings, each with a parser and a default. Their current values are attributes.
+
+    :param dict fields: ``(parse, default)`` by setting name. ``parse`` turns the payload's text
+     for the setting into its value, raising ValueError if it isn't valid.
+    :param nvm: ``microcontroller.nvm``, or None to not cache the payload.
+    :param int nvm_start: Offset of the region of ``nvm`` to use.
+    :param int nvm_size: Size of that region, in bytes."""
+
+    def __init__(self, fields: Dict[str, Tuple[Callable[[str], Any], Any]], nvm=None, nvm_start: int = 0,
+                 nvm_size: int = 256) -> None:
+        self.fields = fields
+        self.nvm = nvm
+        self.nvm_start = nvm_start
+        self.nvm_size = nvm_size
+        self.payload = ""
+        for name in fields:
+            setattr(self, name, fields[name][1])
+
+    def parse(self, payload: str) -> Dict[str, Any]:
+        """Every setting's value under ``payload``. Raises ValueError, naming the setting, if
+        the payload isn't valid."""
+        values = {}
+        for name in self.fields:
+            values[name] = self.fields[name][1]
+        for pair in payload.split(";"):
+            pair = pair.strip()
+            if not pair:
+                continue
+            name, _, text = pair.partition("=")
+            name = name.strip()
+            if name not in self.fields:
+                raise ValueError("unknown setting " + name)
+            try:
+                values[name] = self.fields[name][0](text.strip())
+            except ValueError as e:
+                raise ValueError(name + ": " + str(e)) from e
+        return values
+
+    def apply(self, payload: str) -> List[str]:
+        """Applies ``payload`` if it is valid, or else raises ValueError and changes nothing.
+        Returns the names of the settings that changed."""
+        values = self.parse(payload)
+        changed = []
+        for name in values:
+            if getattr(self, name) != values[name]:
+                setattr(self, name, values[name])
+                changed.append(name)
+        self.payload = payload
+        return changed
+
+    def load(self) -> bool:
+        """Applies the payload cached in nvm, if there is a valid one. Returns True if there was."""
+        if self.nvm is None:
+            return False
+        data = self.nvm[self.nvm_start:self.nvm_start + self.nvm_size]
+        if data[0:3] != _MAGIC:
+            return False
+        length = int.from_bytes(data[3:5], "big")
+        if 5 + length > len(data):
+            return False
+        try:
+            self.apply(str(data[5:5 + length], "utf-8"))
+        except (UnicodeError, ValueError):
+            return False  # Cached by a version with other settings, or damaged
+        return True
+
+    def save(self) -> bool:
+        """Caches the applied payload in nvm, unless it is already there or doesn't fit.
+        Returns True if nvm was written."""
+        if self.nvm is None:
+            return False
+        encoded = self.payload.encode("utf-8")
+        data = _MAGIC + len(encoded).to_bytes(2, "big") + encoded
+        start = self.nvm_start
+        if len(data) > self.nvm_size or self.nvm[start:start + len(data)] == data:
+            return False
+        self.nvm[start:start + len(data)] = data
+        return True
@@ -0,0 +1,61 @@
+# Display profiles: how many bits of color depth the RGB matrix runs at, by time of day.
+#
+# The matrix is refreshed from an interrupt, and the deeper the color the more of the CPU
+# that takes. At night the clock only shows a few dim solid colors, so it can run at a lower
+# depth and give the main loop the difference. The depth is fixed when the matrix is
+# created, so changing profile means releasing the display and making a new matrix.
+#
+# At a lower depth, channels below 256 >> bit_depth are drawn as off. visible_color() raises
+# them to the dimmest level that still lights, so dim text doesn't vanish.
+
+import time
+
+try:
+    from typing import Dict, List, Optional, Tuple
+except ImportError:
+    pass
+
+
+class DisplayProfiles:
+    """Picks a profile by the hour.
+
+    :param dict profiles: Bit depth by profile name.
+    :param list schedule: ``(hour, name)`` for each hour of the day a profile starts at,
+     in order. The last one carries on past midnight until the first one."""
+
+    def __init__(self, profiles: Dict[str, int], schedule: List[Tuple[int, str]]) -> None:
+        self.profiles = profiles
+        self.schedule = schedule
+
+    def for_hour(self, hour: int) -> str:
+        """The scheduled profile at ``hour`` (0-23)."""
+        name = self.schedule[-1][1]
+        for start, profile in self.schedule:
+            if hour >= start:
+                name = profile
+        return name
+
+
+def visible_color(color: int, bit_depth: int) -> int:
+    """``color`` with each channel that is on raised to at least the dimmest level shown at ``bit_depth``."""
+    least = 0x100 >> bit_depth
+    result = 0
+    for shift in (16, 8, 0):
+        channel = (color >> shift) & 0xFF
+        if 0 < channel < least:
+            channel = least
+        result |= channel << shift
+    return result
+
+
+def measure_headroom(iterations: int = 5000) -> Optional[float]:
+    """Runs an empty loop and returns how many iterations per millisecond the main loop got
+    through, or None if the clock didn't tick. It runs slower the more of the CPU the matrix
+    refresh interrupt takes, so comparing it across profiles shows what each one costs."""
+    start = time.monotonic_ns()
+    for _ in range(iterations):
+        pass
+    elapsed = time.monotonic_ns() - start
+    if elapsed <= 0:
+        return None
+    return round(iterations * 1000000 / elapsed, 1)
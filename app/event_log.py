@@ -0,0 +1,134 @@
+# Error and event log kept in RAM, with the newest records saved to microcontroller.nvm.
+#
+# add() only touches a fixed-size ring in RAM, so logging an error costs no flash writes and
+# no filesystem remount. flush() copies as many of the newest records as fit into a fixed
+# region of nvm, at most once per flush_interval unless forced (e.g. right before a reload),
+# and skips the write entirely if the bytes there are already the same. load() reads them
+# back at boot, so the history survives reloads and power cycles.
+#
+# NVM layout: b"EL", version, record count, then per record a 4 byte big-endian epoch second
+# (0 if the time wasn't known yet), a 1 byte kind, a 1 byte length and that many bytes of
+# UTF-8 text.
+
+import json
+import time
+
+try:
+    from typing import List, Optional, Tuple
+except ImportError:
+    pass
+
+_MAGIC = b"EL\x01"
+MAX_TEXT = 160  # Longer messages keep their end, which is where a traceback names the error
+
+
+def _now() -> int:
+    return time.monotonic_ns() // 1000000
+
+
+class EventLog:
+    """A ring of ``(epoch seconds, kind, text)`` records.
+
+    :param int capacity: How many records are kept in RAM.
+    :param nvm: ``microcontroller.nvm``, or None to keep records in RAM only.
+    :param int nvm_start: Offset of the region of ``nvm`` to use.
+    :param int nvm_size: Size of that region, in bytes.
+    :param int flush_interval: The least milliseconds between unforced nvm writes."""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, capacity: int = 32, nvm=None, nvm_start: int = 0, nvm_size: int = 1024,
+                 flush_interval: int = 15 * 60000) -> None:
+        self.capacity = capacity
+        self.nvm = nvm
+        self.nvm_start = nvm_start
+        self.nvm_size = nvm_size
+        self.flush_interval = flush_interval
+        self.dirty = False
+        self.flushes = 0
+        self._records = [None] * capacity
+        self._next = 0  # Slot the next record goes in
+        self._count = 0
+        self._last_flush = _now()  # So a boot loop doesn't write on every boot
+
+    def add(self, epoch: int, kind: str, text: str) -> None:
+        """Records ``text`` with a one letter ``kind`` (e.g. "E" for errors) at ``epoch`` seconds."""
+        if len(text) > MAX_TEXT:
+            text = text[-MAX_TEXT:]
+        self._records[self._next] = (epoch, kind, text)
+        self._next = (self._next + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+        self.dirty = True
+
+    def records(self) -> List[Tuple[int, str, str]]:
+        """The records, oldest first."""
+        first = self._next - self._count
+        return [self._records[(first + i) % self.capacity] for i in range(self._count)]
+
+    def load(self) -> int:
+        """Adds the records saved in nvm (by this or an earlier boot). Returns how many there were."""
+        if self.nvm is None:
+            return 0
+        data = self.nvm[self.nvm_start:self.nvm_start + self.nvm_size]
+        if data[0:3] != _MAGIC:
+            return 0
+        count = data[3]
+        i = 4
+        for _ in range(count):
+            if i + 6 > len(data):
+                break
+            epoch = int.from_bytes(data[i:i + 4], "big")
+            length = data[i + 5]
+            try:
+                text = str(data[i + 6:i + 6 + length], "utf-8")
+            except UnicodeError:
+                text = None  # Skip just this one. Its length still says where the next one starts.
+            if text is not None:
+                self.add(epoch, chr(data[i + 4]), text)
+            i += 6 + length
+        self.dirty = False  # Nothing new to save
+        return count
+
+    def flush(self, force: bool = False) -> bool:
+        """Saves the newest records that fit to nvm, if any were added since the last flush and
+        either ``force`` is set or ``flush_interval`` has passed since the last flush (or since
+        the log was created). Returns True if nvm was written."""
+        if self.nvm is None or not self.dirty:
+            return False
+        now = _now()
+        if not force and now - self._last_flush < self.flush_interval:
+            return False
+        encoded = []
+        size = 4
+        for epoch, kind, text in reversed(self.records()):
+            text = text.encode("utf-8")
+            if len(text) > 255:
+                # Keep the end, like add(), from the start of a character
+                start = len(text) - 255
+                while text[start] & 0xC0 == 0x80:
+                    start += 1
+                text = text[start:]
+            if size + 6 + len(text) > self.nvm_size or len(encoded) == 255:
+                break
+            encoded.append(epoch.to_bytes(4, "big") + bytes((ord(kind), len(text))) + text)
+            size += 6 + len(text)
+        encoded.reverse()
+        data = _MAGIC + bytes((len(encoded),)) + b"".join(encoded)
+        self.dirty = False
+        self._last_flush = now
+        start = self.nvm_start
+        if self.nvm[start:start + len(data)] == data:
+            return False
+        self.nvm[start:start + len(data)] = data
+        self.flushes += 1
+        return True
+
+    def due(self) -> Optional[int]:
+        """Milliseconds until an unforced flush() would write, or None if there is nothing to save."""
+        if self.nvm is None or not self.dirty:
+            return None
+        return max(0, self._last_flush + self.flush_interval - _now())
+
+    def to_json(self) -> str:
+        """The records as JSON, for publishing."""
+        return json.dumps([list(record) for record in self.records()])
@@ -0,0 +1,83 @@
+# Loader for the subsetted ".gpk" glyph packs built by extra_source/build_fonts.py.
+#
+# A glyph pack holds only the characters the clock actually draws, already unpacked into
+# 1-bit rows, so loading one is a single pass over a small file instead of a walk through
+# the PCF tables. Every glyph is loaded up front, which also makes the "preload every
+# character" workaround for scrolling labels unnecessary.
+
+import struct
+from fontio import Glyph
+
+try:
+    from bitmaptools import readinto as _bitmap_readinto
+except ImportError:
+    _bitmap_readinto = None
+
+try:
+    from typing import Iterable, Optional, Tuple, Union
+    from displayio import Bitmap
+except ImportError:
+    pass
+
+MAGIC = b"GPK1"
+# magic, ascent, descent, bounding box (width, height, x offset, y offset), glyph count
+HEADER_FORMAT = "<4shhhhhhH"
+# code point, width, height, dx, dy, shift_x, (pad), offset of the rows in the bitmap area
+GLYPH_FORMAT = "<HBBbbbxI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+GLYPH_SIZE = struct.calcsize(GLYPH_FORMAT)
+
+
+class GlyphPackFont:
+    """A font whose glyphs were all loaded from a glyph pack. Implements the same interface
+    as the fonts returned by ``adafruit_bitmap_font.bitmap_font.load_font()``."""
+
+    def __init__(self, ascent: int, descent: int, bounding_box: Tuple[int, int, int, int]) -> None:
+        self.ascent = ascent
+        self.descent = descent
+        self._bounding_box = bounding_box
+        self._glyphs = {}
+
+    def get_bounding_box(self) -> Tuple[int, int, int, int]:
+        """Return the maximum glyph size as a 4-tuple of: width, height, x_offset, y_offset"""
+        return self._bounding_box
+
+    def get_glyph(self, code_point: int) -> Optional[Glyph]:
+        """Returns the glyph for the code point, or None if the pack doesn't include it."""
+        return self._glyphs.get(code_point)
+
+    def load_glyphs(self, code_points: Union[int, str, Iterable[int]]) -> None:
+        """Does nothing. Every glyph in a pack is loaded by load_font()."""
+
+
+def load_font(filename: str, bitmap: Optional[Bitmap] = None) -> GlyphPackFont:
+    """Loads a glyph pack. Raises OSError if the file doesn't exist."""
+    if not bitmap:
+        import displayio  # pylint: disable=import-outside-toplevel
+
+        bitmap = displayio.Bitmap
+    with open(filename, "rb") as f:
+        magic, ascent, descent, bb_w, bb_h, bb_x, bb_y, count = struct.unpack(
+            HEADER_FORMAT, f.read(HEADER_SIZE))
+        if magic != MAGIC:
+            raise ValueError("Unknown magic number %r" % magic)
+        records = f.read(count * GLYPH_SIZE)
+        data_start = HEADER_SIZE + count * GLYPH_SIZE
+        data = None if _bitmap_readinto else f.read()
+        font = GlyphPackFont(ascent, descent, (bb_w, bb_h, bb_x, bb_y))
+        for i in range(count):
+            code_point, width, height, dx, dy, shift_x, offset = struct.unpack_from(
+                GLYPH_FORMAT, records, i * GLYPH_SIZE)
+            bmp = bitmap(width, height, 2)
+            if _bitmap_readinto:
+                f.seek(data_start + offset)
+                _bitmap_readinto(bmp, f, bits_per_pixel=1, element_size=1)
+            else:
+                stride = (width + 7) // 8
+                for y in range(height):
+                    row = offset + y * stride
+                    for x in range(width):
+                        if data[row + x // 8] & (128 >> (x % 8)):
+                            bmp[x, y] = 1
+            font._glyphs[code_point] = Glyph(bmp, 0, width, height, dx, dy, shift_x, 0)
+    return font
@@ -0,0 +1,116 @@
+# Remembers the broker's IP address, so reconnecting doesn't depend on DNS.
+#
+# Hostname lookups through the ESP32 fail now and then ("Failed to request hostname"), and
+# resetting the ESP32 doesn't fix them. MiniMQTT looks its broker up on every connect, so
+# one bad spell of DNS used to run recovery all the way to reloading code.py, over and over.
+# address() only looks the host up once the last good address is older than ttl, or after
+# expire() (e.g. connecting to it failed), and if that lookup fails it carries on with the
+# last good address. The address is saved in microcontroller.nvm along with when it was
+# looked up, so a reload or power cycle needs no lookup either.
+#
+# NVM layout: b"HC", version, a 4 byte big-endian epoch second of the lookup (0 if the time
+# wasn't known yet), the 4 address bytes, a 1 byte length, then the hostname in UTF-8 (so a
+# different host in secrets.py isn't answered from the cache).
+
+try:
+    from typing import Callable, Optional
+except ImportError:
+    pass
+
+_MAGIC = b"HC\x01"
+
+
+def is_address(host: str) -> bool:
+    """Whether ``host`` is an IPv4 address, which needs no lookup."""
+    parts = host.split(".")
+    return len(parts) == 4 and all(part.isdigit() for part in parts)
+
+
+class HostCache:
+    """The address of one host.
+
+    :param str host: The hostname (or IP address) to look up.
+    :param lookup: Called with ``host``, returns its address as "a.b.c.d". Raises RuntimeError
+     or OSError if the lookup fails.
+    :param int ttl: Seconds to use a looked up address for before looking the host up again.
+    :param nvm: ``microcontroller.nvm``, or None to keep the address in RAM only.
+    :param int nvm_start: Offset of the region of ``nvm`` to use.
+    :param int nvm_size: Size of that region, in bytes."""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, host: str, lookup: Callable[[str], str], ttl: int = 24 * 3600, nvm=None,
+                 nvm_start: int = 0, nvm_size: int = 64) -> None:
+        self.host = host
+        self.lookup = lookup
+        self.ttl = ttl
+        self.nvm = nvm
+        self.nvm_start = nvm_start
+        self.nvm_size = nvm_size
+        self.cached = None  # The last good address
+        self.looked_up = 0  # Epoch second of the lookup that found it, 0 if the time wasn't known
+        self.stale = False  # Whether to look the host up again even though ttl hasn't passed
+        self.lookups = 0
+        self.fallbacks = 0  # Failed lookups answered with the last good address
+        self._saved = 0  # looked_up as saved in nvm
+
+    def address(self, now: int = 0) -> str:
+        """The address to connect to, at ``now`` epoch seconds (0 if the time isn't known yet,
+        in which case the cached address is trusted however old it is). Raises what ``lookup`` raised if the
+        host had to be looked up and there is no earlier address to fall back on."""
+        if is_address(self.host):
+            return self.host
+        if self.cached is not None and not self.stale and (not now or self.looked_up
+                                                           and now - self.looked_up < self.ttl):
+            return self.cached
+        self.lookups += 1
+        try:
+            address = self.lookup(self.host)
+        except (RuntimeError, OSError):
+            if self.cached is None:
+                raise
+            self.fallbacks += 1
+            return self.cached
+        changed = address != self.cached
+        self.cached = address
+        self.looked_up = now
+        self.stale = False
+        # A lookup that only confirms the address is saved once the saved one is half way to
+        # expiring, so a long outage of reconnects doesn't wear out the flash.
+        if changed or now - self._saved >= self.ttl // 2:
+            self.save()
+        return address
+
+    def expire(self) -> None:
+        """Makes the next address() look the host up again, e.g. because connecting to the
+        cached address failed. The address is still used if that lookup fails."""
+        if self.cached is not None:
+            self.stale = True
+
+    def load(self) -> Optional[str]:
+        """Reads the address saved in nvm by an earlier boot. Returns it, or None if there was
+        none for this host."""
+        if self.nvm is None:
+            return None
+        data = self.nvm[self.nvm_start:self.nvm_start + self.nvm_size]
+        if data[0:3] != _MAGIC or len(data) < 12:
+            return None
+        length = data[11]
+        if data[12:12 + length] != self.host.encode("utf-8"):
+            return None
+        self.cached = "{}.{}.{}.{}".format(data[7], data[8], data[9], data[10])
+        self.looked_up = self._saved = int.from_bytes(data[3:7], "big")
+        return self.cached
+
+    def save(self) -> bool:
+        """Saves the address to nvm, if it fits and isn't there already. Returns True if nvm was written."""
+        host = self.host.encode("utf-8")
+        if self.nvm is None or self.cached is None or len(host) > 255:
+            return False
+        data = (_MAGIC + self.looked_up.to_bytes(4, "big") + bytes(int(part) for part in self.cached.split("."))
+                + bytes((len(host),)) + host)
+        start = self.nvm_start
+        if len(data) > self.nvm_size or self.nvm[start:start + len(data)] == data:
+            return False
+        self.nvm[start:start + len(data)] = data
+        self._saved = self.looked_up
+        return True
@@ -0,0 +1,56 @@
+# Where the clock and the text lines go, worked out from the size of the display.
+#
+# The layout was drawn for one 64x32 panel: the clock in the top 20 rows, then two lines of
+# the small font, 6 rows each, with the status line (line 2) at the bottom. Chained panels
+# make a bigger canvas. The clock is scaled up by whole pixels as far as both the width and
+# the height allow (2x on 128x64), the lines are as wide as the display, and the rows under
+# the clock hold as many lines as fit. From the top they are line 1, then 3, 4 and so on,
+# with line 2 still at the bottom.
+
+try:
+    from typing import Tuple
+except ImportError:
+    pass
+
+CLOCK_WIDTH = 64  # Pixels across the clock needs at scale 1
+CLOCK_HEIGHT = 20  # Rows the clock takes at scale 1, with the gap under it
+CLOCK_Y = 9  # The clock's y at scale 1, as for a Label of the clock font
+
+
+class Layout:
+    """The layout for a display of the given size.
+
+    :param int width: The width of the display, in pixels.
+    :param int height: The height of the display, in pixels.
+    :param int char_width: How far apart the small font's characters are.
+    :param int line_height: Rows each line of the small font takes."""
+
+    def __init__(self, width: int, height: int, char_width: int = 4, line_height: int = 6) -> None:
+        self.width = width
+        self.height = height
+        self.line_height = line_height
+        # Scaled up only as far as still leaves room for two lines under it
+        self.clock_scale = max(1, min(width // CLOCK_WIDTH, height // (CLOCK_HEIGHT + 2 * line_height)))
+        self.clock_y = CLOCK_Y * self.clock_scale
+        self.clock_area = (0, 0, width, CLOCK_HEIGHT * self.clock_scale)
+        self.lines = max(2, (height - CLOCK_HEIGHT * self.clock_scale) // line_height)
+        self.line_chars = width // char_width
+        self.line_numbers = tuple(range(1, self.lines + 1))
+        self.crash_lines = height // line_height
+        # The areas are worked out once here, so marking one dirty allocates nothing.
+        self._line_y = [0] * (self.lines + 1)
+        self.line_areas = [None] * (self.lines + 1)
+        for line in self.line_numbers:
+            row = 0 if line == 1 else self.lines - 1 if line == 2 else line - 2  # From the top
+            y = height - line_height // 2 - line_height * (self.lines - 1 - row)
+            self._line_y[line] = y
+            self.line_areas[line] = (0, y - line_height // 2, width, line_height)
+
+    def line_y(self, line: int) -> int:
+        """The y of line ``line``, for a Label of the small font."""
+        return self._line_y[line]
+
+    def describe(self) -> str:
+        """A summary for the console, e.g. "128x64: clock x2, 4 lines of 32 characters"."""
+        return "{}x{}: clock x{}, {} lines of {} characters".format(
+            self.width, self.height, self.clock_scale, self.lines, self.line_chars)
@@ -0,0 +1,79 @@
+# Escalating recovery from network failures, with exponential backoff.
+#
+# Each failed attempt to get back online waits longer than the one before (with jitter, so
+# a fleet of clocks that lost the same broker doesn't reconnect in lockstep). When a step has
+# used up its tries, the next step's action runs before the next attempt: first plain MQTT
+# reconnects, then dropping WiFi, then resetting the ESP32, and only then reloading code.py,
+# which is the only step that loses the display, the fonts and the time.
+
+import random
+
+try:
+    from typing import Callable, List, Optional, Tuple
+except ImportError:
+    pass
+
+
+class Recovery:
+    """Tracks one outage at a time and decides what to do about it.
+
+    :param steps: ``(name, tries, action)`` for each step, mildest first. ``action`` is called
+     (with no arguments) when the step begins, or is None if nothing needs doing.
+    :param int base_delay: Milliseconds to wait after the first failure.
+    :param int max_delay: The longest wait between attempts, in milliseconds."""
+
+    def __init__(self, steps: List[Tuple[str, int, Optional[Callable[[], None]]]], base_delay: int = 1000,
+                 max_delay: int = 60000) -> None:
+        self.steps = steps
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failing_since = None
+        self.step = 0
+        self.recoveries = 0
+        self.escalations = [0] * len(steps)  # How many times each step has been started
+        self.last_report = None
+        self._failures = 0
+        self._tries = 0
+        self._step_since = 0
+        self._step_times = []
+
+    def failed(self, now: int, last_step: bool = True) -> int:
+        """Records a failed attempt at monotonic time ``now`` (in milliseconds), escalating to
+        the next step if this one has used up its tries. With ``last_step`` False it stops
+        short of the last step (e.g. while WiFi is down, which reloading can't fix). Returns
+        the milliseconds to wait before the next attempt."""
+        if self.failing_since is None:
+            self.failing_since = now
+            self.step = 0
+            self._failures = 0
+            self._tries = 0
+            self._step_since = now
+            self._step_times = []
+        self._failures += 1
+        self._tries += 1
+        if self._tries >= self.steps[self.step][1] and self.step + 1 < len(self.steps) - (0 if last_step else 1):
+            self._step_times.append((self.steps[self.step][0], self._tries, now - self._step_since))
+            self.step += 1
+            self.escalations[self.step] += 1
+            self._tries = 0
+            self._step_since = now
+            name, tries, action = self.steps[self.step]
+            print("Network recovery: " + name)
+            if action:
+                action()
+        delay = min(self.max_delay, self.base_delay << min(self._failures - 1, 16))
+        return delay // 2 + random.randint(0, delay // 2)
+
+    def succeeded(self, now: int) -> Optional[str]:
+        """Records a successful attempt. Returns a report of how long each step of the outage
+        took if this ends one, otherwise None."""
+        if self.failing_since is None:
+            return None
+        self._step_times.append((self.steps[self.step][0], self._tries, now - self._step_since))
+        self.last_report = "Recovered after {:.1f} s: {}".format(
+            (now - self.failing_since) / 1000,
+            ", ".join("{} {:.1f} s ({} failed)".format(name, ms / 1000, tries)
+                      for name, tries, ms in self._step_times))
+        self.recoveries += 1
+        self.failing_since = None
+        return self.last_report
@@ -0,0 +1,129 @@
+# Redraws the display only when something on it has changed.
+#
+# With auto_refresh on, displayio redraws the panel on its own schedule whether or not any
+# pixel changed. The coordinator turns auto_refresh off, code.py routes label changes
+# through set_attr() (or calls invalidate() after changing pixels some other way), and
+# refresh() pushes at most one frame per 1/max_fps seconds, and only if something is dirty.
+#
+# Callers say which area they changed, and the coordinator keeps the rectangle around all of
+# them until the next refresh. displayio itself only composites the layers that changed, so
+# the rectangle doesn't steer the refresh. It is counted into coverage_per_minute, which shows
+# whether updates stay local: a scroll on one line of a 128x64 chain should cover a tenth of
+# it, not all of it.
+
+from ticks import ticks_add, ticks_diff, ticks_ms
+
+try:
+    from typing import Any, Callable, Optional, Tuple
+except ImportError:
+    pass
+
+
+class RenderCoordinator:
+    """Tracks whether the display is dirty and refreshes it manually.
+
+    :param display: The display whose ``root_group`` is drawn.
+    :param int max_fps: The most refreshes per second to do, however often things change.
+    :param on_dirty: Called (with no arguments) when the display goes from clean to dirty,
+     e.g. to wake the task that calls refresh()."""
+
+    def __init__(self, display, max_fps: int = 20, on_dirty: Optional[Callable[[], Any]] = None) -> None:
+        self.display = display
+        self.min_interval = 1000 // max_fps
+        self.on_dirty = on_dirty
+        self.dirty = True  # Draw the first frame
+        self.refreshes = 0
+        self.refreshes_per_minute = 0
+        self.coverage_per_minute = 0  # Percent of the display the last minute's refreshes covered, on average
+        self._x1 = self._y1 = 0  # The dirty rectangle, all of the display for the first frame. Empty while clean.
+        self._x2 = display.width
+        self._y2 = display.height
+        self._minute_pixels = 0
+        self._last_refresh = None  # Ticks of the last refresh
+        self._minute_start = ticks_ms()
+        self._minute_refreshes = 0
+        display.auto_refresh = False
+
+    def set_display(self, display) -> None:
+        """Switches to a new display (e.g. the matrix was recreated) and draws a frame on it."""
+        self.display = display
+        display.auto_refresh = False
+        self.invalidate()
+
+    def invalidate(self, area: Optional[Tuple[int, int, int, int]] = None) -> None:
+        """Marks ``area`` of the display, as ``(x, y, width, height)``, as needing a refresh.
+        The default is all of it."""
+        if area is None:
+            x1 = y1 = 0
+            x2 = self.display.width
+            y2 = self.display.height
+        else:
+            x1 = area[0]
+            y1 = area[1]
+            x2 = x1 + area[2]
+            y2 = y1 + area[3]
+        if self._x1 == self._x2:
+            self._x1 = x1
+            self._y1 = y1
+            self._x2 = x2
+            self._y2 = y2
+        else:
+            self._x1 = min(self._x1, x1)
+            self._y1 = min(self._y1, y1)
+            self._x2 = max(self._x2, x2)
+            self._y2 = max(self._y2, y2)
+        if not self.dirty:
+            self.dirty = True
+            if self.on_dirty:
+                self.on_dirty()
+
+    def set_attr(self, obj, name: str, value, area: Optional[Tuple[int, int, int, int]] = None) -> None:
+        """Sets ``obj.name = value`` and marks ``area`` dirty (see invalidate()), unless it
+        already has that value."""
+        if getattr(obj, name) != value:
+            setattr(obj, name, value)
+            self.invalidate(area)
+
+    def roll_minute(self, now: Optional[int] = None) -> None:
+        """Updates refreshes_per_minute and coverage_per_minute and starts counting again, if a
+        minute has gone by. refresh() calls it, but call it while the display is idle too, or
+        a quiet spell stretches one minute over several."""
+        if now is None:
+            now = ticks_ms()
+        elapsed = ticks_diff(now, self._minute_start)
+        if elapsed < 60000:
+            return
+        if elapsed >= 120000:  # Everything counted was in an earlier minute. The last one had no refreshes.
+            self._minute_refreshes = 0
+            self._minute_pixels = 0
+        self.refreshes_per_minute = self._minute_refreshes
+        self.coverage_per_minute = 0
+        if self._minute_refreshes:
+            self.coverage_per_minute = round(100 * self._minute_pixels / self._minute_refreshes
+                                             / (self.display.width * self.display.height), 1)
+        self._minute_refreshes = 0
+        self._minute_pixels = 0
+        self._minute_start = ticks_add(self._minute_start, elapsed // 60000 * 60000)
+
+    def refresh(self) -> Optional[int]:
+        """Refreshes the display if it is dirty and the frame rate cap allows. Returns the
+        milliseconds until it may refresh if it still needs to, or None if it is clean."""
+        now = ticks_ms()
+        self.roll_minute(now)
+        if not self.dirty:
+            return None
+        if self._last_refresh is not None:
+            wait = ticks_diff(ticks_add(self._last_refresh, self.min_interval), now)
+            if 0 < wait <= self.min_interval:  # More and the last refresh was too long ago to tell
+                return wait
+        self.dirty = False
+        self.display.refresh(minimum_frames_per_second=0)
+        self._last_refresh = now
+        self.refreshes += 1
+        self._minute_refreshes += 1
+        width = min(self._x2, self.display.width) - max(self._x1, 0)
+        height = min(self._y2, self.display.height) - max(self._y1, 0)
+        if width > 0 and height > 0:
+            self._minute_pixels += width * height
+        self._x1 = self._x2 = 0
+        return None
@@ -6,11 +6,15 @@
 secrets = {
     "ssid" : '',
     "password" : '', # WiFi password
-    "mqttbroker" : "", # IP address recommended. DNS lookup is a bit flakey in my experience
+    "mqttbroker" : "", # IP address recommended. DNS lookup is a bit flakey in my experience, so the last good address of a hostname is cached in nvm
     "mqttport" : 1883,
     "mqttuser" : "",
     "mqttpass" : "",
     "color_nowifi" : (51, 0, 0), # Neopixel on the back will be this color while WiFi is not connected.
     "color_wifi" : (0, 0, 0), # Neopixel on the back will be this color while WiFi is connected.
-    "matrix_portal_id" : "1" # Change this string if you run multiple clocks with this software and want them to load different strings from MQTT.
+    "matrix_portal_id" : "1", # Change this string if you run multiple clocks with this software and want them to load different strings from MQTT.
+    "matrix_width" : 64, # Pixels across all the chained panels, e.g. 128 for two 64x32 panels side by side.
+    "matrix_height" : 32, # Pixels down, e.g. 64 for two 64x32 panels chained and folded into two rows (with matrix_tile_rows 2).
+    "matrix_tile_rows" : 1, # Rows the chain of panels is folded into. The clock and the text lines are laid out to fit the size.
+    "timesync_broadcast" : False # Set True if the time server broadcasts the time on adafruit_matrix_clock/time/tick, to listen for that instead of asking every minute.
     }
@@ -0,0 +1,126 @@
+# Deadline-driven cooperative scheduler for code.py.
+#
+# Each task is a callback that returns how many milliseconds until it next wants to run,
+# or None to sleep until something calls wake() on it. The scheduler runs whichever tasks
+# are due and then sleeps until the earliest deadline, instead of waking on a fixed period
+# whether or not anything can have changed.
+#
+# Deadlines are in ticks (see ticks.py), so a pass of the loop doesn't allocate.
+#
+# With a budget, a pass stops starting tasks once it has run for that long, and the rest
+# (still due) run on the next pass, after the tasks ahead of them in the list have had
+# another turn. Tasks that do slow work in steps can check budget_left() to yield between
+# them. A single task run that takes longer than the whole budget is counted as an overrun.
+
+import time
+from ticks import ticks_add, ticks_diff, ticks_ms
+
+try:
+    from typing import Callable, List, Optional
+except ImportError:
+    pass
+
+
+class Task:
+    """A callback and the ticks at which it should next run. ``deadline`` is None while
+    the task is idle."""
+
+    def __init__(self, name: str, callback: Callable[[], Optional[int]], deadline: Optional[int]) -> None:
+        self.name = name
+        self.callback = callback
+        self.deadline = deadline
+        self.runs = 0
+        self.overruns = 0  # Runs that took longer than the scheduler's budget
+
+    def wake(self, delay: int = 0) -> None:
+        """Makes the task due ``delay`` milliseconds from now, unless it is already due sooner."""
+        deadline = ticks_add(ticks_ms(), delay)
+        if self.deadline is None or ticks_diff(deadline, self.deadline) < 0:
+            self.deadline = deadline
+
+
+class Scheduler:
+    """Runs tasks at their own deadlines. ``tasks`` is in the order due tasks are run.
+
+    :param int budget: Milliseconds a pass may spend running tasks before it leaves the rest
+     for the next pass, or None for no limit."""
+
+    def __init__(self, budget: Optional[int] = None) -> None:
+        self.tasks = []
+        self.budget = budget
+        self.overruns = 0
+        self.on_pass = None  # Called with the milliseconds each pass of run() spent running tasks
+        self.max_wait = None  # The longest run() sleeps between passes, e.g. so on_pass can feed a watchdog
+        self._pass_start = ticks_ms()
+
+    def add(self, name: str, callback: Callable[[], Optional[int]], delay: Optional[int] = 0) -> Task:
+        """Registers a task that first runs ``delay`` milliseconds from now (None: when woken)."""
+        task = Task(name, callback, None if delay is None else ticks_add(ticks_ms(), delay))
+        self.tasks.append(task)
+        return task
+
+    def run_due(self, tasks: Optional[List[Task]] = None) -> Optional[int]:
+        """Runs every task in ``tasks`` (default: all of them) whose deadline has passed.
+        Returns the milliseconds until the earliest deadline among them afterwards (0 if
+        one is already due), or None if they are all idle."""
+        if tasks is None:
+            tasks = self.tasks
+        now = start = self._pass_start = ticks_ms()
+        for task in tasks:
+            due = task.deadline
+            if due is None or ticks_diff(due, now) > 0:
+                continue
+            if self.budget is not None and ticks_diff(now, start) >= self.budget:
+                break  # Out of time. The rest are still due, so the next pass starts at once.
+            task.deadline = None
+            try:
+                delay = task.callback()
+            except Exception:
+                task.deadline = due  # Still due. It runs again once the caller has handled the error.
+                raise
+            task.runs += 1
+            if delay is not None:
+                task.wake(delay)
+            ran = now
+            now = ticks_ms()
+            if self.budget is not None and ticks_diff(now, ran) > self.budget:
+                task.overruns += 1
+                self.overruns += 1
+        earliest = None
+        for task in tasks:
+            if task.deadline is not None:
+                wait = ticks_diff(task.deadline, now)
+                if earliest is None or wait < earliest:
+                    earliest = wait
+        return None if earliest is None else max(0, earliest)
+
+    def budget_left(self) -> Optional[int]:
+        """Milliseconds left of the current pass's budget (negative once it is used up), or
+        None if there is no budget."""
+        if self.budget is None:
+            return None
+        return self.budget - ticks_diff(ticks_ms(), self._pass_start)
+
+    def run(self, duration: Optional[int] = None, tasks: Optional[List[Task]] = None) -> None:
+        """Runs tasks (default: all of them) and sleeps between their deadlines for
+        ``duration`` milliseconds, or forever if ``duration`` is None."""
+        end = None if duration is None else ticks_add(ticks_ms(), duration)
+        while True:
+            start = ticks_ms()
+            wait = self.run_due(tasks)
+            now = ticks_ms()
+            if self.on_pass:
+                self.on_pass(ticks_diff(now, start))
+            if end is not None:
+                left = ticks_diff(end, now)
+                if left <= 0:
+                    return
+                if wait is None or wait > left:
+                    wait = left
+            if wait is None:
+                # Nothing to do until a task is woken, which can only happen from another task.
+                raise RuntimeError("All scheduled tasks are idle")
+            if self.max_wait is not None and wait > self.max_wait:
+                wait = self.max_wait
+            if wait > 0:
+                time.sleep(wait / 1000)
@@ -26,11 +26,13 @@ Implementation Notes
 __version__ = "0.0.0-auto.0"
 __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_Display_Text.git"
 
-import time
+import displayio
 from adafruit_display_text import bitmap_label
+from bitmap_cache import bitmap_bytes
+from ticks import ticks_add, ticks_diff, ticks_ms
 
 try:
-    from typing import Optional
+    from typing import List, Optional, Tuple
     from fontio import FontProtocol
 except ImportError:
     pass
@@ -48,7 +50,16 @@ class ScrollingLabel(bitmap_label.Label):
     :param float animate_time: The number of seconds in between scrolling animation
      frames. Default is 0.3 seconds.
     :param int current_index: The index of the first visible character in the label.
-     Default is 0, the first character. Will increase while scrolling."""
+     Default is 0, the first character. Will increase while scrolling.
+    :param bool marquee: When True, the full text is rasterized once into a single wide
+     bitmap each time ``full_text`` changes, and each animation frame scrolls it by one
+     pixel by shifting tile indices instead of re-rendering glyphs. Default is False.
+    :param int max_colors: How many text colors one line can use at once, counting ``color``.
+     Inline colors (see `set_full_text`) are drawn into the same bitmap through extra
+     palette entries, so they cost no extra labels and scroll just as fast. Default is 1.
+    :param bitmap_cache: A `BitmapCache` to keep the rendered ``full_text`` in, so text the
+     label has shown recently is swapped back in instead of rasterized again. Entries are
+     keyed by text, font, palette and inline colors, so labels can share a cache. Default is None."""
 
     # pylint: disable=too-many-arguments
     def __init__(
@@ -58,65 +69,325 @@ class ScrollingLabel(bitmap_label.Label):
         text: Optional[str] = "",
         animate_time: Optional[float] = 0.3,
         current_index: Optional[int] = 0,
+        marquee: bool = False,
+        max_colors: int = 1,
+        bitmap_cache=None,
         **kwargs
     ) -> None:
 
+        self.bitmap_cache = None  # bitmap_label renders the initial text before this is set up
+        self._cached = False  # Whether _bitmap belongs to bitmap_cache, and mustn't be drawn over
+        self.moved = False  # Whether the last update() changed what the label shows
         super().__init__(font, **kwargs)
+        if max_colors > 1:
+            # Entry 0 is the background and entry 1 is ``color``, as in any label. The rest
+            # are for inline colors. No bitmap exists yet, so nothing else uses the old palette.
+            palette = displayio.Palette(max_colors + 1)
+            for i in range(2):
+                palette[i] = self._palette[i]
+                if self._palette.is_transparent(i):
+                    palette.make_transparent(i)
+            self._palette = palette
+        self._color_spans = None
+        self._text_origin = 0  # Index in full_text of the first character of text
+        self._glyph_colors = None
+        self._glyph_count = 0
         self.animate_time = animate_time
         self._current_index = current_index - 1
-        self._last_animate_time = -1000000
+        self._last_animate_time = None  # Ticks of the last animation frame. None: animate now.
         self.max_characters = max_characters
+        self.marquee = marquee
+        self._marquee_grid = None
+        self._marquee_offset = 0
+        self._marquee_dirty = True
+        self.bitmap_cache = bitmap_cache
 
-        if text == "" or text == None:
-            text = " "
-        if len(text) > self.max_characters and text[-1] != " ":
-            text = "{} ".format(text)
-        self._full_text = text
+        self._full_text = self._padded(text)
 
         self.update(True)
 
-    def update(self, force: bool = False) -> None:
+    def update(self, force: bool = False) -> Optional[int]:
         """Attempt to update the display. If ``animate_time`` has elapsed since
         previous animation frame then move the characters over by 1 index.
         Must be called in the main loop of user code.
 
         :param bool force: whether to ignore ``animation_time`` and force the update.
          Default is False.
-        :return: None
+        :return: The number of milliseconds until the next animation frame is due, or
+         None if the text fits and there is nothing to animate until ``full_text`` changes.
+         ``moved`` says whether this call changed what the label shows.
         """
-        _now = time.monotonic_ns() // 1000000
-        if force or self._last_animate_time + round(self.animate_time * 1000) <= _now:
+        self.moved = False
+        _now = ticks_ms()
+        frame_ms = max(1, round(self.animate_time * 1000))
+        if force or self._last_animate_time is None or ticks_diff(_now, self._last_animate_time) >= frame_ms:
 
             if len(self.full_text) <= self.max_characters:
+                self._end_marquee()
                 if self.text != self.full_text:
+                    self._text_origin = 0
                     self.text = self.full_text
+                    self.moved = True
                 self._last_animate_time = _now
-                return
-            
-            self.current_index += 1
+                return None
 
-            if self.current_index + self.max_characters <= len(self.full_text):
-                _showing_string = self.full_text[
-                    self.current_index : self.current_index + self.max_characters
-                ]
+            if self.marquee:
+                self._update_marquee(_now)
             else:
-                _showing_string_start = self.full_text[self.current_index :]
-                _showing_string_end = "{}".format(
-                    self.full_text[
-                        : (self.current_index + self.max_characters)
-                        % len(self.full_text)
-                    ]
-                )
-
-                _showing_string = "{}{}".format(
-                    _showing_string_start, _showing_string_end
-                )
-            if self.text != _showing_string:
-                self.text = _showing_string
-
-            self._last_animate_time = _now
+                self._update_characters(_now)
+
+        elif len(self.full_text) <= self.max_characters:
+            return None
+
+        return max(0, frame_ms - ticks_diff(_now, self._last_animate_time))
+
+    def _update_characters(self, now: int) -> None:
+        """Advances the text by one character."""
+        self.current_index += 1
+
+        if self.current_index + self.max_characters <= len(self.full_text):
+            _showing_string = self.full_text[
+                self.current_index : self.current_index + self.max_characters
+            ]
+        else:
+            _showing_string_start = self.full_text[self.current_index :]
+            _showing_string_end = "{}".format(
+                self.full_text[
+                    : (self.current_index + self.max_characters)
+                    % len(self.full_text)
+                ]
+            )
+
+            _showing_string = "{}{}".format(
+                _showing_string_start, _showing_string_end
+            )
+        if self.text != _showing_string:
+            self._text_origin = self.current_index
+            self.text = _showing_string
+            self.moved = True
+
+        self._last_animate_time = now
+
+    def _update_marquee(self, now: int) -> None:
+        """Advances the marquee by one pixel per elapsed animation frame, rasterizing
+        ``full_text`` first if it has changed since the last frame."""
+        if self._marquee_dirty:
+            self._marquee_dirty = False
+            self._marquee_offset = 0
+            self._last_animate_time = now
+            self._start_marquee()
+            self.moved = True
+            return
+
+        frame_ms = max(1, round(self.animate_time * 1000))
+        steps = ticks_diff(now, self._last_animate_time) // frame_ms
+        if steps < 1:
+            steps = 1
+        if steps > 1000:
+            # We fell far behind (e.g. a long blocking call); don't try to catch up.
+            self._last_animate_time = now
+        else:
+            self._last_animate_time = ticks_add(self._last_animate_time, steps * frame_ms)
+
+        offset = (self._marquee_offset + steps) % self._bitmap.width
+        if offset != self._marquee_offset:
+            self._marquee_offset = offset
+            self._show_marquee_offset()
+            self.moved = True
+
+    def _start_marquee(self) -> None:
+        # Let bitmap_label rasterize the whole string (including the trailing gap)
+        # into one wide bitmap, then show it through a window of 1px wide tiles.
+        if self.text != self.full_text:
+            self._text_origin = 0
+            self.text = self.full_text
+        bitmap = self._bitmap
+        glyph = self.font.get_glyph(ord("M"))
+        window = self.max_characters * (glyph.shift_x if glyph else 4)
+        self._marquee_grid = displayio.TileGrid(
+            bitmap,
+            pixel_shader=self._palette,
+            width=min(window, bitmap.width),
+            height=1,
+            tile_width=1,
+            tile_height=bitmap.height,
+            x=self._tilegrid.x,
+            y=self._tilegrid.y,
+        )
+        self._show_marquee_offset()
+        self._local_group[0] = self._marquee_grid
 
+    def _end_marquee(self) -> None:
+        if self._marquee_grid is not None:
+            if len(self._local_group) and self._tilegrid is not None:
+                self._local_group[0] = self._tilegrid
+            self._marquee_grid = None
+        self._marquee_dirty = True
+
+    def _show_marquee_offset(self) -> None:
+        grid = self._marquee_grid
+        column = self._marquee_offset
+        columns = self._bitmap.width
+        for i in range(grid.width):
+            grid[i] = column
+            column += 1
+            if column == columns:
+                column = 0
+
+    def _reset_text(self, font=None, text=None, line_spacing=None, scale=None) -> None:
+        # Only the whole of full_text is cached. The windows _update_characters() scrolls
+        # through are drawn over the label's own bitmap, as bitmap_label does.
+        cache = self.bitmap_cache
+        if cache is None or font is not None or line_spacing is not None or not text or text != self._full_text:
+            if self._cached:
+                self._bitmap = None  # Make bitmap_label draw into a new bitmap, not the cached one
+                self._cached = False
+            super()._reset_text(font, text, line_spacing, scale)
+            return
+        key = (text, self._font, self._palette, tuple(self._color_spans) if self._color_spans else None)
+        entry = cache.get(key)
+        if entry is None:
+            if self._cached:
+                self._bitmap = None
+            super()._reset_text(None, text, None, scale)
+            bitmap = self._bitmap
+            cache.put(key, (bitmap, self._tilegrid, self._bounding_box),
+                      bitmap_bytes(bitmap.width, bitmap.height, len(self._palette)))
+            self._cached = True
             return
+        # What bitmap_label would have ended up with, without drawing anything.
+        self._bitmap, self._tilegrid, self._bounding_box = entry
+        self._cached = True
+        self._text = text
+        while len(self._local_group):
+            self._local_group.pop()
+        self._local_group.append(self._tilegrid)
+        if scale is not None:
+            self.scale = scale
+        self.anchored_position = self._anchored_position
+
+    def _place_text(self, bitmap, text, font, xposition, yposition, skip_index=0):
+        # pylint: disable=too-many-arguments
+        # Works out which palette entry each glyph is drawn with, for _blit() to use in order.
+        colors = None
+        if self._color_spans:
+            colors = []
+            length = len(self._full_text)
+            for i, char in enumerate(text):
+                if char != "\n" and font.get_glyph(ord(char)) is not None:
+                    colors.append(self._palette_index_at((self._text_origin + i) % length))
+        self._glyph_colors = colors
+        self._glyph_count = 0
+        try:
+            return super()._place_text(bitmap, text, font, xposition, yposition, skip_index)
+        finally:
+            self._glyph_colors = None
+
+    def _blit(self, bitmap, x, y, source_bitmap, x_1=0, y_1=0, x_2=None, y_2=None, skip_index=None):
+        # pylint: disable=too-many-arguments
+        index = 1
+        if self._glyph_colors is not None:
+            index = self._glyph_colors[self._glyph_count]
+            self._glyph_count += 1
+        if index == 1:
+            super()._blit(bitmap, x, y, source_bitmap, x_1, y_1, x_2, y_2, skip_index)
+            return
+        # Glyph ink is 1. Copy it as ``index`` instead.
+        if x_2 is None:
+            x_2 = source_bitmap.width
+        if y_2 is None:
+            y_2 = source_bitmap.height
+        for source_y in range(y_1, y_2):
+            target_y = y + source_y - y_1
+            if target_y >= bitmap.height:
+                break
+            for source_x in range(x_1, x_2):
+                target_x = x + source_x - x_1
+                if 0 <= target_x < bitmap.width and source_bitmap[source_x, source_y]:
+                    bitmap[target_x, target_y] = index
+
+    def _palette_index_at(self, position: int) -> int:
+        index = 1
+        for start, palette_index in self._color_spans:
+            if start > position:
+                break
+            index = palette_index
+        return index
+
+    def set_full_text(self, new_text: str, color_spans: Optional[List[Tuple[int, Optional[int]]]] = None) -> bool:
+        """Sets ``full_text`` along with the colors of parts of it.
+
+        :param str new_text: The full text to be shown.
+        :param color_spans: ``(index, color)`` for each place in ``new_text`` where the
+         color changes, in order. A color of None goes back to ``color``. Colors beyond the
+         first ``max_colors - 1`` distinct ones are drawn in ``color``.
+        :return bool: True if the label changed."""
+        spans, colors = self._palette_spans(color_spans)
+        recolored = False  # The same text and spans in other colors only changes the palette
+        for i, color in enumerate(colors):
+            if self._palette[i + 2] != color:
+                self._palette[i + 2] = color
+                recolored = True
+        if spans == self._color_spans:
+            return self._set_full_text(new_text) or recolored
+        self._color_spans = spans
+        self._set_full_text(new_text, True)
+        return True
+
+    def _palette_spans(self, color_spans):
+        """``(index, palette index)`` for each of ``color_spans``, or None if there are none, and
+        the colors palette entries 2 and up need for them."""
+        if not color_spans:
+            return None, ()
+        spans = []
+        colors = []
+        for start, color in color_spans:
+            index = 1
+            if color is not None:
+                if color in colors:
+                    index = colors.index(color) + 2
+                elif len(colors) + 2 < len(self._palette):
+                    colors.append(color)
+                    index = len(colors) + 1
+            spans.append((start, index))
+        return spans, colors
+
+    def prerender(self, new_text: str, color_spans: Optional[List[Tuple[int, Optional[int]]]] = None) -> bool:
+        """Renders ``new_text`` into ``bitmap_cache`` without changing what the label shows, so
+        that a later `set_full_text` with the same arguments only swaps the bitmap in. Call it
+        ahead of time, e.g. for the next of several messages the label takes turns showing.
+
+        :return bool: True if it rendered the text, False if there is no cache or the text
+         was in it already."""
+        cache = self.bitmap_cache
+        if cache is None:
+            return False
+        text = self._padded(new_text)
+        spans = self._palette_spans(color_spans)[0]
+        key = (text, self._font, self._palette, tuple(spans) if spans else None)
+        if key in cache:
+            return False
+        shown = self._local_group[0] if len(self._local_group) else None
+        saved = (self._bitmap, self._tilegrid, self._bounding_box, self._text, self._full_text,
+                 self._color_spans, self._text_origin, self._cached)
+        self._bitmap = None  # Render into a new bitmap, as on a cache miss in _reset_text()
+        self._full_text = text  # _place_text() works out the colors from it
+        self._color_spans = spans
+        self._text_origin = 0
+        try:
+            super()._reset_text(None, text, None, None)
+            bitmap = self._bitmap
+            cache.put(key, (bitmap, self._tilegrid, self._bounding_box),
+                      bitmap_bytes(bitmap.width, bitmap.height, len(self._palette)))
+        finally:
+            (self._bitmap, self._tilegrid, self._bounding_box, self._text, self._full_text,
+             self._color_spans, self._text_origin, self._cached) = saved
+            while len(self._local_group):
+                self._local_group.pop()
+            if shown is not None:
+                self._local_group.append(shown)
+            self.anchored_position = self._anchored_position
+        return True
 
     @property
     def current_index(self) -> int:
@@ -144,13 +415,26 @@ class ScrollingLabel(bitmap_label.Label):
 
     @full_text.setter
     def full_text(self, new_text: str) -> None:
-        if new_text == "" or new_text == None:
-            new_text = " "
-        if len(new_text) > self.max_characters and new_text[-1] != " ":
-            new_text = "{} ".format(new_text)
-        if self._full_text == new_text:
-            return
+        self.set_full_text(new_text)
+
+    def _padded(self, text: str) -> str:
+        """``text`` as ``full_text`` holds it: a space if it is empty, and with a space at the
+        end if it scrolls, to keep its end apart from its start."""
+        if text == "" or text == None:
+            return " "
+        if len(text) > self.max_characters and text[-1] != " ":
+            return "{} ".format(text)
+        return text
+
+    def _set_full_text(self, new_text: str, force: bool = False) -> bool:
+        new_text = self._padded(new_text)
+        if self._full_text == new_text and not force:
+            return False
         self._full_text = new_text
-        self._last_animate_time = -1000000
+        self._last_animate_time = None
         self.current_index = -1
+        self._marquee_dirty = True
+        if force:
+            self.text = ""  # Redraw it, even if only the colors changed
         self.update(True)
+        return True
@@ -0,0 +1,93 @@
+# Fixed-size runtime counters, published as one small JSON payload every few minutes.
+#
+# Everything here is a handful of integers that get updated in place, so keeping telemetry
+# doesn't grow the heap however long the clock runs. code.py publishes to_json() and then
+# calls reset() to start the next period.
+
+import gc
+import json
+
+# Upper bounds (in milliseconds) of the histogram buckets for scheduler pass durations.
+# The last bucket counts everything longer.
+LOOP_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# What received messages are counted as. "lines" is line 3 and up, "pages" any line's
+# carousel pages, and "other" everything not listed.
+MESSAGE_TOPICS = ("line1", "line2", "lines", "pages", "config", "profile", "time", "other")
+
+
+class Telemetry:
+    """Counters for one reporting period."""
+
+    def __init__(self) -> None:
+        self.loop_histogram = [0] * (len(LOOP_BUCKETS) + 1)
+        self.messages = [0] * len(MESSAGE_TOPICS)  # Messages received, by MESSAGE_TOPICS
+        self.reset()
+
+    def reset(self) -> None:
+        """Starts a new period."""
+        for i in range(len(self.loop_histogram)):
+            self.loop_histogram[i] = 0
+        for i in range(len(self.messages)):
+            self.messages[i] = 0
+        self.loop_max = 0
+        self.mqtt_loops = 0
+        self.mqtt_loop_ms = 0
+        self.mqtt_loop_max = 0
+        self.mem_free_min = None
+        self.mem_free_max = None
+        self.rtt_min = None
+        self.rtt_max = None
+
+    def record_loop(self, ms: int) -> None:
+        """Records how long one scheduler pass kept the device busy."""
+        i = 0
+        while i < len(LOOP_BUCKETS) and ms >= LOOP_BUCKETS[i]:
+            i += 1
+        self.loop_histogram[i] += 1
+        if ms > self.loop_max:
+            self.loop_max = ms
+
+    def record_mqtt_loop(self, ms: int) -> None:
+        """Records how long one ``mqtt_client.loop()`` call took."""
+        self.mqtt_loops += 1
+        self.mqtt_loop_ms += ms
+        if ms > self.mqtt_loop_max:
+            self.mqtt_loop_max = ms
+
+    def record_message(self, topic: str) -> None:
+        """Counts a message on ``topic``, relative to the clock's own topic prefix (the shared
+        time topics count as "time")."""
+        if topic.endswith("/pages"):
+            topic = "pages"
+        elif topic.startswith("line") and topic[4:].isdigit() and topic not in MESSAGE_TOPICS:
+            topic = "lines"
+        elif topic not in MESSAGE_TOPICS:
+            topic = "other"
+        self.messages[MESSAGE_TOPICS.index(topic)] += 1
+
+    def record_rtt(self, rtt: int) -> None:
+        if self.rtt_min is None or rtt < self.rtt_min:
+            self.rtt_min = rtt
+        if self.rtt_max is None or rtt > self.rtt_max:
+            self.rtt_max = rtt
+
+    def sample_heap(self) -> None:
+        """Takes a gc.mem_free() reading for the min/max."""
+        free = gc.mem_free()
+        if self.mem_free_min is None or free < self.mem_free_min:
+            self.mem_free_min = free
+        if self.mem_free_max is None or free > self.mem_free_max:
+            self.mem_free_max = free
+
+    def to_json(self, **extra) -> str:
+        """The counters (plus any ``extra`` values) as JSON."""
+        stats = {
+            "loop_ms": {"buckets": LOOP_BUCKETS, "counts": self.loop_histogram, "max": self.loop_max},
+            "mqtt_loop": {"count": self.mqtt_loops, "ms": self.mqtt_loop_ms, "max": self.mqtt_loop_max},
+            "mem_free": [self.mem_free_min, self.mem_free_max],
+            "messages": dict(zip(MESSAGE_TOPICS, self.messages)),
+            "rtt": [self.rtt_min, self.rtt_max],
+        }
+        stats.update(extra)
+        return json.dumps(stats)
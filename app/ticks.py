@@ -0,0 +1,23 @@
+# Millisecond timestamps that never allocate, for the code that runs on every pass.
+#
+# time.monotonic_ns() returns a long int, which CircuitPython allocates on the heap on every
+# call. supervisor.ticks_ms() counts in a small int instead, but it wraps around every 2**29 ms
+# (about 6 days; on the device it first wraps about a minute after power on), so ticks must
+# only be compared through ticks_diff() and advanced through ticks_add().
+
+from supervisor import ticks_ms
+
+_TICKS_PERIOD = 1 << 29
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALFPERIOD = _TICKS_PERIOD // 2
+
+
+def ticks_add(ticks: int, delta: int) -> int:
+    """The ticks ``delta`` milliseconds after ``ticks``."""
+    return (ticks + delta) & _TICKS_MAX
+
+
+def ticks_diff(ticks1: int, ticks2: int) -> int:
+    """Milliseconds from ``ticks2`` to ``ticks1``, negative if ``ticks1`` is earlier.
+    Only right for times less than 2**28 ms (about 3 days) apart."""
+    return ((ticks1 - ticks2 + _TICKS_HALFPERIOD) & _TICKS_MAX) - _TICKS_HALFPERIOD
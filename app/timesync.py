@@ -0,0 +1,189 @@
+# NTP-style time sync over MQTT.
+#
+# A request carries the device's monotonic time in milliseconds and the device's id
+# ("?<t1>,<id>"). The server answers on that device's own topic, echoing t1 along with its
+# local time in epoch milliseconds ("<epochms>,<t1>"), so no other clock has to hear it. The
+# round trip is the time between t1 and the reply arriving, and the server's time is assumed
+# to have been read halfway through it. A sample whose round trip is much longer than the
+# best recent one sat in a queue somewhere, so its midpoint is wrong and it is rejected.
+# Accepted samples also steer an estimate of how fast the monotonic clock drifts, and the
+# sync interval backs off while the estimates keep predicting the samples well.
+#
+# Servers that only understand the old protocol (an empty request, answered with a bare
+# "<epochms>" on the shared topic) still work: after two unanswered requests the clock falls
+# back to it, and bare replies are matched with the outstanding request.
+#
+# A server can also broadcast the time ("<epochms>") every so often, which tick() takes as a
+# sample that arrived after half the last measured round trip. A broadcast can only arrive
+# late, which makes the clock look further ahead than it is, so of the recent broadcasts
+# (and round-trip samples) the one that says it is furthest behind is used. Broadcasts are
+# too noisy to measure drift with, so only round-trip samples steer it.
+
+try:
+    from typing import Optional
+except ImportError:
+    pass
+
+
+class TimeSync:
+    """Estimates the local time in epoch milliseconds from a monotonic millisecond clock.
+
+    :param str device_id: Sent with requests so the reply goes to this device only.
+    :param int retry_interval: Milliseconds between sync requests until the first reply.
+    :param int min_interval: Milliseconds between syncs until the clock is stable.
+    :param int max_interval: The longest the sync interval backs off to.
+    :param int history: How many recent round trips the outlier filter compares against.
+    :param int stable_error: Milliseconds a prediction may be off by and still count as stable.
+    :param int step_threshold: Corrections bigger than this are only made (as a step, e.g. for
+     a daylight saving change) once a second sample agrees."""
+
+    # pylint: disable=too-many-instance-attributes,too-many-arguments
+    def __init__(self, device_id: Optional[str] = None, retry_interval: int = 10000, min_interval: int = 60000, max_interval: int = 960000,
+                 history: int = 8, stable_error: int = 100, step_threshold: int = 2000) -> None:
+        self.device_id = device_id
+        self.retry_interval = retry_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.history = history
+        self.stable_error = stable_error
+        self.step_threshold = step_threshold
+        self.max_rtt = 10000
+        self.interval = retry_interval  # Milliseconds until the next sync is due
+        self.synced = False
+        self.offset = 0  # Epoch milliseconds minus monotonic milliseconds, as of ref_time
+        self.ref_time = 0
+        self.drift = 0.0  # How many milliseconds the offset grows by per monotonic millisecond
+        self.rtt = None  # Round trip of the last accepted sample
+        self.last_rtt = None  # Round trip of the last reply, accepted or not
+        self.last_error = None
+        self.pending = None  # t1 of the request we are waiting on
+        self.legacy = False
+        self.last_tick = None  # When the last broadcast arrived
+        self._unanswered = 0
+        self._samples = []  # Round trips of the recent samples
+        self._offsets = []  # Offsets of the recent broadcasts and round-trip samples
+        self._drift_ref = None  # (offset, monotonic time) of the round-trip sample drift is measured from
+        self._step_candidate = None
+
+    def epochms(self, now: int) -> int:
+        """Returns the local time in epoch milliseconds at monotonic time ``now``."""
+        return now + self.offset + int(self.drift * (now - self.ref_time))
+
+    def set_epochms(self, epochms: int, now: int) -> None:
+        """Sets the time without treating it as a sample."""
+        self.offset = epochms - now
+        self.ref_time = now
+
+    def request(self, now: int) -> str:
+        """Returns the payload of a sync request sent at monotonic time ``now``."""
+        if self.pending is not None:
+            self._unanswered += 1
+            if self._unanswered >= 2 and not self.legacy:
+                print("Time server did not answer. Falling back to empty time sync requests.")
+                self.legacy = True
+        self.pending = now
+        if self.legacy:
+            return ""
+        if self.device_id is None:
+            return "?" + str(now)
+        return "?" + str(now) + "," + self.device_id
+
+    def waiting(self, now: int) -> bool:
+        """Returns True while a reply to the last request can reasonably still arrive."""
+        return self.pending is not None and now - self.pending < self.max_rtt
+
+    def reply(self, payload: str, now: int) -> Optional[str]:
+        """Handles a reply received at monotonic time ``now``. Returns None if the reply was
+        meant for someone else, or a description of what it did. Raises ValueError if the
+        payload is not a time."""
+        epochms, _, echoed = payload.partition(",")
+        epochms = int(epochms)
+        if echoed:
+            t1 = int(echoed)
+            if t1 != self.pending:
+                return None  # The answer to another clock's request, or to one of ours that timed out
+        elif self.pending is not None:
+            t1 = self.pending  # A server that doesn't echo. Assume this answers our request.
+        elif not self.synced:
+            t1 = now
+        else:
+            return None
+        self.pending = None
+        self._unanswered = 0
+        rtt = now - t1
+        self.last_rtt = rtt
+        if rtt < 0 or rtt > self.max_rtt:
+            return "rejected: round trip {} ms".format(rtt)
+        return self._sample(rtt, epochms - (t1 + now) // 2, now)
+
+    def tick(self, payload: str, now: int) -> str:
+        """Handles a broadcast of the time received at monotonic time ``now``. Returns a
+        description of what it did. Raises ValueError if the payload is not a time."""
+        epochms = int(payload)
+        self.last_tick = now
+        self._remember(epochms + (self.rtt or 0) // 2 - now)
+        return self._sample(None, max(self._offsets), now)
+
+    def _remember(self, offset: int) -> None:
+        offsets = self._offsets
+        offsets.append(offset)
+        if len(offsets) > self.history:
+            offsets.pop(0)
+
+    def _sample(self, rtt: Optional[int], offset: int, now: int) -> str:
+        if rtt is not None:
+            samples = self._samples
+            samples.append(rtt)
+            if len(samples) > self.history:
+                samples.pop(0)
+        if not self.synced:
+            return self._step(rtt, offset, now)
+
+        if rtt is not None:
+            best = min(self._samples)
+            if rtt > 2 * best + 50:
+                self.interval = self.min_interval
+                return "rejected: round trip {} ms, best recent {} ms".format(rtt, best)
+        error = offset - (self.epochms(now) - now)
+        if abs(error) > self.step_threshold:
+            if self._step_candidate is not None and abs(offset - self._step_candidate) <= self.step_threshold:
+                return self._step(rtt, offset, now)
+            self._step_candidate = offset
+            self.interval = self.min_interval
+            return "rejected: {} ms off, waiting for another sample to agree".format(error)
+        self._step_candidate = None
+
+        if rtt is not None:
+            self._remember(offset)
+            ref_offset, ref_time = self._drift_ref
+            elapsed = now - ref_time
+            if elapsed >= self.min_interval // 2:
+                # Move the drift estimate halfway towards what it was since the last round-trip sample.
+                measured = (offset - ref_offset) / elapsed
+                self.drift = max(-0.0005, min(0.0005, self.drift + (measured - self.drift) / 2))
+                self._drift_ref = (offset, now)
+        self.offset = offset
+        self.ref_time = now
+        if rtt is not None:
+            self.rtt = rtt
+        self.last_error = error
+        if abs(error) <= self.stable_error:
+            self.interval = min(self.interval * 2, self.max_interval)
+        else:
+            self.interval = self.min_interval
+        return "corrected by {} ms, round trip {} ms, drift {:.1f} ppm, next sync in {} s".format(
+            error, self.rtt, self.drift * 1000000, self.interval // 1000)
+
+    def _step(self, rtt: Optional[int], offset: int, now: int) -> str:
+        self._samples = [] if rtt is None else [rtt]
+        self._offsets = [offset]
+        self._drift_ref = (offset, now)
+        self._step_candidate = None
+        self.synced = True
+        self.offset = offset
+        self.ref_time = now
+        if rtt is not None:
+            self.rtt = rtt
+        self.last_error = None
+        self.interval = self.min_interval
+        return "set, round trip {} ms".format(self.rtt)
@@ -1,96 +1,172 @@
-# This class currently tends to bug out and not render all lines and it spews:
-# Warning: Glyph clipped, exceeds descent property: "b" for a bunch of different characters.
-
-import time
-from adafruit_display_text import bitmap_label, wrap_text_to_lines
+# A fixed-size, line-wrapping label that scrolls upwards, one pixel at a time, when the
+# text has more lines than fit. Meant for showing crash dumps on the panel.
+#
+# The wrapped lines are kept as strings. Only the lines in view (plus the one scrolling in)
+# are rasterized, each once, into the rows of a ring bitmap. A TileGrid of 1 pixel tall tiles
+# shows the ring starting at the current row, so each animation frame just shifts tile
+# indices, and a line is drawn when it scrolls in, into the row the line leaving view used.
+
+import bitmaptools
+import displayio
+from adafruit_display_text import wrap_text_to_lines
+from ticks import ticks_diff, ticks_ms
 
 try:
-    from typing import Optional
+    from typing import List, Optional
     from fontio import FontProtocol
 except ImportError:
     pass
 
 
-class VerticalScrollingLabel(bitmap_label.Label):
-    """VerticalScrollingLabel - A fixed-width, fixed-height line-wrapping label 
+class VerticalScrollingLabel(displayio.Group):
+    """VerticalScrollingLabel - A fixed-width, fixed-height line-wrapping label
     that will scroll text vertically if it exceeds the set number of lines.
 
     :param font: The font to use for the label.
     :type: ~FontProtocol
     :param int max_characters: The number of characters that sets the fixed-width. Default is 10.
     :param int max_lines: The number of lines that sets the fixed-height. Default is 5.
-    :param str text: The full text to show in the label. If this is longer than
-     ``max_characters * max_lines`` then the label will scroll to show everything.
-    :param float animate_time: The number of seconds in between scrolling animation
-     frames. Default is 1 second."""
-
-    # pylint: disable=too-many-arguments
+    :param str text: The full text to show in the label. Lines are wrapped at
+     ``max_characters``. If there are more than ``max_lines`` lines then the label
+     will scroll to show everything.
+    :param float animate_time: The number of seconds between scrolling the text up by
+     one pixel. Default is 0.1 seconds.
+    :param int color: The text color. Default is white.
+    :param int background_color: The background color, or None for transparent. Default is None."""
+
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
     def __init__(self,
                  font: FontProtocol,
                  max_characters: int = 10,
                  max_lines: int = 5,
                  text: Optional[str] = "",
-                 animate_time: Optional[float] = 1,
+                 animate_time: Optional[float] = 0.1,
+                 color: int = 0xFFFFFF,
+                 background_color: Optional[int] = None,
                  **kwargs) -> None:
 
-        super().__init__(font, line_spacing=1.0, **kwargs)
+        super().__init__(**kwargs)
+        self.font = font
         self.animate_time = animate_time
-        self._current_index = 0
-        self._last_animate_time = -1000000
         self.max_characters = max_characters
         self.max_lines = max_lines
-        self._lines = []
+        width, height, _, dy = font.get_bounding_box()
+        glyph = font.get_glyph(ord("M"))
+        self._line_height = height
+        self._baseline = height + dy
+        self._palette = displayio.Palette(2)
+        self.background_color = background_color
+        self.color = color
+        # One more row than is visible, for the line scrolling into view.
+        self._ring = displayio.Bitmap(max_characters * (glyph.shift_x if glyph else width),
+                                      (max_lines + 1) * height, 2)
+        self._grid = displayio.TileGrid(self._ring,
+                                        pixel_shader=self._palette,
+                                        width=1,
+                                        height=max_lines * height,
+                                        tile_width=self._ring.width,
+                                        tile_height=1)
+        self.append(self._grid)
+        self._full_text = None
+        self._lines = []  # The wrapped lines of full_text
+        self._top_line = 0  # Index in _lines of the line at the top of the view
+        self._offset = 0  # How many pixels of the top line have scrolled out of view
+        self._top_slot = 0  # Ring row (in lines) holding the top line
+        self._last_animate_time = None  # Ticks of the last animation frame
+        self.moved = False  # Whether the last update() changed what the label shows
 
         self.full_text = text
 
-    def update(self, force: bool = False) -> None:
+    def update(self, force: bool = False) -> Optional[int]:
         """Attempt to update the display. If ``animate_time`` has elapsed since
-        previous animation frame then move the lines up by 1 index.
+        previous animation frame then move the lines up by 1 pixel.
         Must be called in the main loop of user code.
 
         :param bool force: whether to ignore ``animation_time`` and force the update.
          Default is False.
-        :return: None
+        :return: The number of milliseconds until the next animation frame is due, or
+         None if the text fits and there is nothing to animate until ``full_text`` changes.
+         ``moved`` says whether this call changed what the label shows.
         """
-        _now = time.monotonic_ns() // 1000000
-        if force or self._last_animate_time + round(
-                self.animate_time * 1000) <= _now:
-            print("")
-            print("----PRINTING----")
-            if len(self._lines) <= self.max_lines:
-                _showing_string = "\n".join(self._lines)
-                print(_showing_string)
-            else:
-                self.current_index += 1
-                self._last_animate_time = _now
-
-                tmp = []
-                for i in range(self.max_lines):
-                    print(self._lines[(i + self.current_index) %
-                                      len(self._lines)])
-                    tmp.append(self._lines[(i + self.current_index) %
-                                           len(self._lines)])
-
-                _showing_string = "\n".join(tmp)
-
-            if self.text != _showing_string:
-                self.text = _showing_string
-        print("----DONE PRINTING----")
+        self.moved = False
+        if len(self._lines) <= self.max_lines:
+            return None
+        now = ticks_ms()
+        frame_ms = max(1, round(self.animate_time * 1000))
+        if force or self._last_animate_time is None or ticks_diff(now, self._last_animate_time) >= frame_ms:
+            self._last_animate_time = now
+            self._offset += 1
+            if self._offset == self._line_height:
+                # The top line has left the view. Its row gets the line after the new last one.
+                self._offset = 0
+                self._top_line = (self._top_line + 1) % len(self._lines)
+                self._top_slot = (self._top_slot + 1) % (self.max_lines + 1)
+                self._draw_line(self._top_slot + self.max_lines,
+                                (self._top_line + self.max_lines) % len(self._lines))
+            self._show()
+            self.moved = True
+        return max(0, frame_ms - ticks_diff(now, self._last_animate_time))
+
+    def _show(self) -> None:
+        grid = self._grid
+        rows = self._ring.height
+        row = self._top_slot * self._line_height + self._offset
+        for i in range(grid.height):
+            grid[0, i] = row % rows
+            row += 1
+
+    def _draw_line(self, slot: int, line: int) -> None:
+        """Rasterizes ``_lines[line]`` into ring row ``slot`` (in lines, wrapping around)."""
+        ring = self._ring
+        top = (slot % (self.max_lines + 1)) * self._line_height
+        bitmaptools.fill_region(ring, 0, top, ring.width, top + self._line_height, 0)
+        if line >= len(self._lines):
+            return
+        x = 0
+        for char in self._lines[line]:
+            glyph = self.font.get_glyph(ord(char))
+            if glyph is None:
+                continue
+            # Clip the glyph to its own row, so it can't draw into the neighbouring lines.
+            y = self._baseline - glyph.height - glyph.dy
+            y_1 = max(0, -y)
+            y_2 = min(glyph.height, self._line_height - y)
+            x_1 = glyph.tile_index * glyph.width
+            if y_2 > y_1 and 0 <= x + glyph.dx < ring.width:
+                bitmaptools.blit(ring, glyph.bitmap, x + glyph.dx, top + y + y_1, x1=x_1, y1=y_1,
+                                 x2=x_1 + min(glyph.width, ring.width - x - glyph.dx), y2=y_2,
+                                 skip_source_index=0)
+            x += glyph.shift_x
 
     @property
-    def current_index(self) -> int:
-        """Index of the first visible character.
+    def color(self) -> int:
+        """The text color."""
+        return self._palette[1]
 
-        :return int: The current index
-        """
-        return self._current_index
+    @color.setter
+    def color(self, new_color: int) -> None:
+        self._palette[1] = new_color
 
-    @current_index.setter
-    def current_index(self, new_index: int) -> None:
-        if new_index < len(self._lines):
-            self._current_index = new_index
+    @property
+    def background_color(self) -> Optional[int]:
+        """The background color, or None for transparent."""
+        if self._palette.is_transparent(0):
+            return None
+        return self._palette[0]
+
+    @background_color.setter
+    def background_color(self, new_color: Optional[int]) -> None:
+        if new_color is None:
+            self._palette[0] = 0
+            self._palette.make_transparent(0)
         else:
-            self._current_index = new_index % len(self._lines)
+            self._palette[0] = new_color
+            self._palette.make_opaque(0)
+
+    @property
+    def lines(self) -> List[str]:
+        """The wrapped lines of ``full_text``."""
+        return self._lines
 
     @property
     def full_text(self) -> str:
@@ -98,20 +174,28 @@ class VerticalScrollingLabel(bitmap_label.Label):
 
         :return str: The full text of this label.
         """
-        if len(self._lines) == 0:
-            return ""
-        return "\n".join(self._lines)
+        return self._full_text
 
     @full_text.setter
     def full_text(self, new_text: str) -> None:
         if new_text == None:
             new_text = ""
-        new_lines = wrap_text_to_lines(new_text, self.max_characters)
-        if len(new_lines) > self.max_lines:
-            new_lines.append("")
-        if (len(new_lines) > 0 and len(self._lines)
-                == 0) or ("\n".join(new_lines) != self.full_text):
-            self._lines = new_lines
-            self._last_animate_time = -1000000
-            self.current_index = len(self._lines) - 1
-            self.update(True)
+        if new_text == self._full_text:
+            return
+        self._full_text = new_text
+        # wrap_text_to_lines() drops newlines, so wrap each line of the text on its own.
+        lines = []
+        for paragraph in new_text.split("\n"):
+            lines.extend(wrap_text_to_lines(paragraph, self.max_characters) or [""])
+        if new_text == "":
+            lines = []
+        elif len(lines) > self.max_lines:
+            lines.append("")  # A gap between the end and the start as it wraps around
+        self._lines = lines
+        self._top_line = 0
+        self._offset = 0
+        self._top_slot = 0
+        self._last_animate_time = ticks_ms()  # Show the start for a frame first
+        for slot in range(self.max_lines + 1):
+            self._draw_line(slot, slot)
+        self._show()
@@ -0,0 +1,167 @@
+"""Builds the subsetted glyph packs (.gpk) that code.py loads, from the BDF sources here.
+
+The clock face only ever draws "0123456789:" and the status lines only use printable
+ASCII, so each pack holds just those glyphs, already unpacked into 1-bit rows that
+app/glyph_pack.py can read straight into bitmaps.
+
+Run from the repository root:
+
+    python extra_source/build_fonts.py
+
+Besides writing the packs into app/, it checks every packed glyph against the PCF the
+device used to load, and reports bytes, load time and heap saved per font. Timings
+are taken on the host with the simulator's displayio stand-in, so compare them with
+each other rather than with the device.
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "app"), os.path.join(ROOT, "simulator", "stubs"), ROOT]
+
+import glyph_pack  # pylint: disable=wrong-import-position
+
+PRINTABLE_ASCII = "".join(chr(c) for c in range(0x20, 0x7F))
+
+# (BDF source, characters to keep, pack to write, PCF it replaces)
+FONTS = (
+    ("IBMPlexMono-Medium-24_jep-modified2.bdf", "0123456789: ",
+     "app/IBMPlexMono-Medium-24_jep-modified2.gpk", "app/IBMPlexMono-Medium-24_jep-modified2.pcf"),
+    ("tom-thumb-modified.bdf", PRINTABLE_ASCII,
+     "app/tom-thumb-modified.gpk", "app/tom-thumb-modified.pcf"),
+)
+
+
+def read_bdf(path):
+    """Returns (ascent, descent, bounding_box, glyphs) where glyphs maps each code point to
+    (width, height, dx, dy, shift_x, rows) and rows holds the BDF's byte-padded bitmap rows."""
+    ascent = descent = 0
+    bounding_box = (0, 0, 0, 0)
+    glyphs = {}
+    with open(path, "r", encoding="latin-1") as f:
+        lines = iter(f.read().splitlines())
+    for line in lines:
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == "FONTBOUNDINGBOX":
+            bounding_box = tuple(int(p) for p in parts[1:5])
+        elif parts[0] == "FONT_ASCENT":
+            ascent = int(parts[1])
+        elif parts[0] == "FONT_DESCENT":
+            descent = int(parts[1])
+        elif parts[0] == "STARTCHAR":
+            code_point = shift_x = None
+            width = height = dx = dy = 0
+            for line in lines:  # pylint: disable=redefined-outer-name
+                parts = line.split()
+                if parts[0] == "ENCODING":
+                    code_point = int(parts[1])
+                elif parts[0] == "DWIDTH":
+                    shift_x = int(parts[1])
+                elif parts[0] == "BBX":
+                    width, height, dx, dy = (int(p) for p in parts[1:5])
+                elif parts[0] == "BITMAP":
+                    stride = (width + 7) // 8
+                    rows = b"".join(bytes.fromhex(next(lines).strip())[:stride].ljust(stride, b"\0")
+                                    for _ in range(height))
+                elif parts[0] == "ENDCHAR":
+                    break
+            if code_point is not None and code_point >= 0:
+                glyphs[code_point] = (width, height, dx, dy, shift_x, rows)
+    return ascent, descent, bounding_box, glyphs
+
+
+def pack(ascent, descent, bounding_box, glyphs, characters):
+    """Returns the bytes of a glyph pack holding ``characters`` (those the font has)."""
+    code_points = sorted({ord(c) for c in characters if ord(c) in glyphs})
+    records = bytearray()
+    data = bytearray()
+    for code_point in code_points:
+        width, height, dx, dy, shift_x, rows = glyphs[code_point]
+        records += struct.pack(glyph_pack.GLYPH_FORMAT, code_point, width, height, dx, dy, shift_x, len(data))
+        data += rows
+    header = struct.pack(glyph_pack.HEADER_FORMAT, glyph_pack.MAGIC, ascent, descent, *bounding_box,
+                         len(code_points))
+    missing = "".join(c for c in characters if ord(c) not in glyphs)
+    return header + records + data, missing
+
+
+def _measure(load, repeat=20):
+    """Returns (seconds per load, bytes still allocated by the loaded font)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        load()
+    seconds = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    font = load()  # pylint: disable=unused-variable
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return seconds, heap
+
+
+def _ink(glyph):
+    """The lit pixels of a glyph relative to its origin on the baseline. The PCFs store
+    full-cell bitmaps where the BDFs have tight boxes, so raw bitmaps can't be compared."""
+    top = -(glyph.dy + glyph.height)
+    return {(glyph.dx + x, top + y) for y in range(glyph.height) for x in range(glyph.width)
+            if glyph.bitmap[x, y]}
+
+
+def _same_glyph(a, b):
+    return a.shift_x == b.shift_x and _ink(a) == _ink(b)
+
+
+def compare_with_pcf(pack_path, pcf_path, characters):
+    """Checks the pack against the PCF and returns a report line for it."""
+    from adafruit_bitmap_font import bitmap_font  # pylint: disable=import-outside-toplevel
+
+    def load_pcf():
+        font = bitmap_font.load_font(pcf_path)
+        font.load_glyphs(characters)
+        return font
+
+    def load_pack():
+        return glyph_pack.load_font(pack_path)
+
+    pcf_font = load_pcf()
+    pack_font = load_pack()
+    mismatched = "".join(c for c in characters if pcf_font.get_glyph(ord(c)) is not None
+                         and not _same_glyph(pcf_font.get_glyph(ord(c)), pack_font.get_glyph(ord(c))))
+    pcf_time, pcf_heap = _measure(load_pcf)
+    pack_time, pack_heap = _measure(load_pack)
+    pcf_size = os.path.getsize(pcf_path)
+    pack_size = os.path.getsize(pack_path)
+    return ("  file {} -> {} bytes (saves {}), load {:.2f} -> {:.2f} ms (saves {:.0f}%), "
+            "heap {} -> {} bytes (saves {}){}".format(
+                pcf_size, pack_size, pcf_size - pack_size, pcf_time * 1000, pack_time * 1000,
+                100.0 * (pcf_time - pack_time) / pcf_time, pcf_heap, pack_heap, pcf_heap - pack_heap,
+                "" if not mismatched else "\n  WARNING: glyphs differ from the PCF: " + repr(mismatched)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--no-compare", action="store_true",
+                        help="don't load the PCFs to verify the packs and measure savings")
+    args = parser.parse_args(argv)
+    for bdf_name, characters, pack_name, pcf_name in FONTS:
+        bdf_path = os.path.join(ROOT, "extra_source", bdf_name)
+        pack_path = os.path.join(ROOT, pack_name)
+        data, missing = pack(*read_bdf(bdf_path), characters)
+        with open(pack_path, "wb") as f:
+            f.write(data)
+        print("{}: {} glyphs -> {} ({} bytes)".format(bdf_name, len(characters) - len(missing), pack_name,
+                                                      len(data)))
+        if missing:
+            print("  not in the BDF: " + repr(missing))
+        if not args.no_compare:
+            print(compare_with_pcf(pack_path, os.path.join(ROOT, pcf_name), characters))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""Open reference server for the clock's MQTT protocol, with a load test.
+
+``TimeServer`` answers time sync requests and pushes text to the clocks' lines over any
+MQTT broker. ``server.mqtt`` has a minimal asyncio broker and client, so a fleet can be
+tested on one machine without installing anything. See ``python -m server --help`` and
+``python -m server.loadtest --help``.
+"""
+
+from server.mqtt import Broker, Client
+from server.time_server import TimeServer, local_epoch_ms
@@ -0,0 +1,87 @@
+"""Command line entry point: ``python -m server --help``."""
+
+import argparse
+import asyncio
+import sys
+
+from server.mqtt import Broker, Client
+from server.time_server import TimeServer, local_epoch_ms
+
+
+def _line(spec):
+    """Parses "ID:LINE:TEXT"."""
+    device_id, line, text = spec.split(":", 2)
+    if not line.isdigit() or int(line) < 1:
+        raise argparse.ArgumentTypeError("LINE must be a line number, 1 or more")
+    return device_id, int(line), text
+
+
+def _page(spec):
+    """Parses "ID:LINE:SECONDS[,PRIORITY]|TEXT"."""
+    device_id, line, page = _line(spec)
+    if "|" not in page:
+        raise argparse.ArgumentTypeError("a page is SECONDS|TEXT or SECONDS,PRIORITY|TEXT")
+    return device_id, line, page
+
+
+def _config(spec):
+    """Parses "ID:PAYLOAD"."""
+    device_id, _, payload = spec.partition(":")
+    return device_id, payload
+
+
+async def serve(args):
+    broker = None
+    if args.local_broker:
+        broker = Broker(args.host, args.port)
+        await broker.start()
+        print("Broker listening on {}:{}".format(args.host, broker.port))
+    client = Client("matrix_clock_time_server", keep_alive=60)
+    await client.connect(args.host, broker.port if broker else args.port)
+    server = TimeServer(client, window=args.window / 1000.0, clock=lambda: local_epoch_ms(args.utc))
+    await server.start()
+    for device_id, line, text in args.line:
+        server.push_line(device_id, line, text)
+    pages = {}
+    for device_id, line, page in args.page:
+        pages.setdefault((device_id, line), []).append(page)
+    for (device_id, line), line_pages in pages.items():
+        server.push_pages(device_id, line, line_pages)
+    for device_id, payload in args.config:
+        server.push_config(device_id, payload)
+    print("Answering time sync requests on " + server.time_topic)
+    if args.tick:
+        await server.tick(args.tick)
+    else:
+        await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m server",
+                                     description="Reference time and text server for the Matrix Portal clocks.")
+    parser.add_argument("--host", default="127.0.0.1", help="MQTT broker to use (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=1883, help="MQTT broker port (default 1883)")
+    parser.add_argument("--local-broker", action="store_true",
+                        help="run a minimal broker on --host:--port too, instead of using an existing one")
+    parser.add_argument("--window", type=float, default=5,
+                        help="ms to collect time sync requests for before answering them together (default 5)")
+    parser.add_argument("--tick", type=float, metavar="SECONDS", help="also broadcast the time this often")
+    parser.add_argument("--utc", action="store_true", help="send UTC instead of the server's local time")
+    parser.add_argument("--line", type=_line, action="append", default=[], metavar="ID:LINE:TEXT",
+                        help="set (retained) a line of a clock at startup: 1, 2 (the status line), "
+                             "or 3 and up on chained panels")
+    parser.add_argument("--page", type=_page, action="append", default=[], metavar="ID:LINE:SECONDS[,PRIORITY]|TEXT",
+                        help="add a (retained) carousel page to a line of a clock at startup. "
+                             "Repeat it for more pages.")
+    parser.add_argument("--config", type=_config, action="append", default=[], metavar="ID:SETTINGS",
+                        help='set (retained) the settings of a clock at startup, e.g. "1:frame=40;keep_alive=30"')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Load test: a fleet of simulated clocks against the reference server.
+
+Each simulated clock behaves like code.py on the wire: it connects with its own client
+id, subscribes to ``adafruit_matrix_clock/<id>/#`` and publishes ``?<t1>,<id>`` time sync
+requests (or empty ones, for ``--legacy``) every ``--interval`` seconds. The server also
+pushes line updates at ``--lines-per-sec``. For each fleet size the test reports broker
+traffic, round trips, how far each sync would have set the clock from the true time, and
+how long line updates took to arrive. Everything runs in one process and one event loop,
+so the numbers are for this machine and include the cost of the simulated clocks.
+
+    python -m server.loadtest --clients 50,100,200,400 --duration 10
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from server.mqtt import Broker, Client
+from server.time_server import TOPIC_BASE, TimeServer, local_epoch_ms
+
+
+def _now_ms():
+    return time.monotonic_ns() / 1000000
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class SimulatedClock:
+    """One clock's MQTT traffic.
+
+    :param str device_id: Its ``matrix_portal_id``.
+    :param float interval: Seconds between time sync requests (randomized by ±10%).
+    :param bool legacy: Send empty requests and listen for bare replies on the shared topic."""
+
+    def __init__(self, device_id, interval, legacy=False):
+        self.device_id = device_id
+        self.interval = interval
+        self.legacy = legacy
+        self.client = Client("matrix_portal_" + device_id, keep_alive=0, on_message=self.on_message)
+        self.rtts = []
+        self.errors = []  # Milliseconds between the time a sync would set and the true time
+        self.line_latencies = []
+        self.requests = 0
+        self.unanswered = 0
+        self._pending = None  # (monotonic ms, epoch ms) of the request waiting for a reply
+
+    async def connect(self, host, port):
+        await self.client.connect(host, port)
+        topics = [TOPIC_BASE + self.device_id + "/#"]
+        if self.legacy:
+            topics.append(TOPIC_BASE + "time")
+        await self.client.subscribe(*topics)
+
+    async def run(self, until):
+        rng = random.Random(self.device_id)
+        await asyncio.sleep(rng.uniform(0, self.interval))  # Clocks don't boot in lockstep
+        while _now_ms() < until:
+            if self._pending is not None:
+                self.unanswered += 1
+            self._pending = (_now_ms(), local_epoch_ms())
+            t1 = int(self._pending[0])
+            self.client.publish(TOPIC_BASE + "time", "" if self.legacy else "?{},{}".format(t1, self.device_id))
+            self.requests += 1
+            await asyncio.sleep(self.interval * rng.uniform(0.9, 1.1))
+
+    def on_message(self, topic, payload):
+        now = _now_ms()
+        if topic.endswith("/line1") or topic.endswith("/line2"):
+            sent = payload.rpartition(" ")[2]
+            if sent.isdigit():
+                self.line_latencies.append(local_epoch_ms() - int(sent))
+            return
+        if not topic.endswith("/time") or self._pending is None or payload == "" or payload[0] == "?":
+            return
+        epochms, _, echoed = payload.partition(",")
+        if echoed and int(echoed) != int(self._pending[0]):
+            return  # A late reply to an earlier request
+        t1, epoch_at_t1 = self._pending
+        self._pending = None
+        rtt = now - t1
+        self.rtts.append(rtt)
+        self.errors.append(int(epochms) - (epoch_at_t1 + rtt / 2))
+
+
+async def run_stage(clients, args):
+    """Runs one fleet size against a fresh broker and server. Returns a result row."""
+    broker = Broker("127.0.0.1", 0)
+    await broker.start()
+    server_client = Client("matrix_clock_time_server", keep_alive=0)
+    await server_client.connect("127.0.0.1", broker.port)
+    server = TimeServer(server_client, window=args.window / 1000.0)
+    await server.start()
+
+    fleet = [SimulatedClock(str(i), args.interval, i < clients * args.legacy) for i in range(clients)]
+    connecting = asyncio.Semaphore(50)
+
+    async def connect(clock):
+        async with connecting:
+            await clock.connect("127.0.0.1", broker.port)
+
+    await asyncio.gather(*(connect(clock) for clock in fleet))
+
+    async def push_lines():
+        rng = random.Random(0)
+        while True:
+            await asyncio.sleep(1 / args.lines_per_sec)
+            clock = fleet[rng.randrange(clients)]
+            server.push_line(clock.device_id, rng.choice((1, 2)), "#00FF00#load {}".format(local_epoch_ms()))
+
+    start_stats = dict(broker.stats)
+    start = _now_ms()
+    pusher = asyncio.ensure_future(push_lines()) if args.lines_per_sec else None
+    await asyncio.gather(*(clock.run(start + args.duration * 1000) for clock in fleet))
+    await asyncio.sleep(0.5)  # Let the last replies arrive
+    elapsed = (_now_ms() - start) / 1000
+    if pusher:
+        pusher.cancel()
+
+    rtts = [rtt for clock in fleet for rtt in clock.rtts]
+    errors = [abs(error) for clock in fleet for error in clock.errors]
+    lines = [latency for clock in fleet for latency in clock.line_latencies]
+    row = {
+        "clients": clients,
+        "requests/s": sum(clock.requests for clock in fleet) / elapsed,
+        "broker in/s": (broker.stats["received"] - start_stats["received"]) / elapsed,
+        "broker out/s": (broker.stats["delivered"] - start_stats["delivered"]) / elapsed,
+        "coalesced": server.stats["coalesced"],
+        "unanswered": sum(clock.unanswered for clock in fleet),
+        "rtt p50": percentile(rtts, 0.5),
+        "rtt p95": percentile(rtts, 0.95),
+        "rtt p99": percentile(rtts, 0.99),
+        "rtt max": max(rtts) if rtts else float("nan"),
+        "error p95": percentile(errors, 0.95),
+        "line p95": percentile(lines, 0.95),
+    }
+
+    for clock in fleet:
+        await clock.client.close()
+    await server_client.close()
+    await broker.stop()
+    return row
+
+
+def _format(rows):
+    columns = list(rows[0])
+    lines = ["  ".join("{:>12}".format(column) for column in columns)]
+    for row in rows:
+        lines.append("  ".join(("{:>12.1f}" if isinstance(row[c], float) else "{:>12}").format(row[c])
+                               for c in columns))
+    return "\n".join(lines)
+
+
+async def run(args):
+    rows = []
+    for clients in args.clients:
+        rows.append(await run_stage(clients, args))
+        print(_format(rows[-1:]).splitlines()[-1] if len(rows) > 1 else _format(rows), flush=True)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m server.loadtest",
+                                     description="Measure the reference server and broker as the fleet grows.")
+    parser.add_argument("--clients", type=lambda s: [int(n) for n in s.split(",")], default=[50, 100, 200, 400],
+                        help="comma-separated fleet sizes to run, one after another (default 50,100,200,400)")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run each fleet size for (default 10)")
+    parser.add_argument("--interval", type=float, default=2,
+                        help="seconds between each clock's time sync requests (default 2)")
+    parser.add_argument("--legacy", type=float, default=0, metavar="FRACTION",
+                        help="fraction of clocks sending old-style empty requests (default 0)")
+    parser.add_argument("--window", type=float, default=5,
+                        help="ms the server collects requests for before answering (default 5)")
+    parser.add_argument("--lines-per-sec", type=float, default=10,
+                        help="line updates pushed per second, to random clocks (default 10)")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
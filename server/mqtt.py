@@ -0,0 +1,285 @@
+"""Just enough MQTT 3.1.1 over asyncio for the reference server and the load test.
+
+``Broker`` is a stand-in for a real broker (mosquitto etc.): QoS 0 and 1 publishes
+(delivered at QoS 0), retained messages, ``+``/``#`` wildcards, pings. There is no
+authentication and no persistence. ``Client`` is a matching minimal client. Both count
+what they move so the load test can report message rates.
+"""
+
+import asyncio
+import struct
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+def topic_matches(pattern, topic):
+    """MQTT topic filter matching with ``+`` and ``#`` wildcards."""
+    pattern_parts = pattern.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts):
+            return False
+        if part != "+" and part != topic_parts[i]:
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+def _string(text):
+    data = text.encode("utf-8")
+    return struct.pack("!H", len(data)) + data
+
+
+def packet(kind, flags, body):
+    """Encodes a packet: fixed header (with the variable-length remaining length) and body."""
+    header = bytearray([(kind << 4) | flags])
+    length = len(body)
+    while True:
+        byte = length % 128
+        length //= 128
+        header.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(header) + body
+
+
+def publish_packet(topic, payload, retain=False):
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return packet(PUBLISH, 1 if retain else 0, _string(topic) + payload)
+
+
+async def read_packet(reader):
+    """Reads one packet. Returns ``(kind, flags, body)``. Raises IncompleteReadError at EOF."""
+    first = (await reader.readexactly(1))[0]
+    length = 0
+    multiplier = 1
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            break
+        multiplier *= 128
+    body = await reader.readexactly(length) if length else b""
+    return first >> 4, first & 0x0F, body
+
+
+def parse_publish(flags, body):
+    """Returns ``(topic, payload bytes, packet id or None)`` of a PUBLISH body."""
+    length = struct.unpack_from("!H", body)[0]
+    topic = body[2:2 + length].decode("utf-8")
+    i = 2 + length
+    packet_id = None
+    if flags & 0x06:  # QoS 1 or 2
+        packet_id = struct.unpack_from("!H", body, i)[0]
+        i += 2
+    return topic, body[i:], packet_id
+
+
+class _Session:
+    def __init__(self, writer):
+        self.writer = writer
+        self.client_id = None
+        self.subscriptions = []
+
+
+class Broker:
+    """An asyncio MQTT broker for local testing.
+
+    :param str host: Address to listen on.
+    :param int port: Port to listen on. 0 picks a free one (see ``port`` after start())."""
+
+    def __init__(self, host="127.0.0.1", port=1883):
+        self.host = host
+        self.port = port
+        self.sessions = []
+        self.retained = {}
+        self.stats = {"connects": 0, "received": 0, "delivered": 0}
+        self._server = None
+        self._connections = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        session = _Session(writer)
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                kind, flags, body = await read_packet(reader)
+                if kind == CONNECT:
+                    self._connect(session, body)
+                elif kind == PUBLISH:
+                    topic, payload, packet_id = parse_publish(flags, body)
+                    if packet_id is not None:
+                        writer.write(packet(PUBACK, 0, struct.pack("!H", packet_id)))
+                    self.publish(topic, payload, bool(flags & 0x01))
+                elif kind == SUBSCRIBE:
+                    self._subscribe(session, body)
+                elif kind == UNSUBSCRIBE:
+                    packet_id = struct.unpack_from("!H", body)[0]
+                    i = 2
+                    while i < len(body):
+                        length = struct.unpack_from("!H", body, i)[0]
+                        pattern = body[i + 2:i + 2 + length].decode("utf-8")
+                        if pattern in session.subscriptions:
+                            session.subscriptions.remove(pattern)
+                        i += 2 + length
+                    writer.write(packet(UNSUBACK, 0, struct.pack("!H", packet_id)))
+                elif kind == PINGREQ:
+                    writer.write(packet(PINGRESP, 0, b""))
+                elif kind == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            if session in self.sessions:
+                self.sessions.remove(session)
+            writer.close()
+
+    def _connect(self, session, body):
+        length = struct.unpack_from("!H", body)[0]
+        i = 2 + length + 4  # Protocol name, level, flags, keep alive
+        length = struct.unpack_from("!H", body, i)[0]
+        session.client_id = body[i + 2:i + 2 + length].decode("utf-8")
+        # A new connection with the same client id replaces the old one, as in a real broker.
+        for other in list(self.sessions):
+            if other.client_id == session.client_id:
+                self.sessions.remove(other)
+                other.writer.close()
+        self.sessions.append(session)
+        self.stats["connects"] += 1
+        session.writer.write(packet(CONNACK, 0, b"\x00\x00"))
+
+    def _subscribe(self, session, body):
+        packet_id = struct.unpack_from("!H", body)[0]
+        i = 2
+        granted = bytearray()
+        patterns = []
+        while i < len(body):
+            length = struct.unpack_from("!H", body, i)[0]
+            patterns.append(body[i + 2:i + 2 + length].decode("utf-8"))
+            i += 2 + length + 1
+            granted.append(0)
+        session.writer.write(packet(SUBACK, 0, struct.pack("!H", packet_id) + bytes(granted)))
+        for pattern in patterns:
+            if pattern not in session.subscriptions:
+                session.subscriptions.append(pattern)
+            for topic, payload in self.retained.items():
+                if topic_matches(pattern, topic):
+                    session.writer.write(publish_packet(topic, payload, True))
+                    self.stats["delivered"] += 1
+
+    def publish(self, topic, payload, retain=False):
+        """Fans a message out to every matching subscription."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self.stats["received"] += 1
+        if retain:
+            if payload:
+                self.retained[topic] = payload
+            else:
+                self.retained.pop(topic, None)
+        data = None
+        for session in self.sessions:
+            for pattern in session.subscriptions:
+                if topic_matches(pattern, topic):
+                    if data is None:
+                        data = publish_packet(topic, payload)
+                    session.writer.write(data)
+                    self.stats["delivered"] += 1
+                    break
+
+
+class Client:
+    """A minimal asyncio MQTT client. Messages are passed to ``on_message(topic, payload)``
+    (payload as str) from the read loop, in arrival order.
+
+    :param str client_id: The client id to connect with.
+    :param int keep_alive: Seconds between pings, or 0 for none."""
+
+    def __init__(self, client_id, keep_alive=60, on_message=None):
+        self.client_id = client_id
+        self.keep_alive = keep_alive
+        self.on_message = on_message
+        self.sent = 0
+        self.received = 0
+        self._reader = None
+        self._writer = None
+        self._tasks = []
+        self._packet_id = 0
+        self._acks = {}
+
+    async def connect(self, host="127.0.0.1", port=1883):
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        body = (_string("MQTT") + bytes((4, 0x02)) + struct.pack("!H", self.keep_alive)
+                + _string(self.client_id))
+        self._writer.write(packet(CONNECT, 0, body))
+        await self._writer.drain()
+        kind, _, body = await read_packet(self._reader)
+        if kind != CONNACK or body[1] != 0:
+            raise ConnectionError("MQTT connection refused")
+        self._tasks.append(asyncio.ensure_future(self._read_loop()))
+        if self.keep_alive:
+            self._tasks.append(asyncio.ensure_future(self._ping_loop()))
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._writer is not None:
+            try:
+                self._writer.write(packet(DISCONNECT, 0, b""))
+                self._writer.close()
+            except ConnectionError:
+                pass
+
+    async def subscribe(self, *patterns):
+        self._packet_id = self._packet_id % 65535 + 1
+        body = struct.pack("!H", self._packet_id)
+        for pattern in patterns:
+            body += _string(pattern) + b"\x00"
+        ack = asyncio.get_running_loop().create_future()
+        self._acks[self._packet_id] = ack
+        self._writer.write(packet(SUBSCRIBE, 0x02, body))
+        await self._writer.drain()
+        await ack
+
+    def publish(self, topic, payload, retain=False):
+        """Sends a QoS 0 publish. It is buffered; the read loop's awaits flush it."""
+        self._writer.write(publish_packet(topic, payload, retain))
+        self.sent += 1
+
+    async def _read_loop(self):
+        try:
+            while True:
+                kind, flags, body = await read_packet(self._reader)
+                if kind == PUBLISH:
+                    topic, payload, _ = parse_publish(flags, body)
+                    self.received += 1
+                    if self.on_message:
+                        self.on_message(topic, payload.decode("utf-8"))
+                elif kind == SUBACK:
+                    ack = self._acks.pop(struct.unpack_from("!H", body)[0], None)
+                    if ack is not None:
+                        ack.set_result(None)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def _ping_loop(self):
+        while True:
+            await asyncio.sleep(self.keep_alive / 2)
+            self._writer.write(packet(PINGREQ, 0, b""))
+            await self._writer.drain()
@@ -0,0 +1,107 @@
+"""The server side of the clock's MQTT protocol (see the README).
+
+Clocks publish time sync requests on ``adafruit_matrix_clock/time``: ``?<t1>,<id>``
+(answered with ``<epochms>,<t1>`` on ``adafruit_matrix_clock/<id>/time``), ``?<t1>``
+(answered the same way on the shared topic) or an empty message from the original
+firmware (answered with a bare ``<epochms>`` on the shared topic). ``epochms`` is the
+server's local time in milliseconds since the unix epoch.
+
+Requests that arrive within ``window`` seconds of the first unanswered one are answered
+together, from one reading of the clock. A clock that asked twice in that time gets one
+reply (to its newest request), and any number of old-style requests get one shared bare
+reply, which every waiting old-style clock takes as its answer. The window delays replies,
+which the clocks can't tell from network delay, so it should stay small against their
+round trips: half of it ends up as sync error.
+"""
+
+import asyncio
+import time
+
+TOPIC_BASE = "adafruit_matrix_clock/"
+
+
+def local_epoch_ms(utc=False):
+    """The time in milliseconds since the unix epoch, shifted to local time unless ``utc``."""
+    now = time.time()
+    if not utc:
+        now += time.localtime(now).tm_gmtoff
+    return int(now * 1000)
+
+
+class TimeServer:
+    """Answers time sync requests and pushes text to the clocks' lines.
+
+    :param client: A connected ``server.mqtt.Client`` (or anything with ``publish``).
+    :param float window: Seconds to collect requests for before answering them together.
+    :param clock: Returns the time to send, in epoch milliseconds."""
+
+    def __init__(self, client, window=0.005, clock=local_epoch_ms):
+        self.client = client
+        self.window = window
+        self.clock = clock
+        self.time_topic = TOPIC_BASE + "time"
+        self.stats = {"requests": 0, "legacy_requests": 0, "coalesced": 0, "replies": 0, "ticks": 0, "lines": 0}
+        self._pending = {}  # Clock (or "" for every old-style clock) -> (reply topic, echoed t1 or None)
+        self._flush = None
+
+    async def start(self):
+        """Subscribes to the time topic. Requests are answered from ``client.on_message``."""
+        self.client.on_message = self.on_message
+        await self.client.subscribe(self.time_topic)
+
+    def on_message(self, topic, payload):
+        if topic != self.time_topic:
+            return
+        if payload == "":
+            self.stats["legacy_requests"] += 1
+            key, reply_topic, echo = "", self.time_topic, None
+        elif payload[0] == "?":
+            echo, _, device_id = payload[1:].partition(",")
+            if device_id:
+                key = reply_topic = TOPIC_BASE + device_id + "/time"
+            else:
+                key, reply_topic = payload, self.time_topic  # Can't tell these clocks apart
+        else:
+            return  # A reply, possibly our own
+        self.stats["requests"] += 1
+        if key in self._pending:
+            self.stats["coalesced"] += 1
+        self._pending[key] = (reply_topic, echo)
+        if self._flush is None:
+            self._flush = asyncio.get_running_loop().call_later(self.window, self.answer)
+
+    def answer(self):
+        """Answers every pending request from one reading of the clock."""
+        self._flush = None
+        epochms = str(self.clock())
+        pending = self._pending
+        self._pending = {}
+        for reply_topic, echo in pending.values():
+            self.client.publish(reply_topic, epochms if echo is None else epochms + "," + echo)
+            self.stats["replies"] += 1
+
+    async def tick(self, interval):
+        """Broadcasts the time on ``adafruit_matrix_clock/time/tick`` every ``interval`` seconds, forever."""
+        while True:
+            await asyncio.sleep(interval - time.time() % interval)  # On the boundary, for neatness
+            self.client.publish(self.time_topic + "/tick", str(self.clock()))
+            self.stats["ticks"] += 1
+
+    def push_line(self, device_id, line, text):
+        """Sets line ``line`` of clock ``device_id`` (3 and up only show on chained panels). The
+        message is retained, so a clock that connects later (or reboots) shows it too. Color
+        tags ("#RRGGBB#") work anywhere in it."""
+        self.client.publish(TOPIC_BASE + device_id + "/line" + str(line), text, retain=True)
+        self.stats["lines"] += 1
+
+    def push_pages(self, device_id, line, pages):
+        """Sets the carousel pages of line ``line`` of clock ``device_id``, each a string like
+        "SECONDS|TEXT" or "SECONDS,PRIORITY|TEXT" (see app/carousel.py). No pages goes back to
+        the line's plain text. The message is retained, like a line's."""
+        self.client.publish(TOPIC_BASE + device_id + "/line" + str(line) + "/pages", "\n".join(pages), retain=True)
+        self.stats["lines"] += 1
+
+    def push_config(self, device_id, payload):
+        """Sets the settings of clock ``device_id``, as "name=value;..." (see app/config.py). The
+        message is retained, so the clock gets it again whenever it connects."""
+        self.client.publish(TOPIC_BASE + device_id + "/config", payload, retain=True)
@@ -0,0 +1,12 @@
+"""Headless host simulator for the Matrix Portal clock.
+
+Runs the unmodified ``app/code.py`` under CPython with stand-ins for the
+CircuitPython hardware modules (``simulator/stubs``), a virtual monotonic clock
+and an in-process MQTT broker, so the main loop can be profiled and network
+failures reproduced without a Matrix Portal M4. See ``python -m simulator --help``.
+"""
+
+from simulator.clock import SimulationEnd, VirtualClock
+from simulator.network import Broker, Network
+from simulator.render import render, to_ascii, write_png
+from simulator.runner import Simulator
@@ -0,0 +1,154 @@
+"""Command line entry point: ``python -m simulator --help``."""
+
+import argparse
+import ast
+import cProfile
+import os
+import pstats
+import sys
+
+from simulator.render import to_ascii, write_png
+from simulator.runner import Simulator
+
+_DEFAULT_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+
+def _window(spec):
+    """Parses "AT[:DURATION]" in seconds."""
+    at, _, duration = spec.partition(":")
+    return float(at), float(duration) if duration else None
+
+
+def _publish(spec):
+    """Parses "AT:TOPIC:PAYLOAD"."""
+    at, topic, payload = spec.split(":", 2)
+    return float(at), topic, payload
+
+
+def _panel(spec):
+    """Parses "WIDTHxHEIGHT[:TILE_ROWS]" into the secrets.py values that set the matrix size."""
+    size, _, rows = spec.partition(":")
+    width, _, height = size.partition("x")
+    return {"matrix_width": int(width), "matrix_height": int(height), "matrix_tile_rows": int(rows or 1)}
+
+
+def _refresh_cost(spec):
+    """Parses "COMPOSITE_NS[:PANEL_NS]"."""
+    composite, _, panel = spec.partition(":")
+    return float(composite), float(panel or 0)
+
+
+def _secret(spec):
+    """Parses "KEY=VALUE", where VALUE is a Python literal or else a string."""
+    key, _, value = spec.partition("=")
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass
+    return key, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m simulator",
+                                     description="Run app/code.py on a simulated Matrix Portal M4.")
+    parser.add_argument("--app", default=_DEFAULT_APP, help="CIRCUITPY directory to boot (default: app/)")
+    parser.add_argument("--duration", type=float, default=60, help="virtual seconds to run (default 60)")
+    parser.add_argument("--start", default="2026-01-01 09:59:30",
+                        help='local time the time server reports at the start, "YYYY-MM-DD HH:MM:SS"')
+    parser.add_argument("--speed", type=float, default=0, help="0 = as fast as possible, 1 = real time")
+    parser.add_argument("--cpu-scale", type=float, default=0,
+                        help="charge host CPU time to the virtual clock times this factor (e.g. 40 for an M4)")
+    parser.add_argument("--refresh-load", type=float, default=0, metavar="PCT",
+                        help="percent of the CPU the matrix refresh takes per bit of color depth (with --cpu-scale)")
+    parser.add_argument("--refresh-cost", type=_refresh_cost, metavar="COMPOSITE_NS[:PANEL_NS]",
+                        help="make display refreshes take this many ns per pixel composited, plus PANEL_NS per "
+                             "pixel of the panel")
+    parser.add_argument("--panel", type=_panel, metavar="WIDTHxHEIGHT[:TILE_ROWS]",
+                        help="size of the chain of panels (default 64x32), as secrets.py sets it")
+    parser.add_argument("--no-usb", action="store_true", help="report USB as disconnected")
+    parser.add_argument("--latency", type=float, default=20, help="one-way broker latency in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="up to this many ms of extra random broker latency")
+    parser.add_argument("--drift-ppm", type=float, default=0,
+                        help="how fast the device's monotonic clock runs against the time server, in ppm")
+    parser.add_argument("--legacy-time-server", action="store_true",
+                        help="only answer empty time sync requests, like the original time server")
+    parser.add_argument("--time-tick", type=float, metavar="SECONDS",
+                        help="make the time server broadcast the time this often")
+    parser.add_argument("--secret", type=_secret, action="append", default=[], metavar="KEY=VALUE",
+                        help="override a value in the simulated secrets.py")
+    parser.add_argument("--wifi-down", type=_window, action="append", default=[], metavar="AT[:DURATION]")
+    parser.add_argument("--dns-down", type=_window, action="append", default=[], metavar="AT[:DURATION]")
+    parser.add_argument("--broker-down", type=_window, action="append", default=[], metavar="AT[:DURATION]")
+    parser.add_argument("--publish", type=_publish, action="append", default=[], metavar="AT:TOPIC:PAYLOAD",
+                        help="publish a retained message to the broker at a given time")
+    parser.add_argument("--png", metavar="DIR", help="write frames as PNG files into DIR")
+    parser.add_argument("--ascii", action="store_true", help="print frames as ASCII art")
+    parser.add_argument("--ansi", action="store_true", help="print frames in 24-bit color")
+    parser.add_argument("--dump-every", type=float, default=1.0, help="seconds between dumped frames")
+    parser.add_argument("--zoom", type=int, default=8, help="PNG pixels per LED")
+    parser.add_argument("--flash", metavar="DIR", help="keep the simulated filesystem in DIR")
+    parser.add_argument("--trace-alloc", action="store_true", help="make gc.mem_alloc() track allocations")
+    parser.add_argument("--alloc-check", type=float, metavar="SECONDS",
+                        help="from this virtual time on, report what the app allocates, and fail if any "
+                             "scheduler pass allocates")
+    parser.add_argument("--profile", type=int, nargs="?", const=25, metavar="N",
+                        help="profile the run and print the top N functions")
+    parser.add_argument("--quiet", action="store_true", help="hide the device's console output")
+    args = parser.parse_args(argv)
+
+    sim = Simulator(args.app, duration=args.duration, start=args.start, speed=args.speed,
+                    cpu_scale=args.cpu_scale, refresh_load=args.refresh_load / 100.0,
+                    refresh_cost=args.refresh_cost, usb_connected=not args.no_usb, flash_dir=args.flash,
+                    latency=args.latency / 1000.0, jitter=args.jitter / 1000.0, drift_ppm=args.drift_ppm,
+                    trace_alloc=args.trace_alloc, alloc_check=args.alloc_check,
+                    log=None if args.quiet else sys.stdout)
+    sim.network.time_server.legacy_only = args.legacy_time_server
+    if args.time_tick:
+        sim.network.time_server.start_ticking(args.time_tick)
+    if args.panel:
+        sim.secrets.update(args.panel)
+    sim.secrets.update(args.secret)
+    for at, duration in args.wifi_down:
+        sim.network.wifi_down(at, duration)
+    for at, duration in args.dns_down:
+        sim.network.dns_down(at, duration)
+    for at, duration in args.broker_down:
+        sim.network.broker_down(at, duration)
+    for at, topic, payload in args.publish:
+        sim.broker.publish_at(at, topic, payload, retain=True)
+
+    if args.png:
+        os.makedirs(args.png, exist_ok=True)
+
+        def png_sink(elapsed, fb, width, height):
+            write_png(os.path.join(args.png, "frame_{:010.3f}.png".format(elapsed)), fb, width, height, args.zoom)
+
+        sim.dump_frames(args.dump_every, png_sink)
+    if args.ascii or args.ansi:
+
+        def ascii_sink(elapsed, fb, width, height):
+            print("--- t={:.3f}s ---".format(elapsed), file=sys.__stdout__)
+            print(to_ascii(fb, width, height, args.ansi), file=sys.__stdout__)
+
+        sim.dump_frames(args.dump_every, ascii_sink)
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    sim.run()
+    if profiler:
+        profiler.disable()
+
+    fb = sim.frame()
+    if fb is not None and not (args.ascii or args.ansi):
+        print(to_ascii(fb, sim.display.width, sim.display.height, args.ansi))
+    print(sim.report())
+    if profiler:
+        pstats.Stats(profiler).sort_stats("tottime").print_stats(args.profile)
+    if sim.alloc_tracer and sim.alloc_tracer.allocating_passes:
+        return 1
+    return 0 if sim.outcome in ("end", "finished") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Finds what code.py allocates in its steady state.
+
+On the device every allocation eventually costs a garbage collection, which stalls the
+display. CPython frees most objects as soon as they are dropped, so ``gc.mem_alloc()``
+deltas on the host don't show that churn. Instead, ``AllocationTracer`` traces every
+bytecode instruction run in the app's own files and charges any rise in tracemalloc's
+traced memory to the line that ran it.
+
+CPython and CircuitPython don't allocate in all the same places, so some rises are let go:
+
+- ints and floats. CircuitPython stores floats, and ints under 2**30, in the object
+  pointer. Larger ints do allocate, but CPython's int sizes don't say which is which, so
+  calls to ``time.monotonic_ns()``, which always returns one, are charged instead.
+- iterators. MicroPython iterates with a buffer on the stack, and compiles
+  ``for ... in range()`` into a plain counting loop.
+- calls into libraries and the simulator's stubs, which aren't the code that runs on the
+  device. What they allocate is reported, but not charged.
+
+Allocation is traced from ``start`` virtual seconds on. Scheduler passes (from one return
+of ``Scheduler.run_due()`` to the next) that allocated anything are counted, so a check
+can fail when the steady state allocates.
+"""
+
+import dis
+import os
+import sys
+import tracemalloc
+
+_NUMBER_SIZES = (24, 28, 32, 36)  # sys.getsizeof() of floats and of ints up to 2**90
+_RANGE_SIZE = sys.getsizeof(range(0))
+_LONG_INT_SIZE = 16  # What a CircuitPython long int from time.monotonic_ns() takes on the heap
+_GET_ITER = dis.opmap["GET_ITER"]
+
+
+class AllocationTracer:
+    """Charges allocations to the lines of code in ``app_dir``.
+
+    :param str app_dir: Files under this directory are traced (the simulated CIRCUITPY drive).
+    :param clock: The simulator's VirtualClock.
+    :param float start: Virtual seconds after which to start tracing."""
+
+    def __init__(self, app_dir, clock, start=0):
+        self.app_dir = os.path.abspath(app_dir) + os.sep
+        self.clock = clock
+        self.start_ns = clock.start_ns + int(start * 1e9)
+        self.sites = {}  # (file, line) -> [bytes, count]
+        self.library_bytes = 0  # Allocated by calls into libraries and stubs, not charged
+        self.passes = 0
+        self.allocating_passes = 0
+        self._pass_bytes = 0
+        self._last = 0
+        self._where = None  # (file, line) of the instruction about to run
+        self._op = None  # ... and its opcode
+        self._library_call = False  # Whether that instruction called into a library
+        self._app_code = {}  # code object -> traced?
+
+    def install(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        sys.settrace(self._global_trace)
+
+    def uninstall(self):
+        sys.settrace(None)
+
+    def _is_app(self, code):
+        traced = self._app_code.get(code)
+        if traced is None:
+            traced = code.co_filename.startswith(self.app_dir)
+            self._app_code[code] = traced
+        return traced
+
+    def _charge(self, where, size):
+        site = self.sites.get(where)
+        if site is None:
+            site = self.sites[where] = [0, 0]
+        site[0] += size
+        site[1] += 1
+        self._pass_bytes += size
+
+    def _global_trace(self, frame, event, arg):
+        if self.clock.now_ns < self.start_ns:
+            return None
+        if not self._is_app(frame.f_code):
+            if self._where is not None:
+                self._library_call = True
+                if frame.f_code.co_name == "monotonic_ns" and frame.f_back is not None \
+                        and self._is_app(frame.f_back.f_code):
+                    self._charge(self._where, _LONG_INT_SIZE)
+            return None
+        frame.f_trace_lines = False
+        frame.f_trace_opcodes = True
+        # Whatever a library did before calling back into the app isn't the app's doing.
+        self._where = None
+        self._last = tracemalloc.get_traced_memory()[0]
+        return self._local_trace
+
+    def _local_trace(self, frame, event, arg):
+        if event == "opcode":
+            grew = tracemalloc.get_traced_memory()[0] - self._last
+            if grew > 0 and self._where is not None:
+                if self._library_call:
+                    self.library_bytes += grew
+                elif grew in _NUMBER_SIZES or self._op == _GET_ITER:
+                    pass
+                elif grew == _RANGE_SIZE and frame.f_code.co_code[frame.f_lasti] == _GET_ITER:
+                    pass  # range() in a for loop
+                else:
+                    self._charge(self._where, grew)
+            self._where = (frame.f_code.co_filename, frame.f_lineno)
+            self._op = frame.f_code.co_code[frame.f_lasti]
+            self._library_call = False
+            # The tracer's own locals must be gone before the next reading, or freeing them
+            # when it returns would hide what the next instruction allocates.
+            del grew
+            self._last = tracemalloc.get_traced_memory()[0]
+        elif event == "return":
+            if frame.f_code.co_name == "run_due" and frame.f_code.co_filename.endswith("scheduler.py"):
+                self.passes += 1
+                if self._pass_bytes:
+                    self.allocating_passes += 1
+                self._pass_bytes = 0
+            self._where = None
+        return self._local_trace
+
+    def report(self, top=15):
+        """Returns a summary: how many passes allocated, and the lines that allocated most."""
+        lines = ["Allocations after {:.0f}s: {} of {} scheduler passes allocated, {} bytes in library calls".format(
+            (self.start_ns - self.clock.start_ns) / 1e9, self.allocating_passes, self.passes, self.library_bytes)]
+        sites = sorted(self.sites.items(), key=lambda item: -item[1][0])
+        for (filename, lineno), (size, count) in sites[:top]:
+            lines.append("  {:>9} bytes {:>7} times  {}:{}".format(
+                size, count, os.path.relpath(filename, self.app_dir), lineno))
+        return "\n".join(lines)
@@ -0,0 +1,120 @@
+"""Virtual monotonic clock for the simulator.
+
+Everything in the simulated device reads time from one VirtualClock. Time only
+moves when code.py sleeps or blocks on the (fake) network, so a simulated hour
+runs in however long the Python work inside it takes on the host.
+"""
+
+import heapq
+import time as _host_time
+
+
+class SimulationEnd(BaseException):
+    """Raised from inside the simulated device when the requested duration has elapsed.
+
+    Derives from BaseException so the ``except Exception`` handlers in code.py don't swallow it."""
+
+
+class VirtualClock:
+    """A monotonic nanosecond clock with a queue of timed events.
+
+    :param float duration: Seconds of virtual time to run before raising SimulationEnd.
+     None runs forever.
+    :param float speed: 0 runs as fast as possible. Otherwise the host really sleeps
+     1/speed seconds for every virtual second spent sleeping (1.0 is real time).
+    :param float cpu_scale: When nonzero, host CPU time spent between waits is also added
+     to virtual time, multiplied by this factor. Use it to model a slower CPU (the M4 is
+     very roughly 30-50x slower than a desktop core at running Python).
+
+    ``interrupt_load`` is the fraction of the CPU taken by interrupts (the matrix refresh).
+    Charged CPU time is stretched to match, as the device's main loop only gets the rest."""
+
+    def __init__(self, duration=None, speed=0, cpu_scale=0, start_ns=1000000000):
+        self.now_ns = start_ns
+        self.start_ns = start_ns
+        self.end_ns = None if duration is None else start_ns + int(duration * 1e9)
+        self.speed = speed
+        self.cpu_scale = cpu_scale
+        self.interrupt_load = 0.0
+        self._events = []
+        self._event_seq = 0
+        self._advance_hooks = []
+        self._busy_since = self._charged_until = _host_time.perf_counter_ns()
+        self._wait_hooks = []
+        self.waited_ns = {}
+
+    @property
+    def elapsed(self):
+        """Seconds of virtual time since the clock was created."""
+        return (self.now_ns - self.start_ns) / 1e9
+
+    def monotonic_ns(self):
+        self._charge_cpu()
+        self._check_end()
+        return self.now_ns
+
+    def schedule(self, delay, callback, *args):
+        """Runs ``callback(*args)`` once ``delay`` virtual seconds have passed."""
+        self.schedule_at_ns(self.now_ns + int(delay * 1e9), callback, *args)
+
+    def schedule_at_ns(self, when_ns, callback, *args):
+        self._event_seq += 1
+        heapq.heappush(self._events, (when_ns, self._event_seq, callback, args))
+
+    def next_event_ns(self):
+        return self._events[0][0] if self._events else None
+
+    def on_advance(self, hook):
+        """Registers ``hook(old_ns, new_ns)``, called every time virtual time moves forward."""
+        self._advance_hooks.append(hook)
+
+    def on_wait(self, hook):
+        """Registers ``hook(busy_host_ns, kind)``, called when the device starts waiting.
+        ``busy_host_ns`` is the host CPU time the device spent since its previous wait."""
+        self._wait_hooks.append(hook)
+
+    def sleep(self, seconds, kind="sleep"):
+        """Blocks the simulated device for ``seconds`` of virtual time, running any events due
+        meanwhile. ``kind`` tallies where the time went ("sleep", "net", ...)."""
+        busy = _host_time.perf_counter_ns() - self._busy_since
+        for hook in self._wait_hooks:
+            hook(busy, kind)
+        self._charge_cpu()
+        target = self.now_ns + max(0, int(seconds * 1e9))
+        self.waited_ns[kind] = self.waited_ns.get(kind, 0) + (target - self.now_ns)
+        self.advance_to(target)
+        self._busy_since = self._charged_until = _host_time.perf_counter_ns()
+
+    def advance_to(self, target_ns):
+        """Moves virtual time forward to ``target_ns``, running due events in order."""
+        if self.end_ns is not None and target_ns > self.end_ns:
+            target_ns = self.end_ns
+        while self._events and self._events[0][0] <= target_ns:
+            when, _, callback, args = heapq.heappop(self._events)
+            self._move(max(when, self.now_ns))
+            callback(*args)
+        self._move(max(target_ns, self.now_ns))
+        self._check_end()
+
+    def _move(self, new_ns):
+        old_ns = self.now_ns
+        if new_ns <= old_ns:
+            return
+        if self.speed:
+            _host_time.sleep((new_ns - old_ns) / 1e9 / self.speed)
+        self.now_ns = new_ns
+        for hook in self._advance_hooks:
+            hook(old_ns, new_ns)
+
+    def _charge_cpu(self):
+        if not self.cpu_scale:
+            return
+        host_now = _host_time.perf_counter_ns()
+        busy = host_now - self._charged_until
+        self._charged_until = host_now
+        if busy > 0:
+            self._move(self.now_ns + int(busy * self.cpu_scale / (1 - self.interrupt_load)))
+
+    def _check_end(self):
+        if self.end_ns is not None and self.now_ns >= self.end_ns:
+            raise SimulationEnd()
@@ -0,0 +1,6 @@
+"""Handle to the running Simulator, shared by the fake modules in ``simulator/stubs``.
+
+The stubs are imported by code.py as if they were CircuitPython's own modules, so
+they can't be handed the simulator directly. They look it up here instead."""
+
+sim = None
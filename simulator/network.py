@@ -0,0 +1,252 @@
+"""Simulated Wi-Fi access point, DNS and MQTT broker.
+
+The fake ESP32 and MiniMQTT modules in ``simulator/stubs`` talk to one Network
+instance. Faults (AP outages, DNS failures, broker restarts) are scheduled on
+the virtual clock so reconnect storms can be reproduced deterministically.
+"""
+
+import calendar
+import random
+import time as _host_time
+
+
+def topic_matches(pattern, topic):
+    """MQTT topic filter matching with ``+`` and ``#`` wildcards."""
+    pattern_parts = pattern.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts):
+            return False
+        if part != "+" and part != topic_parts[i]:
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class Session:
+    """One client connection to the Broker."""
+
+    def __init__(self, broker, client_id):
+        self.broker = broker
+        self.client_id = client_id
+        self.subscriptions = []
+        self.inbox = []  # (arrival_ns, topic, payload), in arrival order
+        self.alive = True
+
+    def pending(self, now_ns):
+        """Returns the next message that has arrived by ``now_ns``, or None."""
+        if self.inbox and self.inbox[0][0] <= now_ns:
+            return self.inbox.pop(0)
+        return None
+
+    def next_arrival_ns(self):
+        return self.inbox[0][0] if self.inbox else None
+
+
+class Broker:
+    """A minimal in-process MQTT broker with retained messages.
+
+    :param clock: The VirtualClock.
+    :param float latency: One-way delivery latency in seconds.
+    :param float jitter: Up to this many extra seconds of random delivery latency."""
+
+    def __init__(self, clock, latency=0.02, jitter=0):
+        self.clock = clock
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(1)
+        self.online = True
+        self.sessions = []
+        self.retained = {}
+        self.publish_hooks = []
+        self.stats = {"connects": 0, "refused": 0, "received": 0, "delivered": 0}
+        self.topic_counts = {}
+
+    def connect(self, client_id):
+        if not self.online:
+            self.stats["refused"] += 1
+            return None
+        self.stats["connects"] += 1
+        session = Session(self, client_id)
+        self.sessions.append(session)
+        return session
+
+    def disconnect(self, session):
+        session.alive = False
+        if session in self.sessions:
+            self.sessions.remove(session)
+
+    def subscribe(self, session, pattern):
+        if pattern not in session.subscriptions:
+            session.subscriptions.append(pattern)
+        for topic, payload in self.retained.items():
+            if topic_matches(pattern, topic):
+                self._deliver(session, topic, payload)
+
+    def publish(self, topic, payload, retain=False, sender=None):
+        """Accepts a message from a client (or from the simulation script) and fans it out
+        to every matching subscription after the delivery latency."""
+        if isinstance(payload, (bytes, bytearray)):
+            payload = payload.decode("utf-8")
+        else:
+            payload = str(payload)
+        self.stats["received"] += 1
+        self.topic_counts[topic] = self.topic_counts.get(topic, 0) + 1
+        if retain:
+            if payload == "":
+                self.retained.pop(topic, None)
+            else:
+                self.retained[topic] = payload
+        for session in list(self.sessions):
+            for pattern in session.subscriptions:
+                if topic_matches(pattern, topic):
+                    self._deliver(session, topic, payload)
+                    break
+        for hook in self.publish_hooks:
+            hook(topic, payload, sender)
+
+    def publish_at(self, at, topic, payload, retain=False):
+        """Schedules a publish from outside the device, ``at`` seconds into the simulation."""
+        self.clock.schedule_at_ns(self.clock.start_ns + int(at * 1e9), self.publish, topic, payload, retain)
+
+    def _deliver(self, session, topic, payload):
+        arrival = self.clock.now_ns + int((self.latency + self.random.uniform(0, self.jitter)) * 1e9)
+        if session.inbox:
+            arrival = max(arrival, session.inbox[-1][0])  # Still delivered in order
+        session.inbox.append((arrival, topic, payload))
+        self.stats["delivered"] += 1
+
+    def go_offline(self):
+        """Simulates the broker process dying: every session is dropped and new connections are refused."""
+        self.online = False
+        for session in list(self.sessions):
+            self.disconnect(session)
+
+    def go_online(self):
+        self.online = True
+
+
+class TimeServer:
+    """Stands in for the proprietary time server. Answers a publish of "?<t1>,<id>" on the
+    time topic with "<epochms>,<t1>" (the current local time in epoch milliseconds, echoing
+    the request's timestamp) on ``adafruit_matrix_clock/<id>/time``. A request without an id
+    is answered the same way on the time topic, and an empty publish with a bare "<epochms>".
+    With ``tick_interval`` set, it also broadcasts "<epochms>" on ``<time topic>/tick``.
+
+    :param broker: The Broker to listen on.
+    :param float epoch_start: Local epoch seconds at virtual time zero.
+    :param float delay: Seconds the server takes to answer."""
+
+    def __init__(self, broker, epoch_start, topic="adafruit_matrix_clock/time", delay=0.005):
+        self.broker = broker
+        self.epoch_start = epoch_start
+        self.topic = topic
+        self.delay = delay
+        self.requests = 0
+        self.legacy_only = False  # Ignore "?<t1>" requests, like a server that predates them
+        self.ticks = 0
+        broker.publish_hooks.append(self._on_publish)
+
+    def start_ticking(self, interval):
+        """Broadcasts the time every ``interval`` seconds from now on."""
+        def tick():
+            if self.broker.online:
+                self.ticks += 1
+                self.broker.publish(self.topic + "/tick", str(self.epoch_ms()))
+            self.broker.clock.schedule(interval, tick)
+
+        self.broker.clock.schedule(interval, tick)
+
+    def epoch_ms(self):
+        clock = self.broker.clock
+        return int(self.epoch_start * 1000) + (clock.now_ns - clock.start_ns) // 1000000
+
+    def _on_publish(self, topic, payload, sender):
+        if topic != self.topic:
+            return
+        reply_topic = self.topic
+        if payload == "":
+            echo = None
+        elif payload[0] == "?" and not self.legacy_only:
+            echo, _, device_id = payload[1:].partition(",")
+            if device_id:
+                reply_topic = self.topic.rpartition("/")[0] + "/" + device_id + "/time"
+        else:
+            return
+        self.requests += 1
+        self.broker.clock.schedule(self.delay, self._reply, reply_topic, echo)
+
+    def _reply(self, reply_topic, echo):
+        if self.broker.online:
+            epoch_ms = str(self.epoch_ms())
+            self.broker.publish(reply_topic, epoch_ms if echo is None else epoch_ms + "," + echo)
+
+
+class Network:
+    """The simulated environment outside the device: access point, DNS and broker.
+
+    :param clock: The VirtualClock.
+    :param str start: Local wall-clock time at virtual time zero, "YYYY-MM-DD HH:MM:SS".
+    :param float latency: One-way broker latency in seconds.
+    :param float jitter: Up to this many extra seconds of random broker latency."""
+
+    def __init__(self, clock, start="2026-01-01 09:59:30", latency=0.02, jitter=0):
+        self.clock = clock
+        self.ap_up = True
+        self.dns_up = True
+        self.hosts = {}
+        self.associate_time = 2.5
+        self.connect_fail_time = 1.0
+        self.dns_time = 0.1  # A hostname lookup through the ESP32, whether or not it works
+        self.broker = Broker(clock, latency, jitter)
+        self.epoch_start = calendar.timegm(_host_time.strptime(start, "%Y-%m-%d %H:%M:%S"))
+        self.time_server = TimeServer(self.broker, self.epoch_start)
+        self.events = []
+
+    def _window(self, at, duration, down, up, label):
+        start_ns = self.clock.start_ns + int(at * 1e9)
+        self.clock.schedule_at_ns(start_ns, self._log, label + " down", down)
+        if duration is not None:
+            self.clock.schedule_at_ns(start_ns + int(duration * 1e9), self._log, label + " up", up)
+
+    def _log(self, what, action):
+        self.events.append((self.clock.elapsed, what))
+        action()
+
+    def wifi_down(self, at, duration=None):
+        """Takes the access point away ``at`` seconds in, for ``duration`` seconds (None = forever)."""
+        self._window(at, duration, self._ap_down, self._ap_up, "wifi")
+
+    def dns_down(self, at, duration=None):
+        """Makes hostname lookups fail for a while. IP address literals still work."""
+        self._window(at, duration, lambda: setattr(self, "dns_up", False),
+                     lambda: setattr(self, "dns_up", True), "dns")
+
+    def broker_down(self, at, duration=None):
+        """Kills the broker (dropping every session) for a while."""
+        self._window(at, duration, self.broker.go_offline, self.broker.go_online, "broker")
+
+    def _ap_down(self):
+        self.ap_up = False
+        # The device's TCP connections die with the AP; it only notices on its next send.
+        for session in list(self.broker.sessions):
+            self.broker.disconnect(session)
+
+    def _ap_up(self):
+        self.ap_up = True
+
+    @staticmethod
+    def is_address(hostname):
+        """Whether ``hostname`` is an IPv4 address literal, which needs no lookup."""
+        parts = hostname.split(".")
+        return len(parts) == 4 and all(p.isdigit() for p in parts)
+
+    def resolve(self, hostname):
+        """Returns the address for ``hostname``, raising RuntimeError the way the ESP32 does."""
+        if self.is_address(hostname):
+            return hostname
+        self.clock.sleep(self.dns_time, "net")
+        if not self.dns_up or not self.ap_up:
+            raise RuntimeError("Failed to request hostname")
+        return self.hosts.get(hostname, "10.0.0.2")
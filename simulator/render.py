@@ -0,0 +1,173 @@
+"""Composites a displayio tree into an RGB framebuffer and writes frames as PNG or ASCII.
+
+Layers are recognized by duck typing, because code.py re-imports the displayio stub
+(getting fresh classes) every time it reloads."""
+
+import math
+import struct
+import zlib
+
+
+def render(display):
+    """Returns the pixels ``display`` would show right now as a ``bytearray`` of
+    ``width * height`` RGB triplets, quantized to the matrix bit depth."""
+    fb = bytearray(display.width * display.height * 3)
+    render_area(display, fb, (0, 0, display.width, display.height))
+    return fb
+
+
+def render_area(display, fb, area):
+    """Draws the ``(x1, y1, x2, y2)`` area of what ``display`` would show into ``fb`` (as
+    render() returns it), leaving the rest of ``fb`` as it was."""
+    width = display.width
+    x1, y1, x2, y2 = area
+    for y in range(y1, y2):
+        fb[(y * width + x1) * 3:(y * width + x2) * 3] = bytes((x2 - x1) * 3)
+    if display.root_group is not None:
+        _draw(display.root_group, 0, 0, 1, fb, width, area)
+    bit_depth = getattr(display, "bit_depth", 8)
+    if bit_depth < 8:
+        mask = (0xFF << (8 - bit_depth)) & 0xFF
+        for y in range(y1, y2):
+            row = slice((y * width + x1) * 3, (y * width + x2) * 3)
+            fb[row] = bytes(value & mask for value in fb[row])
+
+
+def layer_areas(layer, ox=0, oy=0, scale=1):
+    """Yields ``(tilegrid, (x1, y1, x2, y2), scale)`` for each TileGrid shown under ``layer``,
+    in drawing order, with the area it covers on the display."""
+    if layer.hidden:
+        return
+    if hasattr(layer, "_layers"):
+        ox += layer.x * scale
+        oy += layer.y * scale
+        scale *= layer.scale
+        for child in layer:
+            yield from layer_areas(child, ox, oy, scale)
+    elif hasattr(layer, "_tiles"):
+        x = ox + layer.x * scale
+        y = oy + layer.y * scale
+        w = layer.width * layer.tile_width * scale
+        h = layer.height * layer.tile_height * scale
+        if layer.transpose_xy:
+            w, h = h, w
+        yield layer, (x, y, x + w, y + h), scale
+
+
+def _draw(layer, ox, oy, scale, fb, width, clip):
+    if layer.hidden:
+        return
+    if hasattr(layer, "_layers"):
+        ox += layer.x * scale
+        oy += layer.y * scale
+        scale *= layer.scale
+        for child in layer:
+            _draw(child, ox, oy, scale, fb, width, clip)
+    elif hasattr(layer, "_tiles"):
+        _draw_tilegrid(layer, ox + layer.x * scale, oy + layer.y * scale, scale, fb, width, clip)
+
+
+def _draw_tilegrid(grid, ox, oy, scale, fb, width, clip):
+    # pylint: disable=too-many-locals
+    bitmap = grid.bitmap
+    shader = grid.pixel_shader
+    tile_w = grid.tile_width
+    tile_h = grid.tile_height
+    tiles_per_row = bitmap.width // tile_w
+    data = bitmap._data
+    bmp_w = bitmap.width
+    is_palette = hasattr(shader, "is_transparent")
+    out_w = grid.width * tile_w
+    out_h = grid.height * tile_h
+    if grid.transpose_xy:
+        out_w, out_h = out_h, out_w
+    clip_x1, clip_y1, clip_x2, clip_y2 = clip
+    for out_y in range(out_h):
+        py = oy + out_y * scale
+        if py + scale <= clip_y1 or py >= clip_y2:
+            continue
+        for out_x in range(out_w):
+            px = ox + out_x * scale
+            if px + scale <= clip_x1 or px >= clip_x2:
+                continue
+            gx, gy = (out_y, out_x) if grid.transpose_xy else (out_x, out_y)
+            if grid.flip_x:
+                gx = grid.width * tile_w - 1 - gx
+            if grid.flip_y:
+                gy = grid.height * tile_h - 1 - gy
+            tile = grid[(gx // tile_w) + (gy // tile_h) * grid.width]
+            sx = (tile % tiles_per_row) * tile_w + gx % tile_w
+            sy = (tile // tiles_per_row) * tile_h + gy % tile_h
+            value = data[sy * bmp_w + sx]
+            if is_palette:
+                if shader.is_transparent(value):
+                    continue
+                color = shader[value]
+            else:
+                color = shader.convert(value)
+            for dy in range(scale):
+                y = py + dy
+                if y < clip_y1 or y >= clip_y2:
+                    continue
+                for dx in range(scale):
+                    x = px + dx
+                    if clip_x1 <= x < clip_x2:
+                        i = (y * width + x) * 3
+                        fb[i] = color >> 16
+                        fb[i + 1] = (color >> 8) & 0xFF
+                        fb[i + 2] = color & 0xFF
+
+
+def write_png(path, fb, width, height, zoom=8):
+    """Writes an RGB framebuffer to ``path`` as a PNG, each pixel drawn as a ``zoom``-sized
+    square with a 1px dark gap so it looks like an LED panel."""
+    rows = []
+    for y in range(height * zoom):
+        row = bytearray(b"\x00")
+        src_y = y // zoom
+        for x in range(width * zoom):
+            src_x = x // zoom
+            if zoom > 2 and (x % zoom == zoom - 1 or y % zoom == zoom - 1):
+                row += b"\x10\x10\x10"
+            else:
+                i = (src_y * width + src_x) * 3
+                row += fb[i:i + 3]
+        rows.append(bytes(row))
+    raw = b"".join(rows)
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width * zoom, height * zoom, 8, 2, 0, 0, 0)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", header))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 9)))
+        f.write(chunk(b"IEND", b""))
+
+
+_RAMP = " .:-=+*#%@"
+
+
+def to_ascii(fb, width, height, ansi=False):
+    """Returns the framebuffer as text, one character per pixel. With ``ansi`` each lit pixel
+    is drawn as a block in its own 24-bit color."""
+    lines = []
+    for y in range(height):
+        line = []
+        for x in range(width):
+            i = (y * width + x) * 3
+            r, g, b = fb[i], fb[i + 1], fb[i + 2]
+            level = max(r, g, b)
+            if ansi:
+                line.append("\x1b[38;2;%d;%d;%dm█" % (r, g, b) if level else "\x1b[0m ")
+            elif level:
+                # Square-root ramp so the dim status lines are still readable.
+                line.append(_RAMP[max(1, round(math.sqrt(level / 255) * (len(_RAMP) - 1)))])
+            else:
+                line.append(" ")
+        if ansi:
+            line.append("\x1b[0m")
+        lines.append("".join(line))
+    return "\n".join(lines)
@@ -0,0 +1,385 @@
+"""Runs the real app/code.py on the host against the fake CircuitPython modules."""
+
+import builtins
+import os
+import shutil
+import sys
+import tempfile
+import time as _host_time
+import tracemalloc
+import traceback
+
+from simulator import hw
+from simulator.alloc import AllocationTracer
+from simulator.clock import SimulationEnd, VirtualClock
+from simulator.network import Network
+from simulator.render import render
+
+STUBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+
+# 2000-01-01 00:00:00, where the SAMD51 RTC starts after power-up.
+_RTC_POWER_ON_EPOCH = 946684800
+
+DEFAULT_SECRETS = {
+    "ssid": "simulated-ap",
+    "password": "simulated",
+    "mqttbroker": "10.0.0.2",
+    "mqttport": 1883,
+    "mqttuser": "",
+    "mqttpass": "",
+    "color_nowifi": (51, 0, 0),
+    "color_wifi": (0, 0, 0),
+    "matrix_portal_id": "1",
+}
+
+
+class ReloadRequested(BaseException):
+    """Raised by the fake ``supervisor.reload()``."""
+
+
+class ResetRequested(BaseException):
+    """Raised by the fake ``microcontroller.reset()``."""
+
+
+class Stats:
+    """Counters and timing samples collected while the simulation runs."""
+
+    BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100)
+
+    def __init__(self):
+        self.counters = {}
+        self.busy_samples = []
+        self.boots = []
+        self.remounts = 0
+        self.frames_dumped = 0
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_busy(self, busy_ns, kind):
+        self.busy_samples.append(busy_ns)
+
+    def busy_summary(self):
+        samples = sorted(self.busy_samples)
+        if not samples:
+            return "no waits recorded"
+
+        def pct(p):
+            return samples[min(len(samples) - 1, int(len(samples) * p))] / 1e6
+
+        mean = sum(samples) / len(samples) / 1e6
+        return "n={} mean={:.3f}ms p50={:.3f}ms p95={:.3f}ms p99={:.3f}ms max={:.3f}ms".format(
+            len(samples), mean, pct(0.5), pct(0.95), pct(0.99), samples[-1] / 1e6)
+
+    def busy_histogram(self):
+        counts = [0] * (len(self.BUCKETS_MS) + 1)
+        for sample in self.busy_samples:
+            ms = sample / 1e6
+            for i, edge in enumerate(self.BUCKETS_MS):
+                if ms < edge:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        labels = ["<{}ms".format(edge) for edge in self.BUCKETS_MS] + [">={}ms".format(self.BUCKETS_MS[-1])]
+        return ", ".join("{}: {}".format(label, n) for label, n in zip(labels, counts) if n)
+
+
+class _DeviceOutput:
+    """Stands in for the USB serial console: prefixes each line with the virtual time."""
+
+    def __init__(self, sim, stream):
+        self.sim = sim
+        self.stream = stream
+        self._at_line_start = True
+
+    def write(self, text):
+        if self.stream is None:
+            return len(text)
+        for part in text.splitlines(True):
+            if self._at_line_start:
+                self.stream.write("[{:10.3f}] ".format(self.sim.clock.elapsed))
+            self.stream.write(part)
+            self._at_line_start = part.endswith("\n")
+        return len(text)
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+
+class Simulator:
+    """Boots ``code.py`` from ``app_dir`` on a simulated Matrix Portal M4.
+
+    :param str app_dir: The directory that would be the CIRCUITPY drive (``app/``).
+    :param float duration: Seconds of virtual time to simulate.
+    :param str start: Local wall-clock time the time server reports at the start.
+    :param float speed: 0 for as fast as possible, 1.0 for real time.
+    :param float cpu_scale: Charge host CPU time to the virtual clock, multiplied by this.
+    :param float refresh_load: Fraction of the CPU the matrix refresh takes per bit of color
+     depth (with ``cpu_scale``), so deeper colors leave the main loop less time.
+    :param tuple refresh_cost: Nanoseconds a display refresh takes per pixel composited, and
+     per pixel of the panel (see ``SimulatedDisplay``), or None for refreshes to take no time.
+    :param bool usb_connected: What ``supervisor.runtime.usb_connected`` reports.
+    :param dict secrets: Contents of the simulated ``secrets.py``.
+    :param str flash_dir: Where to put the simulated filesystem. Defaults to a temp dir.
+    :param float latency: One-way broker latency in seconds.
+    :param float jitter: Up to this many extra seconds of random broker latency.
+    :param float drift_ppm: How fast the device's monotonic clock runs, in parts per million
+     (e.g. 50 gains 50 us per second against the time server).
+    :param bool trace_alloc: Trace allocations so ``gc.mem_alloc()`` reports real numbers.
+    :param float alloc_check: Charge what the app allocates from this many virtual seconds on
+     to the lines that allocate (see ``simulator.alloc``). None to not check.
+    :param log: Stream for the device's console output, or None to discard it."""
+
+    # pylint: disable=too-many-instance-attributes,too-many-arguments
+    def __init__(self, app_dir, *, duration=60, start="2026-01-01 09:59:30", speed=0, cpu_scale=0,
+                 refresh_load=0, refresh_cost=None, usb_connected=True, secrets=None, flash_dir=None, latency=0.02, jitter=0, drift_ppm=0,
+                 trace_alloc=False, alloc_check=None, log=sys.stdout, heap_size=160 * 1024):
+        self.app_dir = os.path.abspath(app_dir)
+        self.clock = VirtualClock(duration, speed, cpu_scale)
+        self.network = Network(self.clock, start, latency, jitter)
+        self.drift_ppm = drift_ppm
+        self.refresh_load = refresh_load
+        self.refresh_cost = refresh_cost
+        self.broker = self.network.broker
+        self.stats = Stats()
+        self.nvm = bytearray(8192)
+        self.watchdog = None  # microcontroller.watchdog, once code.py uses it
+        self.reset_reason = "POWER_ON"
+        self.usb_connected = usb_connected
+        self.secrets = dict(DEFAULT_SECRETS if secrets is None else secrets)
+        self.flash_dir = flash_dir
+        self.trace_alloc = trace_alloc or alloc_check is not None
+        self.alloc_tracer = None if alloc_check is None else AllocationTracer(app_dir, self.clock, alloc_check)
+        self.heap_size = heap_size
+        self.log = log
+        self.display = None
+        self.device_globals = None  # code.py's module namespace, while it runs
+        self.status_light = None
+        self.flash_writable = False
+        self.outcome = None
+        self.host_seconds = 0
+        self._rtc_offset = _RTC_POWER_ON_EPOCH
+        self._frame_sinks = []
+        self.clock.on_wait(self.stats.record_busy)
+        self.clock.on_advance(self._on_advance)
+
+    # Called by the stubs
+
+    def rtc_seconds(self):
+        return self._rtc_offset + (self.clock.now_ns - self.clock.start_ns) / 1e9
+
+    def device_monotonic_ns(self):
+        """The device's monotonic clock, which drifts from the virtual clock by ``drift_ppm``."""
+        now_ns = self.clock.monotonic_ns()
+        return now_ns + int((now_ns - self.clock.start_ns) * self.drift_ppm / 1e6)
+
+    def set_rtc(self, seconds):
+        self._rtc_offset = seconds - (self.clock.now_ns - self.clock.start_ns) / 1e9
+
+    def attach_display(self, display):
+        self.display = display
+        self.clock.interrupt_load = min(0.9, self.refresh_load * display.bit_depth)
+
+    # Frame capture
+
+    def dump_frames(self, interval, sink):
+        """Calls ``sink(elapsed_seconds, framebuffer, width, height)`` every ``interval``
+        virtual seconds with what the panel shows."""
+        self._frame_sinks.append([int(interval * 1e9), self.clock.now_ns, sink])
+
+    def frame(self):
+        """Returns what the panel shows right now, as an RGB bytearray, or None before the
+        matrix exists. With auto_refresh off that's the last refreshed frame."""
+        display = self.display
+        if display is None:
+            return None
+        if display.auto_refresh or display.framebuffer is None:
+            return render(display)
+        return display.framebuffer
+
+    def _on_advance(self, old_ns, new_ns):
+        for entry in self._frame_sinks:
+            interval, next_ns, sink = entry
+            if new_ns < next_ns or self.display is None:
+                continue
+            fb = self.frame()
+            while next_ns <= new_ns:
+                sink((next_ns - self.clock.start_ns) / 1e9, fb, self.display.width, self.display.height)
+                self.stats.frames_dumped += 1
+                next_ns += interval
+            entry[1] = next_ns
+
+    # Running
+
+    def run(self):
+        """Boots code.py, following reloads and resets, until the duration is used up or the
+        program exits. Returns the outcome: "end", "finished" or "crashed"."""
+        host_start = _host_time.perf_counter()
+        saved = self._install()
+        try:
+            code_path = os.path.join(self.flash_dir, "code.py")
+            with saved["open"](code_path) as f:
+                code = compile(f.read(), code_path, "exec")
+            while True:
+                self.outcome = self._boot(code, code_path)
+                if self.outcome not in ("reload", "reset"):
+                    break
+        finally:
+            self._uninstall(saved)
+            self.host_seconds = _host_time.perf_counter() - host_start
+        return self.outcome
+
+    def _boot(self, code, code_path):
+        before = set(sys.modules)
+        self.stats.boots.append(self.clock.elapsed)
+        self.display = None
+        self.flash_writable = False
+        try:
+            self.device_globals = {"__name__": "__main__", "__file__": code_path}
+            exec(code, self.device_globals)  # pylint: disable=exec-used
+            return "finished"
+        except ReloadRequested:
+            self.stats.count("reloads")
+            outcome = "reload"
+        except ResetRequested:
+            self.stats.count("resets")
+            outcome = "reset"
+        except SimulationEnd:
+            return "end"
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc(file=sys.stdout)
+            return "crashed"
+        for name in set(sys.modules) - before:
+            del sys.modules[name]
+        try:
+            self.clock.sleep(0.5, "boot")
+        except SimulationEnd:
+            return "end"
+        return outcome
+
+    def _install(self):
+        if self.flash_dir is None:
+            self.flash_dir = tempfile.mkdtemp(prefix="matrixportal-flash-")
+        os.makedirs(self.flash_dir, exist_ok=True)
+        for name in os.listdir(self.app_dir):
+            if name in ("lib", "secrets.py", "__pycache__"):
+                continue
+            src = os.path.join(self.app_dir, name)
+            dst = os.path.join(self.flash_dir, name)
+            if os.path.isdir(src):
+                shutil.copytree(src, dst, dirs_exist_ok=True)
+            else:
+                shutil.copyfile(src, dst)
+        with open(os.path.join(self.flash_dir, "secrets.py"), "w") as f:
+            f.write("secrets = {!r}\n".format(self.secrets))
+
+        saved = {
+            "path": list(sys.path),
+            "modules": {name: sys.modules.get(name) for name in ("time", "gc")},
+            "open": builtins.open,
+            "cwd": os.getcwd(),
+            "stdout": sys.stdout,
+            "dont_write_bytecode": sys.dont_write_bytecode,
+        }
+        sys.path[:0] = [self.flash_dir, STUBS_DIR]
+        sys.dont_write_bytecode = True
+        import vtime  # pylint: disable=import-outside-toplevel,import-error
+        import vgc  # pylint: disable=import-outside-toplevel,import-error
+
+        sys.modules["time"] = vtime
+        sys.modules["gc"] = vgc
+        builtins.open = self._make_open(saved["open"])
+        os.chdir(self.flash_dir)
+        sys.stdout = _DeviceOutput(self, self.log)
+        if self.trace_alloc:
+            tracemalloc.start()
+        hw.sim = self
+        if self.alloc_tracer:
+            self.alloc_tracer.app_dir = os.path.abspath(self.flash_dir) + os.sep
+            self.alloc_tracer.install()
+        return saved
+
+    def _uninstall(self, saved):
+        if self.alloc_tracer:
+            self.alloc_tracer.uninstall()
+        hw.sim = None
+        if self.trace_alloc:
+            tracemalloc.stop()
+        sys.stdout = saved["stdout"]
+        os.chdir(saved["cwd"])
+        builtins.open = saved["open"]
+        for name, module in saved["modules"].items():
+            sys.modules[name] = module
+        for name in list(sys.modules):
+            module = sys.modules[name]
+            path = getattr(module, "__file__", None) or ""
+            if path.startswith(self.flash_dir) or path.startswith(STUBS_DIR):
+                del sys.modules[name]
+        sys.path[:] = saved["path"]
+        sys.dont_write_bytecode = saved["dont_write_bytecode"]
+
+    def _make_open(self, real_open):
+        flash_dir = self.flash_dir
+
+        def flash_open(file, mode="r", *args, **kwargs):
+            if isinstance(file, str):
+                # "/" is the CIRCUITPY drive on the device, but leave real host paths alone
+                # (tracebacks read library sources through open()).
+                if file.startswith("/") and not os.path.exists("/" + file.split("/")[1]):
+                    file = os.path.join(flash_dir, file.lstrip("/"))
+                if any(flag in mode for flag in "wax+") and os.path.abspath(file).startswith(flash_dir):
+                    if not self.flash_writable:
+                        raise OSError(30, "Read-only filesystem")
+                    self.stats.count("flash_writes")
+            return real_open(file, mode, *args, **kwargs)
+
+        return flash_open
+
+    # Reporting
+
+    def report(self):
+        """Returns a human readable summary of the run."""
+        clock = self.clock
+        elapsed = clock.elapsed
+        lines = [
+            "Simulated {:.1f} s in {:.2f} s of host time ({:.0f}x real time). Outcome: {}.".format(
+                elapsed, self.host_seconds, elapsed / max(self.host_seconds, 1e-9), self.outcome),
+            "Boots at: " + ", ".join("{:.1f}s".format(t) for t in self.stats.boots),
+            "Device busy between waits (host CPU): " + self.stats.busy_summary(),
+            "  histogram: " + self.stats.busy_histogram(),
+        ]
+        waited = sum(clock.waited_ns.values()) or 1
+        lines.append("Virtual time spent waiting: " + ", ".join(
+            "{} {:.1f}%".format(kind, 100.0 * ns / waited) for kind, ns in sorted(clock.waited_ns.items())))
+        if self.stats.counters:
+            lines.append("Device counters: " + ", ".join(
+                "{}={}".format(k, v) for k, v in sorted(self.stats.counters.items())))
+        broker = self.broker
+        lines.append("Broker: " + ", ".join("{}={}".format(k, v) for k, v in broker.stats.items())
+                     + ", time requests={}, time ticks={}".format(self.network.time_server.requests,
+                                                                  self.network.time_server.ticks))
+        lines.append("Publishes by topic: " + ", ".join(
+            "{}={}".format(topic, count) for topic, count in sorted(broker.topic_counts.items())))
+        if self.display is not None:
+            lines.append("Display: {}x{} bit_depth={} refresh load={:.0f}% auto_refresh={} manual refreshes={} "
+                         "frames dumped={}".format(
+                self.display.width, self.display.height, self.display.bit_depth,
+                100 * self.clock.interrupt_load, self.display.auto_refresh, self.display.refresh_count, self.stats.frames_dumped))
+            display = self.display
+            if display.refresh_count:
+                pixels = display.refresh_pixels / display.refresh_count
+                line = "Refreshes: {:.0f} pixels composited on average ({:.1f}% of the panel)".format(
+                    pixels, 100.0 * pixels / (display.width * display.height))
+                if self.refresh_cost:
+                    line += ", {:.2f} ms each, {:.2f}% of the time".format(
+                        display.refresh_ns / display.refresh_count / 1e6, 100.0 * display.refresh_ns / max(1, clock.now_ns - clock.start_ns))
+                lines.append(line)
+        if self.network.events:
+            lines.append("Network events: " + ", ".join(
+                "{} at {:.1f}s".format(what, at) for at, what in self.network.events))
+        lines.append("Status light: {}".format(self.status_light))
+        if self.alloc_tracer:
+            lines.append(self.alloc_tracer.report())
+        return "\n".join(lines)
@@ -0,0 +1,40 @@
+"""Host stand-in for ``adafruit_connection_manager``.
+
+The fake MiniMQTT client does its own networking against the simulated broker,
+so the socket pool only needs to remember which radio it belongs to, and look hosts
+up through it. Only what the bundled library (1.0.1, app/lib) has is stood in for, so
+code.py can't come to rely on something the board doesn't have."""
+
+from simulator import hw
+
+_global_socketpools = {}
+
+
+class SocketPool:
+    AF_INET = 2
+    SOCK_STREAM = 1
+    SOCK_DGRAM = 2
+
+    def __init__(self, radio):
+        self.radio = radio
+
+    def getaddrinfo(self, host, port, family=0, socktype=0, proto=0, flags=0):
+        address = self.radio.pretty_ip(self.radio.get_host_by_name(host))  # Like the ESP32SPI pool
+        return [(self.AF_INET, self.SOCK_STREAM, proto, "", (address, port))]
+
+
+class _FakeSSLContext:
+    def __init__(self, radio):
+        self.radio = radio
+
+
+def get_radio_socketpool(radio):
+    key = id(radio)
+    if key not in _global_socketpools:
+        hw.sim.stats.count("socketpools_created")
+        _global_socketpools[key] = SocketPool(radio)
+    return _global_socketpools[key]
+
+
+def get_radio_ssl_context(radio):
+    return _FakeSSLContext(radio)
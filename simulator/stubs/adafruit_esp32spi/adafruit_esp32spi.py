@@ -0,0 +1,90 @@
+"""Host stand-in for ``adafruit_esp32spi``, wired to the simulated access point."""
+
+from simulator import hw
+
+WL_NO_SHIELD = 0xFF
+WL_IDLE_STATUS = 0
+WL_NO_SSID_AVAIL = 1
+WL_SCAN_COMPLETED = 2
+WL_CONNECTED = 3
+WL_CONNECT_FAILED = 4
+WL_CONNECTION_LOST = 5
+WL_DISCONNECTED = 6
+WL_AP_LISTENING = 7
+WL_AP_CONNECTED = 8
+WL_AP_FAILED = 9
+
+SOCKET_CLOSED = 0
+SOCKET_ESTABLISHED = 4
+
+TCP_MODE = 0
+UDP_MODE = 1
+TLS_MODE = 2
+
+
+class ESP_SPIcontrol:
+    """A simulated ESP32 co-processor."""
+
+    def __init__(self, spi, cs_dio, ready_dio, reset_dio, gpio0_dio=None, *, debug=False,
+                 debug_show_secrets=False):
+        self._associated = False
+        self._ssid = None
+        hw.sim.stats.count("esp_init")
+
+    @property
+    def is_connected(self):
+        return self._associated and hw.sim.network.ap_up
+
+    @property
+    def status(self):
+        return WL_CONNECTED if self.is_connected else WL_DISCONNECTED
+
+    @property
+    def ssid(self):
+        return bytes(self._ssid or "", "utf-8")
+
+    @property
+    def rssi(self):
+        return -55
+
+    @property
+    def ipv4_address(self):
+        return "10.0.0.50"
+
+    @property
+    def firmware_version(self):
+        return "1.7.7"
+
+    @property
+    def MAC_address(self):
+        return b"\x01\x02\x03\x04\x05\x06"
+
+    def connect_AP(self, ssid, password, timeout_s=10):
+        network = hw.sim.network
+        hw.sim.stats.count("esp_connect_AP")
+        if not network.ap_up:
+            hw.sim.clock.sleep(timeout_s, "net")
+            raise ConnectionError("Failed to connect to ssid")
+        hw.sim.clock.sleep(network.associate_time, "net")
+        self._associated = True
+        self._ssid = ssid if isinstance(ssid, str) else str(ssid, "utf-8")
+        return WL_CONNECTED
+
+    def disconnect(self):
+        hw.sim.stats.count("esp_disconnect")
+        self._associated = False
+
+    def reset(self):
+        hw.sim.stats.count("esp_reset")
+        hw.sim.clock.sleep(0.75, "net")
+        self._associated = False
+
+    def get_host_by_name(self, hostname):
+        hostname = hostname if isinstance(hostname, str) else str(hostname, "utf-8")
+        if not hw.sim.network.is_address(hostname):
+            hw.sim.stats.count("dns_lookups")
+        address = hw.sim.network.resolve(hostname)
+        return bytes(int(part) for part in address.split("."))
+
+    def pretty_ip(self, ip):
+        return "%d.%d.%d.%d" % (ip[0], ip[1], ip[2], ip[3])
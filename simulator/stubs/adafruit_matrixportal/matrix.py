@@ -0,0 +1,139 @@
+"""Host stand-in for ``adafruit_matrixportal.matrix``. The display renders into the
+simulator's framebuffer instead of an RGB matrix."""
+
+from simulator import hw
+
+
+class SimulatedDisplay:
+    """The subset of ``framebufferio.FramebufferDisplay`` that the clock uses.
+
+    With ``auto_refresh`` on, the panel always shows the current ``root_group``. With it off,
+    the panel keeps showing whatever the last ``refresh()`` drew.
+
+    Like displayio, a refresh only composites the areas that changed since the last one: those
+    of TileGrids that were added, removed, moved, shown or hidden, or whose tiles, bitmap or
+    palette changed (the tiles that changed, or else the whole grid). ``refresh_pixels`` counts
+    the pixels composited. Changes in the order of layers alone aren't noticed.
+
+    With the simulator's ``refresh_cost`` set, each refresh also takes virtual time: that many
+    nanoseconds per pixel composited, plus the second number per pixel of the panel, for
+    converting the whole framebuffer for the matrix."""
+
+    def __init__(self, width, height, bit_depth):
+        self.width = width
+        self.height = height
+        self.bit_depth = bit_depth
+        self.root_group = None
+        self.auto_refresh = True
+        self.brightness = 1.0
+        self.rotation = 0
+        self.framebuffer = None
+        self.refresh_count = 0
+        self.refresh_pixels = 0
+        self.refresh_ns = 0  # Virtual time the refreshes took, with refresh_cost set
+        self._drawn_group = None  # root_group as of the last refresh
+        self._shown = {}  # TileGrid -> what it showed at the last refresh, see _state()
+
+    def refresh(self, *, target_frames_per_second=None, minimum_frames_per_second=0):
+        from simulator.render import layer_areas, render_area
+
+        shown = {}
+        areas = []
+        full = (0, 0, self.width, self.height)
+        if self.root_group is not None:
+            for grid, area, scale in layer_areas(self.root_group):
+                state = shown[grid] = _state(grid, area)
+                old = self._shown.get(grid)
+                if old is None:
+                    areas.append(area)
+                elif old[:5] != state[:5]:
+                    areas.append(old[0])
+                    areas.append(area)
+                elif old[5] != state[5]:
+                    areas.append(_tile_area(grid, area, scale, old[5]))
+        for grid, old in self._shown.items():
+            if grid not in shown:
+                areas.append(old[0])
+        if self.framebuffer is None or self.root_group is not self._drawn_group:
+            areas = [full]
+        self._shown = shown
+        self._drawn_group = self.root_group
+
+        fb = bytearray(self.framebuffer) if self.framebuffer is not None else bytearray(self.width * self.height * 3)
+        pixels = 0
+        for area in _merge(areas, full):
+            render_area(self, fb, area)
+            pixels += (area[2] - area[0]) * (area[3] - area[1])
+        self.framebuffer = fb
+        self.refresh_count += 1
+        self.refresh_pixels += pixels
+        cost = hw.sim.refresh_cost
+        if cost:
+            ns = pixels * cost[0] + self.width * self.height * cost[1]
+            self.refresh_ns += ns
+            hw.sim.clock.sleep(ns / 1e9, "refresh")
+        return True
+
+
+def _state(grid, area):
+    """What a TileGrid shows, for telling whether it changed: its area, bitmap, palette,
+    whether it is flipped or transposed, and last its tiles."""
+    bitmap = grid.bitmap
+    shader = grid.pixel_shader
+    return (area, (bitmap, bitmap._version), (shader, getattr(shader, "_version", 0)),
+            (grid.flip_x, grid.flip_y, grid.transpose_xy), grid.tile_width, bytes(grid._tiles))
+
+
+def _tile_area(grid, area, scale, old_tiles):
+    """The part of ``area`` covered by the tiles that changed from ``old_tiles``."""
+    if grid.flip_x or grid.flip_y or grid.transpose_xy:
+        return area
+    tiles = grid._tiles
+    old = memoryview(old_tiles).cast("H")
+    first_x = first_y = None
+    last_x = last_y = 0
+    for i, tile in enumerate(tiles):
+        if tile != old[i]:
+            x, y = i % grid.width, i // grid.width
+            first_x = x if first_x is None else min(first_x, x)
+            first_y = y if first_y is None else min(first_y, y)
+            last_x = max(last_x, x)
+            last_y = max(last_y, y)
+    w = grid.tile_width * scale
+    h = grid.tile_height * scale
+    return (area[0] + first_x * w, area[1] + first_y * h, area[0] + (last_x + 1) * w, area[1] + (last_y + 1) * h)
+
+
+def _merge(areas, full):
+    """``areas`` clipped to ``full``, with overlapping ones merged into their bounding box,
+    so no pixel is composited twice."""
+    merged = []
+    for area in areas:
+        area = (max(area[0], full[0]), max(area[1], full[1]), min(area[2], full[2]), min(area[3], full[3]))
+        if area[0] >= area[2] or area[1] >= area[3]:
+            continue
+        i = 0
+        while i < len(merged):
+            other = merged[i]
+            if area[0] < other[2] and other[0] < area[2] and area[1] < other[3] and other[1] < area[3]:
+                area = (min(area[0], other[0]), min(area[1], other[1]), max(area[2], other[2]), max(area[3], other[3]))
+                merged.pop(i)
+                i = 0
+            else:
+                i += 1
+        merged.append(area)
+    return merged
+
+
+class Matrix:
+    """Stand-in for the RGB LED matrix.
+
+    :param int width: The width of the display, in pixels.
+    :param int height: The height of the display, in pixels.
+    :param int bit_depth: Color bits per channel that the matrix shows."""
+
+    def __init__(self, *, width=64, height=32, bit_depth=2, alt_addr_pins=None,
+                 color_order="RGB", serpentine=True, tile_rows=1, rotation=0, pinout=None):
+        self.display = SimulatedDisplay(width, height, bit_depth)
+        self.display.rotation = rotation
+        hw.sim.attach_display(self.display)
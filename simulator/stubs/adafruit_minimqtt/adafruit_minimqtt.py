@@ -0,0 +1,291 @@
+"""Host stand-in for ``adafruit_minimqtt`` 7.6.x, talking to the simulated broker.
+
+Blocking behavior follows the real client: ``loop(timeout)`` keeps waiting in
+``socket_timeout`` slices until more than ``timeout`` seconds have passed, keepalive
+pings happen inside ``loop()``, and a dead link surfaces as the same exceptions
+code.py sees on the device."""
+
+import random
+
+from simulator import hw
+from simulator.network import topic_matches
+
+MQTT_TCP_PORT = 1883
+MQTT_TLS_PORT = 8883
+
+# Per-iteration overhead of the real client's receive loop, in seconds.
+_LOOP_OVERHEAD = 0.001
+
+
+class MMQTTException(Exception):
+    """MiniMQTT Exception class."""
+
+
+class MQTT:
+    """MQTT client with the same constructor and methods as MiniMQTT."""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, *, broker, port=None, username=None, password=None, client_id=None,
+                 is_ssl=None, keep_alive=60, recv_timeout=10, socket_pool=None, ssl_context=None,
+                 use_binary_mode=False, socket_timeout=1, connect_retries=5, user_data=None,
+                 use_imprecise_time=None):
+        if recv_timeout <= socket_timeout:
+            raise MMQTTException("recv_timeout must be strictly greater than socket_timeout")
+        if connect_retries <= 0:
+            raise MMQTTException("connect_retries must be positive")
+        self.broker = broker
+        self.port = port or (MQTT_TLS_PORT if is_ssl else MQTT_TCP_PORT)
+        self._socket_pool = socket_pool
+        self._socket_timeout = socket_timeout
+        self._recv_timeout = recv_timeout
+        self._reconnect_attempts_max = connect_retries
+        self._reconnect_attempt = 0
+        self._use_binary_mode = use_binary_mode
+        self.keep_alive = keep_alive
+        self.user_data = user_data
+        self.client_id = client_id or "cpy{}{}".format(random.randint(0, 999), random.randint(0, 99))
+        self._session = None
+        self._is_connected = False
+        self._last_msg_sent_timestamp = 0
+        self._subscribed_topics = []
+        self._topic_callbacks = {}
+        self._on_message = None
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_publish = None
+        self.on_subscribe = None
+        self.on_unsubscribe = None
+        self.logger = None
+
+    def _now(self):
+        return hw.sim.clock.monotonic_ns() / 1e9
+
+    def _wait(self, seconds):
+        hw.sim.clock.sleep(seconds, "net")
+
+    @property
+    def on_message(self):
+        return self._on_message
+
+    @on_message.setter
+    def on_message(self, method):
+        self._on_message = method
+
+    def add_topic_callback(self, mqtt_topic, callback_method):
+        if mqtt_topic is None or callback_method is None:
+            raise ValueError("MQTT topic and callback method must both be defined.")
+        self._topic_callbacks[mqtt_topic] = callback_method
+
+    def remove_topic_callback(self, mqtt_topic):
+        if mqtt_topic is None:
+            raise ValueError("MQTT Topic must be defined.")
+        try:
+            del self._topic_callbacks[mqtt_topic]
+        except KeyError:
+            raise KeyError("MQTT topic callback not added with add_topic_callback.") from None
+
+    def will_set(self, topic=None, msg=None, retain=False, qos=0):
+        pass
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    def connect(self, clean_session=True, host=None, port=None, keep_alive=None):
+        """Connects to the simulated broker, retrying like MiniMQTT does."""
+        if host:
+            self.broker = host
+        if port:
+            self.port = port
+        if keep_alive:
+            self.keep_alive = keep_alive
+        stats = hw.sim.stats
+        last_exception = None
+        backoff = False
+        for i in range(self._reconnect_attempts_max):
+            if i > 0:
+                if backoff:
+                    self._reconnect_attempt += 1
+                    delay = min(2 ** self._reconnect_attempt, 32) + random.random()
+                    self._wait(delay)
+                else:
+                    self._reconnect_attempt = 0
+            stats.count("mqtt_connect_attempts")
+            try:
+                self._connect()
+                self._reconnect_attempt = 0
+                stats.count("mqtt_connects")
+                return 0
+            except RuntimeError:
+                backoff = False
+            except MMQTTException as e:
+                last_exception = e
+                backoff = True
+        stats.count("mqtt_connect_failures")
+        exc_msg = "Repeated connect failures" if self._reconnect_attempts_max > 1 else "Connect failure"
+        if last_exception:
+            raise MMQTTException(exc_msg) from last_exception
+        raise MMQTTException(exc_msg)
+
+    def _connect(self):
+        network = hw.sim.network
+        radio = getattr(self._socket_pool, "radio", None)
+        if radio is not None and not radio.is_connected:
+            self._wait(network.connect_fail_time)
+            raise RuntimeError("Error connecting socket: Failed to establish connection")
+        # Looks the broker up on every connect, as MiniMQTT's connection manager does.
+        # Raises RuntimeError("Failed to request hostname").
+        if self._socket_pool is not None:
+            self._socket_pool.getaddrinfo(self.broker, self.port)
+        else:
+            network.resolve(self.broker)
+        session = network.broker.connect(self.client_id)
+        if session is None:
+            self._wait(network.connect_fail_time)
+            raise RuntimeError("Error connecting socket: Failed to establish connection")
+        self._wait(2 * network.broker.latency)
+        self._session = session
+        self._is_connected = True
+        self._subscribed_topics = []
+        self._last_msg_sent_timestamp = self._now()
+        if self.on_connect is not None:
+            self.on_connect(self, self.user_data, 0, 0)
+
+    def reconnect(self, resub_topics=True):
+        ret = self.connect()
+        if resub_topics:
+            topics = self._subscribed_topics.copy()
+            self._subscribed_topics = []
+            while topics:
+                self.subscribe(topics.pop())
+        return ret
+
+    def disconnect(self):
+        self._connected()
+        if self._session is not None:
+            hw.sim.network.broker.disconnect(self._session)
+        self._session = None
+        self._is_connected = False
+        self._subscribed_topics = []
+        self._last_msg_sent_timestamp = 0
+        if self.on_disconnect is not None:
+            self.on_disconnect(self, self.user_data, 0)
+
+    def _send(self, nbytes):
+        """Models a socket write on the current connection."""
+        session = self._session
+        if session is None or not session.alive or not hw.sim.network.ap_up:
+            raise ConnectionError("Failed to send %d bytes (sent %d)" % (nbytes, 0))
+        self._last_msg_sent_timestamp = self._now()
+
+    def ping(self):
+        self._connected()
+        self._send(2)
+        stamp = self._now()
+        rcs = []
+        while True:
+            rc = self._wait_for_msg()
+            if rc is not None:
+                rcs.append(rc)
+            if self._session is not None and self._session.alive:
+                return rcs
+            if self._now() - stamp > self.keep_alive:
+                raise MMQTTException("PINGRESP not returned from broker.")
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        if isinstance(msg, (int, float)):
+            msg = str(msg).encode("ascii")
+        elif isinstance(msg, str):
+            msg = str(msg).encode("utf-8")
+        self._connected()
+        self._send(4 + len(topic) + len(msg))
+        hw.sim.stats.count("mqtt_publishes")
+        hw.sim.network.broker.publish(topic, msg, retain, sender=self.client_id)
+        if self.on_publish is not None:
+            self.on_publish(self, self.user_data, topic, 0)
+
+    def subscribe(self, topic, qos=0):
+        self._connected()
+        topics = topic if isinstance(topic, list) else [topic]
+        for item in topics:
+            name = item[0] if isinstance(item, tuple) else item
+            self._send(5 + len(name))
+            hw.sim.network.broker.subscribe(self._session, name)
+            self._subscribed_topics.append(name)
+        self._wait(2 * hw.sim.network.broker.latency)
+
+    def unsubscribe(self, topic):
+        self._connected()
+        topics = topic if isinstance(topic, list) else [topic]
+        for name in topics:
+            if name not in self._subscribed_topics:
+                raise MMQTTException("Topic must be subscribed to before attempting unsubscribe.")
+            self._send(4 + len(name))
+            self._session.subscriptions.remove(name)
+            self._subscribed_topics.remove(name)
+
+    def loop(self, timeout=0):
+        if timeout < self._socket_timeout:
+            raise MMQTTException(
+                "loop timeout ({}) must be bigger than socket timeout ({}))".format(
+                    timeout, self._socket_timeout))
+        self._connected()
+        hw.sim.stats.count("mqtt_loops")
+        stamp = self._now()
+        rcs = []
+        while True:
+            if self._now() - self._last_msg_sent_timestamp >= self.keep_alive:
+                rcs.extend(self.ping())
+                if self._now() - stamp > timeout:
+                    break
+            rc = self._wait_for_msg()
+            if rc is not None:
+                rcs.append(rc)
+            if self._now() - stamp > timeout:
+                break
+        return rcs if rcs else None
+
+    def _wait_for_msg(self, timeout=None):
+        """Waits up to ``socket_timeout`` for one packet and dispatches it."""
+        session = self._session
+        clock = hw.sim.clock
+        wait = self._socket_timeout if timeout is None else timeout
+        if session is not None and session.alive:
+            message = session.pending(clock.monotonic_ns())
+            if message is None:
+                arrival = session.next_arrival_ns()
+                deadline = clock.now_ns + int(wait * 1e9)
+                if arrival is not None and arrival <= deadline:
+                    self._wait((arrival - clock.now_ns) / 1e9 + _LOOP_OVERHEAD)
+                    message = session.pending(clock.monotonic_ns())
+            if message is not None:
+                _, topic, payload = message
+                hw.sim.stats.count("mqtt_messages_received")
+                self._handle_on_message(topic, payload.encode("utf-8") if self._use_binary_mode else payload)
+                return 0x30
+        self._wait(wait + _LOOP_OVERHEAD)
+        return None
+
+    def _handle_on_message(self, topic, message):
+        matched = False
+        for pattern, callback in self._topic_callbacks.items():
+            if topic_matches(pattern, topic):
+                callback(self, topic, message)
+                matched = True
+        if not matched and self._on_message:
+            self._on_message(self, topic, message)
+
+    def _connected(self):
+        if not self.is_connected():
+            raise MMQTTException("MiniMQTT is not connected")
+
+    def is_connected(self):
+        return self._is_connected and self._session is not None
+
+    def enable_logger(self, log_pkg, log_level=20, logger_name="log"):
+        return None
+
+    def disable_logger(self):
+        pass
+
+    def deinit(self):
+        self.disconnect()
@@ -0,0 +1,45 @@
+"""Host stand-in for CircuitPython's ``bitmaptools`` (blit and fill only)."""
+
+
+def blit(dest_bitmap, source_bitmap, x, y, *, x1=0, y1=0, x2=None, y2=None,
+         skip_source_index=None, skip_dest_index=None):
+    if x2 is None:
+        x2 = source_bitmap.width
+    if y2 is None:
+        y2 = source_bitmap.height
+    if x1 > x2:
+        x1, x2 = x2, x1
+    if y1 > y2:
+        y1, y2 = y2, y1
+    x2 = min(x2, source_bitmap.width)
+    y2 = min(y2, source_bitmap.height)
+    dest_bitmap._version += 1
+    src = source_bitmap._data
+    dst = dest_bitmap._data
+    src_width = source_bitmap.width
+    dst_width = dest_bitmap.width
+    dst_height = dest_bitmap.height
+    for row in range(y2 - y1):
+        ty = y + row
+        if ty < 0:
+            continue
+        if ty >= dst_height:
+            break
+        src_row = (y1 + row) * src_width
+        for col in range(x2 - x1):
+            tx = x + col
+            if tx < 0 or tx >= dst_width:
+                continue
+            value = src[src_row + x1 + col]
+            if skip_source_index is not None and value == skip_source_index:
+                continue
+            target = ty * dst_width + tx
+            if skip_dest_index is not None and dst[target] == skip_dest_index:
+                continue
+            dst[target] = value
+
+
+def fill_region(dest_bitmap, x1, y1, x2, y2, value):
+    for y in range(max(0, y1), min(dest_bitmap.height, y2)):
+        for x in range(max(0, x1), min(dest_bitmap.width, x2)):
+            dest_bitmap[x, y] = value
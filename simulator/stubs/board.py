@@ -0,0 +1,17 @@
+"""Host stand-in for ``board`` on the Matrix Portal M4. Every pin is a named placeholder."""
+
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "board." + self.name
+
+
+def __getattr__(name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    pin = Pin(name)
+    globals()[name] = pin
+    return pin
@@ -0,0 +1,286 @@
+"""Host stand-in for CircuitPython's ``displayio`` (the parts the clock uses).
+
+Pixels are only composited when the simulator captures a frame, see
+``simulator/render.py``. Bitmaps and palettes count their changes in ``_version``, so the
+simulated display can tell which areas a refresh has to draw again, as displayio does."""
+
+from array import array
+
+
+def _as_color(value):
+    if isinstance(value, int):
+        return value & 0xFFFFFF
+    if isinstance(value, (tuple, list, bytes, bytearray)):
+        return (value[0] << 16) | (value[1] << 8) | value[2]
+    raise TypeError("color must be int or RGB tuple")
+
+
+class Bitmap:
+    """Stores values of a certain size in a 2D array."""
+
+    def __init__(self, width, height, value_count):
+        if value_count < 1 or value_count > 65536:
+            raise ValueError("value_count must be in 1-65536")
+        self._width = width
+        self._height = height
+        self._value_count = value_count
+        if value_count <= 256:
+            self._data = bytearray(width * height)
+        else:
+            self._data = array("H", bytes(2 * width * height))
+        self._version = 0  # Bumped by every write, including bitmaptools'
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    def _index(self, index):
+        if isinstance(index, tuple):
+            x, y = index
+            if x < 0 or y < 0 or x >= self._width or y >= self._height:
+                raise IndexError("pixel coordinates out of bounds")
+            return y * self._width + x
+        return index
+
+    def __getitem__(self, index):
+        return self._data[self._index(index)]
+
+    def __setitem__(self, index, value):
+        if value < 0 or value >= self._value_count:
+            raise ValueError("pixel value out of range")
+        self._data[self._index(index)] = value
+        self._version += 1
+
+    def fill(self, value):
+        self._version += 1
+        if isinstance(self._data, bytearray):
+            self._data[:] = bytes((value,)) * len(self._data)
+        else:
+            self._data[:] = array("H", (value,)) * len(self._data)
+
+    def dirty(self, x1=0, y1=0, x2=-1, y2=-1):
+        self._version += 1
+
+
+class Palette:
+    """Map a pixel palette_index to a full color."""
+
+    def __init__(self, color_count, *, dither=False):
+        self._colors = [0] * color_count
+        self._transparent = [False] * color_count
+        self.dither = dither
+        self._version = 0  # Bumped by every change
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, value):
+        color = _as_color(value)
+        if self._colors[index] != color:
+            self._colors[index] = color
+            self._version += 1
+
+    def make_transparent(self, palette_index):
+        self._transparent[palette_index] = True
+        self._version += 1
+
+    def make_opaque(self, palette_index):
+        self._transparent[palette_index] = False
+        self._version += 1
+
+    def is_transparent(self, palette_index):
+        return self._transparent[palette_index]
+
+
+class ColorConverter:
+    """Converts one color format to another. Only RGB888 passthrough is simulated."""
+
+    def __init__(self, *, input_colorspace=None, dither=False):
+        self.dither = dither
+
+    def convert(self, color):
+        return _as_color(color)
+
+
+class _Layer:
+    def __init__(self, x, y):
+        self._x = x
+        self._y = y
+        self.hidden = False
+        self._in_group = False
+
+    @property
+    def x(self):
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self._x = int(value)
+
+    @property
+    def y(self):
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self._y = int(value)
+
+
+class TileGrid(_Layer):
+    """A grid of tiles sourced out of one bitmap."""
+
+    def __init__(self, bitmap, *, pixel_shader, width=1, height=1, tile_width=None,
+                 tile_height=None, default_tile=0, x=0, y=0):
+        super().__init__(x, y)
+        if tile_width is None:
+            tile_width = bitmap.width
+        if tile_height is None:
+            tile_height = bitmap.height
+        if bitmap.width % tile_width or bitmap.height % tile_height:
+            raise ValueError("Tile width must exactly divide bitmap width")
+        self._bitmap = bitmap
+        self._pixel_shader = pixel_shader
+        self._width = width
+        self._height = height
+        self._tile_width = tile_width
+        self._tile_height = tile_height
+        self._tiles = array("H", [default_tile] * (width * height))
+        self.flip_x = False
+        self.flip_y = False
+        self.transpose_xy = False
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def tile_width(self):
+        return self._tile_width
+
+    @property
+    def tile_height(self):
+        return self._tile_height
+
+    @property
+    def bitmap(self):
+        return self._bitmap
+
+    @bitmap.setter
+    def bitmap(self, new_bitmap):
+        if new_bitmap.width != self._bitmap.width or new_bitmap.height != self._bitmap.height:
+            raise ValueError("New bitmap must be same size as old bitmap")
+        self._bitmap = new_bitmap
+
+    @property
+    def pixel_shader(self):
+        return self._pixel_shader
+
+    @pixel_shader.setter
+    def pixel_shader(self, value):
+        self._pixel_shader = value
+
+    def _index(self, index):
+        if isinstance(index, tuple):
+            x, y = index
+            return y * self._width + x
+        return index
+
+    def __getitem__(self, index):
+        return self._tiles[self._index(index)]
+
+    def __setitem__(self, index, value):
+        tiles = (self._bitmap.width // self._tile_width) * (self._bitmap.height // self._tile_height)
+        if value < 0 or value >= tiles:
+            raise ValueError("Tile index out of bounds")
+        self._tiles[self._index(index)] = value
+
+
+class Group(_Layer):
+    """Manage a group of sprites and groups and how they are inter-related."""
+
+    def __init__(self, *, scale=1, x=0, y=0):
+        super().__init__(x, y)
+        if scale < 1:
+            raise ValueError("scale must be >= 1")
+        self._scale = scale
+        self._layers = []
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, value):
+        if value < 1:
+            raise ValueError("scale must be >= 1")
+        self._scale = value
+
+    def _adopt(self, layer):
+        if not isinstance(layer, _Layer):
+            raise TypeError("Layer must be a Group or TileGrid subclass")
+        if layer._in_group:
+            raise ValueError("Layer already in a group")
+        layer._in_group = True
+
+    def append(self, layer):
+        self._adopt(layer)
+        self._layers.append(layer)
+
+    def insert(self, index, layer):
+        self._adopt(layer)
+        self._layers.insert(index, layer)
+
+    def index(self, layer):
+        return self._layers.index(layer)
+
+    def pop(self, i=-1):
+        layer = self._layers.pop(i)
+        layer._in_group = False
+        return layer
+
+    def remove(self, layer):
+        self.pop(self._layers.index(layer))
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __bool__(self):
+        return True
+
+    def __iter__(self):
+        return iter(self._layers)
+
+    def __contains__(self, layer):
+        return layer in self._layers
+
+    def __getitem__(self, index):
+        return self._layers[index]
+
+    def __setitem__(self, index, layer):
+        old = self._layers[index]
+        if old is layer:
+            return
+        self._adopt(layer)
+        old._in_group = False
+        self._layers[index] = layer
+
+    def __delitem__(self, index):
+        self.pop(index)
+
+    def sort(self, key=None, reverse=False):
+        self._layers.sort(key=key, reverse=reverse)
+
+
+def release_displays():
+    pass
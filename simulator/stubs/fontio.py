@@ -0,0 +1,15 @@
+"""Host stand-in for CircuitPython's ``fontio``."""
+
+from collections import namedtuple
+
+Glyph = namedtuple("Glyph", ("bitmap", "tile_index", "width", "height", "dx", "dy", "shift_x", "shift_y"))
+
+
+class FontProtocol:
+    """A protocol shared by BuiltinFont and classes in adafruit_bitmap_font."""
+
+    def get_bounding_box(self):
+        raise NotImplementedError
+
+    def get_glyph(self, codepoint):
+        raise NotImplementedError
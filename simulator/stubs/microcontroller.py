@@ -0,0 +1,60 @@
+"""Host stand-in for ``microcontroller``. ``nvm`` and ``watchdog`` persist across reloads for the whole run."""
+
+from simulator import hw
+
+
+class _Processor:
+    frequency = 120000000
+    temperature = 35.0
+    voltage = 3.3
+    uid = bytearray(b"SIMULATED0000000")
+
+    @property
+    def reset_reason(self):
+        return getattr(ResetReason, hw.sim.reset_reason)
+
+
+class RunMode:
+    NORMAL = "NORMAL"
+    SAFE_MODE = "SAFE_MODE"
+    BOOTLOADER = "BOOTLOADER"
+
+
+class ResetReason:
+    POWER_ON = "POWER_ON"
+    BROWNOUT = "BROWNOUT"
+    SOFTWARE = "SOFTWARE"
+    DEEP_SLEEP_ALARM = "DEEP_SLEEP_ALARM"
+    RESET_PIN = "RESET_PIN"
+    WATCHDOG = "WATCHDOG"
+    UNKNOWN = "UNKNOWN"
+
+
+cpu = _Processor()
+
+
+def __getattr__(name):
+    if name == "nvm":
+        return hw.sim.nvm
+    if name == "watchdog":
+        if hw.sim.watchdog is None:
+            from watchdog import WatchDogTimer
+
+            hw.sim.watchdog = WatchDogTimer()
+        return hw.sim.watchdog
+    raise AttributeError(name)
+
+
+def reset():
+    from simulator.runner import ResetRequested
+
+    hw.sim.reset_reason = "SOFTWARE"
+    raise ResetRequested()
+
+
+def on_next_reset(run_mode):
+    pass
+
+
+def delay_us(delay):
+    hw.sim.clock.sleep(delay / 1e6)
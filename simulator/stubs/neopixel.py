@@ -0,0 +1,36 @@
+"""Host stand-in for ``neopixel``. Remembers every color the status light was set to."""
+
+from simulator import hw
+
+RGB = "RGB"
+GRB = "GRB"
+
+
+class NeoPixel:
+    def __init__(self, pin, n, *, bpp=3, brightness=1.0, auto_write=True, pixel_order=None):
+        self.n = n
+        self.brightness = brightness
+        self.auto_write = auto_write
+        self._pixels = [(0, 0, 0)] * n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, index):
+        return self._pixels[index]
+
+    def __setitem__(self, index, color):
+        self._pixels[index] = color
+        if self.auto_write:
+            self.show()
+
+    def fill(self, color):
+        self._pixels = [color] * self.n
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        hw.sim.status_light = self._pixels[0] if self.n else None
+
+    def deinit(self):
+        pass
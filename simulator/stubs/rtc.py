@@ -0,0 +1,29 @@
+"""Host stand-in for ``rtc``. Setting ``datetime`` moves the simulated RTC."""
+
+import calendar
+
+from simulator import hw
+
+
+class RTC:
+    @property
+    def datetime(self):
+        import time
+
+        return time.localtime()
+
+    @datetime.setter
+    def datetime(self, value):
+        hw.sim.set_rtc(calendar.timegm(tuple(value)))
+
+    @property
+    def calibration(self):
+        return 0
+
+    @calibration.setter
+    def calibration(self, value):
+        pass
+
+
+def set_time_source(rtc):
+    pass
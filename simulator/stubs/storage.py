@@ -0,0 +1,10 @@
+"""Host stand-in for ``storage``. The filesystem is the simulator's flash directory."""
+
+from simulator import hw
+
+
+def remount(mount_path, readonly=False, *, disable_concurrent_write_protection=False):
+    if hw.sim.usb_connected and not readonly:
+        raise RuntimeError("Cannot remount '/' when visible via USB.")
+    hw.sim.flash_writable = not readonly
+    hw.sim.stats.remounts += 1
@@ -0,0 +1,32 @@
+"""Host stand-in for ``supervisor``. ``reload()`` restarts code.py inside the simulator."""
+
+from simulator import hw
+
+
+class _Runtime:
+    @property
+    def usb_connected(self):
+        return hw.sim.usb_connected
+
+    @property
+    def serial_connected(self):
+        return hw.sim.usb_connected
+
+    @property
+    def serial_bytes_available(self):
+        return 0
+
+
+runtime = _Runtime()
+
+
+def reload():
+    from simulator.runner import ReloadRequested
+
+    raise ReloadRequested()
+
+
+def ticks_ms():
+    # As on the device, the ticks first wrap around about 65 seconds after power on, so code
+    # that doesn't allow for it fails early.
+    return (hw.sim.device_monotonic_ns() // 1000000 - 65536) & ((1 << 29) - 1)
@@ -0,0 +1,39 @@
+"""Host stand-in for CircuitPython's ``gc``, installed as ``sys.modules["gc"]``.
+
+``mem_alloc()`` reports bytes traced by tracemalloc when the simulator runs with
+allocation tracing, so differences between two calls track what the device code
+allocated. CPython objects are bigger than MicroPython's, so treat absolute
+numbers as relative."""
+
+import gc as _host_gc
+import tracemalloc
+
+from simulator import hw
+
+collect = _host_gc.collect
+enable = _host_gc.enable
+disable = _host_gc.disable
+isenabled = _host_gc.isenabled
+get_objects = _host_gc.get_objects
+get_referrers = _host_gc.get_referrers
+get_referents = _host_gc.get_referents
+get_count = _host_gc.get_count
+get_threshold = _host_gc.get_threshold
+set_threshold = _host_gc.set_threshold
+freeze = _host_gc.freeze
+callbacks = _host_gc.callbacks
+garbage = _host_gc.garbage
+
+
+def mem_alloc():
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return 0
+
+
+def mem_free():
+    return max(0, hw.sim.heap_size - mem_alloc())
+
+
+def threshold(amount=None):
+    return -1
@@ -0,0 +1,41 @@
+"""Host stand-in for CircuitPython's ``time``, driven by the simulator's virtual clock.
+
+Installed as ``sys.modules["time"]`` while code.py runs. As on the device,
+``localtime()`` has no time zone and, without an argument, reads the RTC."""
+
+import time as _host_time
+
+from simulator import hw
+
+struct_time = _host_time.struct_time
+
+
+def monotonic_ns():
+    return hw.sim.device_monotonic_ns()
+
+
+def monotonic():
+    return monotonic_ns() / 1e9
+
+
+def sleep(seconds):
+    hw.sim.clock.sleep(seconds)
+
+
+def time():
+    return int(hw.sim.rtc_seconds())
+
+
+def localtime(secs=None):
+    if secs is None:
+        secs = hw.sim.rtc_seconds()
+    try:
+        return _host_time.gmtime(int(secs))
+    except (OSError, ValueError) as e:
+        raise OverflowError("timestamp out of range for platform time_t") from e
+
+
+def mktime(t):
+    import calendar
+
+    return calendar.timegm(tuple(t))
@@ -0,0 +1,69 @@
+"""Host stand-in for ``watchdog``.
+
+The timer itself is ``microcontroller.watchdog``, which lives on the Simulator, so (as in
+RESET mode on the device) it keeps running across reloads. Its deadline is an event on the
+virtual clock, so it fires in the middle of whatever call is blocking."""
+
+from simulator import hw
+
+
+class WatchDogMode:
+    RAISE = "RAISE"
+    RESET = "RESET"
+
+
+class WatchDogTimeout(Exception):
+    """Raised in RAISE mode when the watchdog isn't fed in time."""
+
+
+class WatchDogTimer:
+    def __init__(self):
+        self.timeout = 0
+        self._mode = None
+        self.deadline_ns = None
+        self._check_ns = None  # When the clock event that checks the deadline is due
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @mode.setter
+    def mode(self, mode):
+        if mode is None:
+            self.deinit()
+            return
+        self._mode = mode
+        self.feed()
+
+    def feed(self):
+        if self._mode is None:
+            raise ValueError("WatchDogTimer is not currently running")
+        self.deadline_ns = hw.sim.clock.now_ns + int(self.timeout * 1e9)
+        if self._check_ns is None:
+            self._schedule_check()
+
+    def deinit(self):
+        self._mode = None
+        self.deadline_ns = None
+
+    def _schedule_check(self):
+        self._check_ns = self.deadline_ns
+        hw.sim.clock.schedule_at_ns(self._check_ns, self._check)
+
+    def _check(self):
+        """Fires if the watchdog hasn't been fed since the check was scheduled."""
+        self._check_ns = None
+        if self.deadline_ns is None:
+            return
+        if hw.sim.clock.now_ns < self.deadline_ns:
+            self._schedule_check()  # Fed meanwhile
+            return
+        hw.sim.stats.count("watchdog_timeouts")
+        if self._mode == WatchDogMode.RAISE:
+            self.deadline_ns = None  # Until it is fed again
+            raise WatchDogTimeout()
+        from simulator.runner import ResetRequested
+
+        self.deinit()  # A reset stops the watchdog
+        hw.sim.reset_reason = "WATCHDOG"
+        raise ResetRequested()